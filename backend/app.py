@@ -5,6 +5,10 @@ from models import db
 from routes.analyze import analyze_bp
 from routes.auth import auth_bp 
 from routes.projects import projects_bp
+from routes.metrics import metrics_bp
+from utils.rollups import rollups_cli
+from utils.http_cache import compress_response
+from utils.jobs import ensure_workers
 import os
 from dotenv import load_dotenv
 
@@ -29,12 +33,61 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:/
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+#Repository scan limits
+app.config['SCAN_BATCH_SIZE'] = int(os.environ.get('SCAN_BATCH_SIZE', 200))
+app.config['SCAN_MAX_FILE_SIZE'] = int(os.environ.get('SCAN_MAX_FILE_SIZE', 1024 * 1024))
+app.config['SCAN_MAX_TOTAL_SIZE'] = int(os.environ['SCAN_MAX_TOTAL_SIZE']) if os.environ.get('SCAN_MAX_TOTAL_SIZE') else None
+
+#Uncompressed bytes of code read from one archive upload to analyze-batch
+app.config['ARCHIVE_MAX_TOTAL_SIZE'] = int(os.environ.get('ARCHIVE_MAX_TOTAL_SIZE', 100 * 1024 * 1024))
+
+#Files read and analyzed per chunk when analyze-batch streams NDJSON
+app.config['BATCH_STREAM_CHUNK_SIZE'] = int(os.environ.get('BATCH_STREAM_CHUNK_SIZE', 32))
+
+#Compress buffered text responses of at least this many bytes
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+#Seconds an authenticated user's identity is reused without a lookup, 0 disables
+app.config['AUTH_USER_CACHE_TTL'] = float(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+
+#Rows written per commit by bulk analysis writes
+app.config['DB_WRITE_BATCH_SIZE'] = int(os.environ.get('DB_WRITE_BATCH_SIZE', 500))
+
+#Bearer token required by /metrics when set. Set METRICS_MULTIPROC_DIR to a
+#shared, emptied-on-deploy directory to sum metrics across gunicorn workers
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+#Comma separated emails allowed to use admin-only options such as /analyze profiling
+app.config['ADMIN_EMAILS'] = {email.strip() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+#Where profiled /analyze requests save their .prof files
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+#Background scan workers, 0 disables them
+app.config['SCAN_WORKERS'] = int(os.environ.get('SCAN_WORKERS', 2))
+app.config['SCAN_POLL_INTERVAL'] = float(os.environ.get('SCAN_POLL_INTERVAL', 2.0))
+#Running jobs without progress for this many seconds are requeued, and failed after max attempts
+app.config['SCAN_JOB_STALE_AFTER'] = int(os.environ.get('SCAN_JOB_STALE_AFTER', 600))
+app.config['SCAN_JOB_MAX_ATTEMPTS'] = int(os.environ.get('SCAN_JOB_MAX_ATTEMPTS', 3))
+
 db.init_app(app)
 migrate = Migrate(app, db)
 
 app.register_blueprint(analyze_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(projects_bp)
+app.register_blueprint(metrics_bp)
+
+app.cli.add_command(rollups_cli)
+
+app.after_request(compress_response)
+
+#Start the scan workers as soon as the app serves, so jobs queued before a
+#restart resume without waiting for the next enqueue. Not at import, so CLI
+#commands such as migrations do not claim jobs.
+@app.before_request
+def start_scan_workers():
+    ensure_workers(app, notify=False)
 
 @app.route('/')
 def health_check():
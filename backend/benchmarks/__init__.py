@@ -0,0 +1,8 @@
+# benchmarks/__init__.py
+#
+# Reproducible performance benchmarks for the analyzer and the HTTP hot paths.
+# Run from backend/:
+#
+#   python -m benchmarks run --output before.json
+#   python -m benchmarks run --output after.json
+#   python -m benchmarks compare before.json after.json
@@ -0,0 +1,117 @@
+# benchmarks/__main__.py
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from .compare import compare_results, format_comparison
+
+
+def _metadata(args):
+    from infrastructure.code_analyzer import ANALYZER_VERSION
+    from utils.git_utils import get_git_info
+
+    git_info = get_git_info(os.path.dirname(os.path.abspath(__file__))) or {}
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'analyzer_version': ANALYZER_VERSION,
+        'commit_hash': git_info.get('commit_hash'),
+        'branch': git_info.get('branch'),
+        'options': {
+            'suite': args.suite,
+            'rounds': args.rounds,
+            'sizes': args.sizes,
+            'files': args.files,
+            'seed': args.seed,
+            'workers': args.workers,
+            'filter': args.filter
+        }
+    }
+
+
+def run(args):
+    from .micro import run_micro
+    from .endpoints import run_endpoints
+
+    if args.workers is not None:
+        from infrastructure.executor import create_executor
+        from utils.analysis_cache import set_executor
+        set_executor(create_executor(workers=args.workers))
+
+    benchmarks = {}
+    if args.suite in ('micro', 'all'):
+        benchmarks.update(run_micro(args.sizes, args.rounds, args.seed, args.filter))
+    if args.suite in ('e2e', 'all'):
+        with tempfile.TemporaryDirectory(prefix='codeanalyzer-bench-') as workdir:
+            benchmarks.update(run_endpoints(
+                workdir, max(1, args.rounds // 2), args.files, args.seed, args.e2e_size, args.filter
+            ))
+
+    output = {'meta': _metadata(args), 'benchmarks': benchmarks}
+    text = json.dumps(output, indent=2, sort_keys=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        for name, stats in sorted(benchmarks.items()):
+            print(f"{name:<55} median {stats['median'] * 1000:9.2f}ms  p95 {stats['p95'] * 1000:9.2f}ms")
+    else:
+        print(text)
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(format_comparison(rows))
+
+    if args.fail_on_regression and any(row[4] == 'slower' for row in rows):
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='CodeAnalyzer benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run benchmarks and write JSON results')
+    run_parser.add_argument('--suite', choices=('micro', 'e2e', 'all'), default='all')
+    run_parser.add_argument('--rounds', type=int, default=20, help='Timed rounds per benchmark (halved for e2e)')
+    run_parser.add_argument('--sizes', nargs='+', choices=('small', 'medium', 'large'),
+                            default=['small', 'medium', 'large'], help='Corpus sizes for microbenchmarks')
+    run_parser.add_argument('--e2e-size', choices=('small', 'medium', 'large'), default='medium')
+    run_parser.add_argument('--files', type=int, default=50, help='Files per batch upload and scanned repository')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--workers', type=int, default=None,
+                            help='Analysis workers for batch and scan (1 = serial); defaults to ANALYSIS_WORKERS')
+    run_parser.add_argument('--filter', nargs='+', help='Only run benchmarks whose name contains one of these')
+    run_parser.add_argument('--output', '-o', help='Write JSON here instead of stdout')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='Compare two JSON result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='Relative median change reported as slower/faster')
+    compare_parser.add_argument('--fail-on-regression', action='store_true')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# benchmarks/compare.py
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Compare the median of every benchmark present in both runs
+
+    Returns a list of rows (name, baseline_median, current_median, ratio,
+    status) where status is 'slower' or 'faster' once the ratio moves past
+    threshold, 'same' otherwise, and 'new'/'removed' for unmatched names.
+    """
+    rows = []
+    old = baseline['benchmarks']
+    new = current['benchmarks']
+
+    for name in sorted(set(old) | set(new)):
+        if name not in old:
+            rows.append((name, None, new[name]['median'], None, 'new'))
+            continue
+        if name not in new:
+            rows.append((name, old[name]['median'], None, None, 'removed'))
+            continue
+
+        before = old[name]['median']
+        after = new[name]['median']
+        ratio = after / before if before else float('inf')
+
+        if ratio > 1 + threshold:
+            status = 'slower'
+        elif ratio < 1 - threshold:
+            status = 'faster'
+        else:
+            status = 'same'
+        rows.append((name, before, after, ratio, status))
+
+    return rows
+
+
+def format_comparison(rows):
+    def ms(value):
+        return '-' if value is None else f'{value * 1000:.2f}ms'
+
+    width = max([len(row[0]) for row in rows] + [9])
+    lines = [f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'ratio':>7}  status"]
+    for name, before, after, ratio, status in rows:
+        shown = '-' if ratio is None else f'{ratio:.2f}x'
+        lines.append(f'{name:<{width}}  {ms(before):>12}  {ms(after):>12}  {shown:>7}  {status}')
+    return '\n'.join(lines)
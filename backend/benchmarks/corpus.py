@@ -0,0 +1,130 @@
+# benchmarks/corpus.py
+
+import os
+import random
+
+# Statements that open a nested block; {cond} and {var} are filled in per use
+BLOCK_TEMPLATES = (
+    'if {var} > {const}:',
+    'for {var} in range({const}):',
+    'while {var} < {const}:',
+    'with open({var}) as handle:',
+    'try:',
+)
+
+SIMPLE_TEMPLATES = (
+    '{var} = {other} + {const}',
+    '{var} = {other} * {const} - {other}',
+    '{var} = [{other} for {other} in range({const})]',
+    'result.append({var})',
+    '{var} = helper_{const}({other}, {const})',
+)
+
+COMMENT_TEMPLATE = '# adjust {var} before the next step'
+
+NAMES = (
+    'total', 'count', 'index', 'value', 'items', 'buffer', 'offset',
+    'score', 'data', 'row', 'a', 'b', 'q', 'tmp', 'accumulator',
+)
+
+
+def _statement(rng, template):
+    return template.format(
+        var=rng.choice(NAMES),
+        other=rng.choice(NAMES),
+        const=rng.randint(1, 100)
+    )
+
+
+def _block(rng, indent, depth, max_nesting, statements, comments=0.1):
+    """Emit a block body of about `statements` lines, nesting up to max_nesting."""
+    lines = []
+    pad = '    ' * indent
+    remaining = statements
+
+    while remaining > 0:
+        if depth < max_nesting and remaining > 2 and rng.random() < 0.3:
+            header = _statement(rng, rng.choice(BLOCK_TEMPLATES))
+            inner = rng.randint(1, max(1, remaining // 2))
+            lines.append(pad + header)
+            lines.extend(_block(rng, indent + 1, depth + 1, max_nesting, inner))
+            if header == 'try:':
+                lines.append(pad + 'except ValueError:')
+                lines.append(pad + '    pass')
+            remaining -= inner + 1
+        else:
+            if rng.random() < comments:
+                lines.append(pad + _statement(rng, COMMENT_TEMPLATE))
+            lines.append(pad + _statement(rng, rng.choice(SIMPLE_TEMPLATES)))
+            remaining -= 1
+
+    return lines
+
+
+def _function(rng, name, max_nesting, body_lines):
+    lines = [f'def {name}(value, items):', '    """Generated benchmark function."""', '    result = []']
+    lines.extend(_block(rng, 1, 1, max_nesting, body_lines))
+    lines.append('    return result')
+    return lines
+
+
+def generate_module(lines=200, max_nesting=3, duplication=0.0, function_lines=15, seed=0):
+    """
+    Generate a syntactically valid Python module for benchmarking
+
+    Args:
+        lines: Approximate module length in lines
+        max_nesting: Deepest block nesting inside a function
+        duplication: Fraction (0-1) of functions that are structural copies
+            of an earlier function, which the duplication metric detects
+        function_lines: Approximate body length of each function
+        seed: Random seed; the same arguments always give the same source
+    """
+    rng = random.Random(seed)
+    # Header, docstring, result/return lines and nested headers add ~7 lines
+    functions = max(1, lines // (function_lines + 7))
+    bodies = []
+    output = ['"""Generated benchmark module."""', 'import os', '']
+
+    for index in range(functions):
+        if bodies and rng.random() < duplication:
+            # Same structure under a new name
+            body = rng.choice(bodies)[1:]
+        else:
+            body = _function(rng, 'placeholder', max_nesting, function_lines)[1:]
+            bodies.append([None] + body)
+
+        output.append(f'def function_{index}(value, items):')
+        output.extend(body)
+        output.append('')
+
+    return '\n'.join(output) + '\n'
+
+
+# Named corpus sizes used by the runner
+PRESETS = {
+    'small': {'lines': 50, 'max_nesting': 2, 'duplication': 0.0},
+    'medium': {'lines': 500, 'max_nesting': 4, 'duplication': 0.2},
+    'large': {'lines': 5000, 'max_nesting': 6, 'duplication': 0.2},
+}
+
+
+def generate_corpus(files=20, seed=0, **options):
+    """Return a list of (filename, source) pairs with varied seeds."""
+    return [
+        (f'module_{index}.py', generate_module(seed=seed + index, **options))
+        for index in range(files)
+    ]
+
+
+def write_corpus(directory, files=20, seed=0, packages=4, **options):
+    """Write a generated corpus to disk, spread over a few packages."""
+    written = []
+    for index, (filename, source) in enumerate(generate_corpus(files, seed, **options)):
+        rel_path = os.path.join(f'pkg_{index % packages}', filename)
+        path = os.path.join(directory, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        written.append(rel_path)
+    return written
@@ -0,0 +1,133 @@
+# benchmarks/endpoints.py
+
+import io
+import os
+import subprocess
+
+from .corpus import PRESETS, generate_corpus, generate_module, write_corpus
+from .timing import measure
+
+
+def create_bench_app(workdir):
+    """
+    Import the Flask app against a throwaway SQLite database in workdir
+
+    The engine is built when app.py is imported, so DATABASE_URL has to be
+    set first; this keeps benchmark runs away from instance/codeanalyzer.db.
+    """
+    database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SCAN_WORKERS'] = '0'
+
+    from app import app
+    if app.config['SQLALCHEMY_DATABASE_URI'] != database_url:
+        raise RuntimeError('app was imported before the benchmark database was configured')
+
+    app.config.update({'TESTING': True, 'SCAN_WORKERS': 0})
+    return app
+
+
+def _login(app, client):
+    from werkzeug.security import generate_password_hash
+    from models import db, User
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(
+            email='bench@example.com',
+            password_hash=generate_password_hash('benchmark'),
+            name='Benchmark'
+        ))
+        db.session.commit()
+
+    response = client.post('/auth/login', json={'email': 'bench@example.com', 'password': 'benchmark'})
+    return {'Authorization': f"Bearer {response.json['token']}"}
+
+
+def _cold_cache(app):
+    """Return a setup callback that empties both analysis cache tiers."""
+    from models import db, AnalysisCacheEntry
+    from utils.analysis_cache import analysis_cache
+
+    def clear():
+        analysis_cache.clear()
+        with app.app_context():
+            db.session.query(AnalysisCacheEntry).delete()
+            db.session.commit()
+
+    return clear
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+
+def _git_commit(path):
+    # Scans record commit info, so make the corpus a real repository when git is available
+    try:
+        for args in (['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'Benchmark corpus']):
+            subprocess.run(
+                ['git', '-C', path, '-c', 'user.name=bench', '-c', 'user.email=bench@example.com', *args],
+                check=True, capture_output=True
+            )
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+
+def run_endpoints(workdir, rounds=10, files=50, seed=0, size='medium', only=None):
+    """Benchmark the HTTP hot paths through the Flask test client."""
+    from models import db, Project
+    from utils.jobs import run_pending_jobs
+
+    app = create_bench_app(workdir)
+    client = app.test_client()
+    headers = _login(app, client)
+    cold = _cold_cache(app)
+    results = {}
+
+    def wanted(name):
+        return not only or any(pattern in name for pattern in only)
+
+    source = generate_module(seed=seed, **PRESETS[size])
+    payload = {'code': source, 'project_name': 'Bench', 'filename': 'bench.py', 'save_results': True}
+
+    def analyze():
+        _check(client.post('/analyze', json=payload, headers=headers))
+
+    if wanted('/analyze'):
+        results[f'e2e./analyze[{size}]'] = measure(analyze, rounds=rounds, setup=cold)
+        results[f'e2e./analyze[{size},cached]'] = measure(analyze, rounds=rounds)
+
+    corpus = generate_corpus(files, seed=seed, **PRESETS[size])
+
+    def analyze_batch():
+        data = {
+            'project_name': 'Bench Batch',
+            'files': [(io.BytesIO(code.encode('utf-8')), filename) for filename, code in corpus]
+        }
+        _check(client.post('/analyze-batch', data=data, headers=headers, content_type='multipart/form-data'))
+
+    if wanted('/analyze-batch'):
+        results[f'e2e./analyze-batch[{files}x{size}]'] = measure(analyze_batch, rounds=rounds, setup=cold)
+
+    if wanted('/scan-repo'):
+        repo_path = os.path.join(workdir, 'repo')
+        write_corpus(repo_path, files, seed=seed, **PRESETS[size])
+        _git_commit(repo_path)
+
+        project_id = _check(client.post('/projects', json={'name': 'Bench Repo'}, headers=headers)).json['id']
+        with app.app_context():
+            db.session.get(Project, project_id).git_repo_path = repo_path
+            db.session.commit()
+
+        def scan_repo():
+            # The endpoint only queues the scan, run it to completion here
+            _check(client.post(f'/projects/{project_id}/scan-repo', headers=headers))
+            with app.app_context():
+                run_pending_jobs()
+
+        results[f'e2e./scan-repo[{files}x{size}]'] = measure(scan_repo, rounds=rounds, setup=cold)
+
+    return results
@@ -0,0 +1,45 @@
+# benchmarks/micro.py
+
+from infrastructure.code_analyzer import analyze_code
+from infrastructure.parsing import parse_unit
+from infrastructure.metrics.basic import (
+    calculate_lines, calculate_complexity, calculate_maintainability,
+    calculate_comment_density, calculate_function_length
+)
+from infrastructure.metrics.ast_analysis import (
+    calculate_duplication_ast, calculate_naming_quality,
+    calculate_nesting_depth, calculate_cognitive_complexity
+)
+
+from .corpus import PRESETS, generate_module
+from .timing import measure
+
+# Each metric is timed on the raw source, so the cost includes parsing,
+# as it would be for a caller using the function on its own
+METRICS = {
+    'parse_unit': parse_unit,
+    'calculate_lines': calculate_lines,
+    'calculate_complexity': calculate_complexity,
+    'calculate_maintainability': calculate_maintainability,
+    'calculate_comment_density': calculate_comment_density,
+    'calculate_function_length': calculate_function_length,
+    'calculate_duplication_ast': calculate_duplication_ast,
+    'calculate_naming_quality': calculate_naming_quality,
+    'calculate_nesting_depth': calculate_nesting_depth,
+    'calculate_cognitive_complexity': calculate_cognitive_complexity,
+    'analyze_code': lambda source: analyze_code(source, 'python'),
+}
+
+
+def run_micro(sizes=('small', 'medium', 'large'), rounds=20, seed=0, only=None):
+    """Benchmark every metric on each corpus size; returns {name: stats}."""
+    results = {}
+    for size in sizes:
+        source = generate_module(seed=seed, **PRESETS[size])
+        for name, fn in METRICS.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            stats = measure(lambda: fn(source), rounds=rounds)
+            stats['lines'] = source.count('\n')
+            results[f'micro.{name}[{size}]'] = stats
+    return results
@@ -0,0 +1,47 @@
+# benchmarks/timing.py
+
+import gc
+import statistics
+import time
+
+
+def measure(fn, rounds=20, warmup=2, setup=None):
+    """
+    Time fn() over several rounds and summarise the samples in seconds
+
+    setup() runs before every round (untimed), e.g. to clear caches.
+    Garbage collection is paused while a round runs so collector pauses
+    do not land on random samples.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'rounds': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0
+    }
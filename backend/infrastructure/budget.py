@@ -0,0 +1,112 @@
+# infrastructure/budget.py
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+#Per-file limits, 0 disables either one
+TIME_BUDGET = float(os.environ.get('ANALYSIS_TIME_BUDGET', 30))
+MEMORY_BUDGET_MB = int(os.environ.get('ANALYSIS_MEMORY_BUDGET_MB', 1024))
+
+#Prefix of the error recorded for files cut short by a budget
+BUDGET_EXCEEDED = 'skipped: budget exceeded'
+
+_state = threading.local()
+
+
+class BudgetExceeded(Exception):
+    """Raised when analyzing one file goes over its time or memory budget."""
+
+    def __init__(self, kind, limit):
+        self.kind = kind
+        super().__init__(f'{BUDGET_EXCEEDED} ({kind} limit {limit})')
+
+
+def checkpoint():
+    """Raise BudgetExceeded once the current thread's deadline has passed."""
+    deadline = getattr(_state, 'deadline', None)
+    if deadline is not None and time.monotonic() > deadline:
+        raise BudgetExceeded('time', f'{_state.seconds:g}s')
+
+def current_deadline():
+    return getattr(_state, 'deadline', None)
+
+def _in_worker_process():
+    # Signals and rlimits affect the whole process, so they are only used in
+    # pool workers, never in a web worker serving other requests
+    return (
+        multiprocessing.parent_process() is not None
+        and threading.current_thread() is threading.main_thread()
+    )
+
+def _address_space():
+    # Current virtual memory size in bytes, Linux only
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def _on_alarm(signum, frame):
+    raise BudgetExceeded('time', f'{_state.seconds:g}s')
+
+@contextmanager
+def analysis_budget(seconds=None, memory_mb=None):
+    """
+    Run one file's analysis under a wall-clock and memory budget
+
+    The deadline is checked cooperatively at checkpoints such as the
+    shared AST traversal. In pool worker processes a SIGALRM timer also
+    interrupts code between checkpoints, and RLIMIT_AS caps memory at the
+    current size plus memory_mb. Nested budgets keep the outer one.
+
+    Elsewhere, e.g. /analyze or a small batch run in the request thread,
+    there is no hard cap: a single ast.parse or radon call on a
+    pathological file runs to completion and the deadline only fires at
+    the next checkpoint. The memory budget is not enforced there at all.
+    """
+    seconds = TIME_BUDGET if seconds is None else seconds
+    memory_mb = MEMORY_BUDGET_MB if memory_mb is None else memory_mb
+
+    if getattr(_state, 'deadline', None) is not None:
+        yield
+        return
+
+    worker = _in_worker_process()
+    previous_handler = None
+    previous_limit = None
+
+    if seconds > 0:
+        _state.seconds = seconds
+        _state.deadline = time.monotonic() + seconds
+        if worker and hasattr(signal, 'setitimer'):
+            previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+            signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    if memory_mb > 0 and worker and resource is not None:
+        used = _address_space()
+        if used is not None:
+            previous_limit = resource.getrlimit(resource.RLIMIT_AS)
+            limit = used + memory_mb * 1024 * 1024
+            hard = previous_limit[1]
+            resource.setrlimit(resource.RLIMIT_AS, (limit if hard == resource.RLIM_INFINITY else min(limit, hard), hard))
+
+    try:
+        yield
+    except MemoryError:
+        raise BudgetExceeded('memory', f'{memory_mb}MB')
+    finally:
+        if previous_handler is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if previous_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, previous_limit)
+        _state.deadline = None
@@ -0,0 +1,117 @@
+# infrastructure/cache.py
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from .telemetry import record_cache
+
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used mapping."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def config_fingerprint(config):
+    """Short stable hash of a scoring config, for use in cache keys."""
+    encoded = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def analysis_cache_key(code_hash, language, analyzer_version, config):
+    """Key a result by content hash, language, analyzer version and config."""
+    parts = [code_hash, language, str(analyzer_version), config_fingerprint(config)]
+    return hashlib.sha256(':'.join(parts).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier cache of analysis result dicts.
+
+    Results are kept as JSON in an in-process LRU, backed by an optional
+    persistent tier exposing get_many(keys) -> {key: str} and
+    set_many({key: str}), so a batch costs one round trip each way.
+    Every get returns a fresh dict, so callers may mutate it freely.
+    """
+
+    def __init__(self, maxsize=1024, tier=None):
+        self.memory = LRUCache(maxsize)
+        self.tier = tier
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Cached results of the given keys, as a dict of key -> results."""
+        payloads = {}
+        missing = []
+        for key in keys:
+            payload = self.memory.get(key)
+            if payload is None:
+                missing.append(key)
+            else:
+                payloads[key] = payload
+
+        if missing and self.tier is not None:
+            found = self.tier.get_many(missing)
+            for key in missing:
+                record_cache('analysis_db', key in found)
+            for key, payload in found.items():
+                self.memory.set(key, payload)
+            payloads.update(found)
+
+        for key in keys:
+            hit = key in payloads
+            record_cache('analysis', hit)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return {key: json.loads(payload) for key, payload in payloads.items()}
+
+    def set(self, key, results):
+        self.set_many({key: results})
+
+    def set_many(self, items):
+        """Store a dict of key -> results, overwriting existing entries."""
+        payloads = {key: json.dumps(results) for key, results in items.items()}
+        for key, payload in payloads.items():
+            self.memory.set(key, payload)
+        if payloads and self.tier is not None:
+            self.tier.set_many(payloads)
+
+    def clear(self):
+        self.memory.clear()
@@ -2,24 +2,42 @@ from .metrics.basic import (
     calculate_lines, calculate_complexity, calculate_maintainability, 
     calculate_comment_density, calculate_function_length
 )
-from .metrics.ast_analysis import calculate_duplication_ast, calculate_naming_quality, calculate_cognitive_complexity, calculate_nesting_depth
+from .metrics.ast_analysis import calculate_duplication_ast, calculate_naming_quality, calculate_cognitive_complexity, calculate_nesting_depth, calculate_clone_blocks, expand_name_lengths
+from .budget import checkpoint
+from .parsing import parse_unit
+from .telemetry import timed_stage
 from .scoring import calculate_readability_score, config
 
+#Bump whenever metric output changes so cached results are recomputed
+ANALYZER_VERSION = 5
+
+#Result keys kept for storage (e.g. the clone index) but not sent to clients
+INTERNAL_RESULT_KEYS = ('clone_blocks', 'name_length_counts')
+
+#Response formats: compact sends name length stats, full adds every length
+RESPONSE_FORMATS = ('compact', 'full')
+
+@timed_stage
 def analyze_code(code, language, user_config=None):
     current_config = user_config if user_config else config
 
+    #Parse once, every metric below reads from the same unit
+    unit = parse_unit(code)
+
     #Simple radon
-    lines = calculate_lines(code)
-    complexity = calculate_complexity(code)
-    maintainability = calculate_maintainability(code)
-    comment_density = calculate_comment_density(code)
-    function_length = calculate_function_length(code)
+    lines = calculate_lines(unit)
+    complexity = calculate_complexity(unit)
+    maintainability = calculate_maintainability(unit)
+    comment_density = calculate_comment_density(unit)
+    function_length = calculate_function_length(unit)
+    checkpoint()
 
     #Complex form AST
-    duplication_percentage, duplicated_blocks_info = calculate_duplication_ast(code)
-    naming_metrics = calculate_naming_quality(code)
-    nesting_metrics = calculate_nesting_depth(code)
-    cognitive_complexity = calculate_cognitive_complexity(code)
+    duplication_percentage, duplicated_blocks_info = calculate_duplication_ast(unit)
+    naming_metrics = calculate_naming_quality(unit)
+    nesting_metrics = calculate_nesting_depth(unit)
+    cognitive_complexity = calculate_cognitive_complexity(unit)
+    checkpoint()
 
     #Readability
     readability = calculate_readability_score(
@@ -47,8 +65,61 @@ def analyze_code(code, language, user_config=None):
         'avg_name_length': naming_metrics['avg_name_length'],
         'single_letter_warnings': naming_metrics['single_letter_warnings'],
         'unclear_name_flags': naming_metrics['unclear_name_flags'],
-        'sorted_name_lengths' : naming_metrics['sorted_name_lengths'],
+        'name_length_stats': naming_metrics['name_length_stats'],
+        'name_length_counts': naming_metrics['name_length_counts'],
         'max_nesting_depth': nesting_metrics['max_depth'],
         'avg_nesting_depth': nesting_metrics['avg_depth'],
-        'cognitive_complexity': cognitive_complexity
+        'cognitive_complexity': cognitive_complexity,
+
+        'clone_blocks': calculate_clone_blocks(unit)
+    }
+
+#Metrics stored for each function, method and class unit
+UNIT_METRIC_FIELDS = (
+    'lines_of_code',
+    'cyclomatic_complexity',
+    'maintainability_index',
+    'cognitive_complexity',
+    'max_nesting_depth',
+    'readability_score'
+)
+
+@timed_stage
+def analyze_unit(code):
+    """Score one unit's source like a file, without the file-level extras."""
+    unit = parse_unit(code)
+    unit.require_tree()
+
+    lines = calculate_lines(unit)
+    complexity = calculate_complexity(unit)
+    maintainability = calculate_maintainability(unit)
+    cognitive_complexity = calculate_cognitive_complexity(unit)
+    nesting_metrics = calculate_nesting_depth(unit)
+
+    return {
+        'lines_of_code': lines,
+        'cyclomatic_complexity': complexity,
+        'maintainability_index': maintainability,
+        'cognitive_complexity': cognitive_complexity,
+        'max_nesting_depth': nesting_metrics['max_depth'],
+        'readability_score': calculate_readability_score(
+            lines,
+            complexity,
+            maintainability,
+            cognitive_complexity,
+            nesting_metrics['max_depth'],
+            nesting_metrics['avg_depth'],
+            calculate_comment_density(unit),
+            calculate_naming_quality(unit)['avg_name_length']
+        )
     }
+
+def public_results(results, response_format='compact'):
+    """Copy of an analyze_code result without the internal keys.
+
+    The full format also lists every name length as sorted_name_lengths.
+    """
+    public = {key: value for key, value in results.items() if key not in INTERNAL_RESULT_KEYS}
+    if response_format == 'full':
+        public['sorted_name_lengths'] = expand_name_lengths(results.get('name_length_counts') or [])
+    return public
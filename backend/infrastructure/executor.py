@@ -0,0 +1,100 @@
+# infrastructure/executor.py
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .budget import analysis_budget
+from .code_analyzer import analyze_code, analyze_unit
+
+
+def analyze_task(task):
+    """Analyze one (code, language) pair and return (results, error).
+
+    Errors are returned rather than raised so one bad file does not abort
+    the rest of a batch running in a worker process. Each file runs under
+    the analysis budget; files over it get BudgetExceeded's 'skipped:
+    budget exceeded' message as their error, like any other failure.
+    """
+    code, language = task
+    try:
+        with analysis_budget():
+            return analyze_code(code, language), None
+    except Exception as e:
+        return None, str(e)
+
+def analyze_unit_task(code):
+    """Analyze one unit's source and return (results, error), like analyze_task."""
+    try:
+        with analysis_budget():
+            return analyze_unit(code), None
+    except Exception as e:
+        return None, str(e)
+
+
+class SerialExecutor:
+    """Runs tasks one after another in the calling thread."""
+
+    def map(self, fn, items):
+        return [fn(item) for item in items]
+
+    def shutdown(self):
+        pass
+
+
+class ProcessPoolAnalysisExecutor:
+    """Fans tasks out to a lazily created, reused process pool.
+
+    Small batches run serially, since starting work in another process
+    costs more than analyzing a handful of files. Those run in the calling
+    thread with only the cooperative budget deadline, the hard time and
+    memory limits apply in pool workers. Results keep input order.
+    """
+
+    def __init__(self, max_workers=None, chunksize=8, min_items=16):
+        self.max_workers = max_workers
+        self.chunksize = chunksize
+        self.min_items = min_items
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # forkserver avoids forking a multi-threaded web worker
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self._pool
+
+    def map(self, fn, items):
+        items = list(items)
+        if len(items) < self.min_items:
+            return [fn(item) for item in items]
+        return list(self._get_pool().map(fn, items, chunksize=self.chunksize))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def create_executor(workers=None, chunksize=8, min_items=16):
+    """Build an executor; one worker (or fewer) means serial execution."""
+    if workers is not None and workers <= 1:
+        return SerialExecutor()
+    return ProcessPoolAnalysisExecutor(workers, chunksize, min_items)
+
+
+def iter_batches(iterable, size):
+    """Yield lists of up to size items, consuming iterable lazily."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,9 +1,16 @@
 # infrastructure/metrics/ast_analysis.py
 
 import ast
+import math
 from collections import defaultdict
+from hashlib import blake2b
 
-def get_ast_fingerprint(node): #Creates a AST for the code
+from ..parsing import parse_unit
+from ..telemetry import timed_stage
+from .engine import MetricVisitor, register_visitor, run_visitors, visitor_results
+from .minhash import minhash_signature, lsh_bands
+
+def get_ast_fingerprint(node): #Readable nested-tuple fingerprint, for reporting and debugging
     if isinstance(node, ast.Name):
         return (type(node).__name__, node.ctx.__class__.__name__, "$NAME$")
     
@@ -17,86 +24,317 @@ def get_ast_fingerprint(node): #Creates a AST for the code
     )
     return (node_type, children)
 
-def calculate_duplication_ast(code): #Duplicated code
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
-        return 0.0, []
+# Structural hashes: 16-byte blake2b digests built bottom-up from child digests.
+# Names and constants are normalised the same way get_ast_fingerprint does,
+# so two subtrees share a digest exactly when they share a fingerprint.
+DIGEST_SIZE = 16
+_leaf_digests = {}
+_type_prefixes = {}
+
+def _hash(data):
+    return blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+def _leaf_digest(key, label):
+    digest = _leaf_digests.get(key)
+    if digest is None:
+        digest = _leaf_digests[key] = _hash(label.encode())
+    return digest
+
+def get_ast_digest(node):
+    """Structural hash of a subtree; equal digests mean equal fingerprints."""
+    visitor = _DigestVisitor()
+    run_visitors(node, [visitor])
+    return visitor.result()
+
+
+class _DigestVisitor(MetricVisitor):
+    #Post-order hashing: child digests pile up on a stack and each node folds
+    #its own children into one digest when it is left, so every node is
+    #hashed exactly once whatever the nesting
+    name = 'digest'
+
+    def __init__(self):
+        self.values = []
+        self.frames = []
+
+    def enter_handlers(self):
+        return {ast.AST: self.enter_node}
+
+    def leave_handlers(self):
+        return {ast.AST: self.leave_node}
+
+    def enter_node(self, node, depth):
+        self.frames.append(len(self.values))
+
+    def leave_node(self, node, depth):
+        values = self.values
+        start = self.frames.pop()
+        node_type = type(node)
+
+        if node_type is ast.Name:
+            #Only the context counts, the identifier is ignored
+            ctx_name = type(node.ctx).__name__
+            digest = _leaf_digest((node_type, ctx_name), f'Name\0{ctx_name}\0$NAME$')
+            del values[start:]
+        elif len(values) == start:
+            label = 'Constant\0$CONST$' if node_type is ast.Constant else node_type.__name__
+            digest = _leaf_digest(node_type, label)
+        else:
+            prefix = _type_prefixes.get(node_type)
+            if prefix is None:
+                prefix = _type_prefixes[node_type] = node_type.__name__.encode() + b'\0\0'
+            digest = _hash(prefix + b''.join(values[start:]))
+            del values[start:]
+
+        values.append(digest)
+
+    def result(self):
+        return self.values[-1] if self.values else None
+
+
+#Functions shorter than this are too generic to report as cross-file clones
+CLONE_MIN_LINES = 5
+#Near-clone bands need enough distinct statement pairs to be meaningful
+CLONE_MIN_SHINGLES = 3
+
+STATEMENT_NODES = tuple(
+    node_type for node_type in vars(ast).values()
+    if isinstance(node_type, type) and issubclass(node_type, ast.stmt) and node_type is not ast.stmt
+)
+
+@register_visitor
+class DuplicationVisitor(_DigestVisitor):
+    name = 'duplication'
+    BLOCK_NODES = (ast.FunctionDef, ast.ClassDef, ast.If, ast.For)
+    CLONE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+        self.open_blocks = []
+        #Digests of every statement left so far, the shingles for near-clones
+        self.statements = []
+        self.open_functions = []
+        self.clone_blocks = []
+
+    def enter_handlers(self):
+        return {
+            ast.AST: self.enter_node,
+            self.BLOCK_NODES: self.visit_block,
+            self.CLONE_NODES: self.visit_function
+        }
+
+    def leave_handlers(self):
+        #Order matters: a function collects its statements before adding itself
+        return {
+            ast.AST: self.leave_node,
+            self.BLOCK_NODES: self.leave_block,
+            self.CLONE_NODES: self.leave_function,
+            STATEMENT_NODES: self.leave_statement
+        }
+
+    def visit_function(self, node, depth):
+        self.open_functions.append(len(self.statements))
+
+    def leave_function(self, node, depth):
+        start = self.open_functions.pop()
+        if node.end_lineno - node.lineno + 1 < CLONE_MIN_LINES:
+            return
+
+        #Consecutive statement pairs, so shared one-liners alone do not match
+        statements = self.statements[start:]
+        shingles = {_hash(first + second) for first, second in zip(statements, statements[1:])}
+        signature = minhash_signature(shingles) if len(shingles) >= CLONE_MIN_SHINGLES else []
+        self.clone_blocks.append({
+            'hash': self.values[-1].hex(),
+            'name': node.name,
+            'start_line': node.lineno,
+            'end_line': node.end_lineno,
+            'bands': lsh_bands(signature)
+        })
+
+    def leave_statement(self, node, depth):
+        self.statements.append(self.values[-1])
+
+    def visit_block(self, node, depth):
+        block = [depth, len(self.blocks), node, None]
+        self.blocks.append(block)
+        self.open_blocks.append(block)
+
+    def leave_block(self, node, depth):
+        #leave_node has already pushed this block's digest
+        self.open_blocks.pop()[3] = self.values[-1]
+
+    def result(self):
+        #Breadth-first order, so the shallowest copy counts as the original
+        ordered = sorted(self.blocks, key=lambda block: block[:2])
+
+        fingerprints = defaultdict(list)
+        total_relevant_lines = 0
+
+        for _, _, node, digest in ordered:
+            fingerprints[digest].append(node)
 
-    fingerprints = defaultdict(list)
-    total_relevant_lines = 0
-    
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.If, ast.For)):
-            fingerprint = get_ast_fingerprint(node)
-            fingerprints[fingerprint].append(node)
-            
             if hasattr(node, 'lineno') and hasattr(node, 'end_lineno'):
                 total_relevant_lines += (node.end_lineno - node.lineno + 1)
 
-    duplicated_lines_count = 0
-    duplicated_blocks_info = []
+        duplicated_lines_count = 0
+        duplicated_blocks_info = []
+
+        for fingerprint, nodes in fingerprints.items():
+            if len(nodes) > 1:
+                for node in nodes[1:]:
+                    if hasattr(node, 'lineno') and hasattr(node, 'end_lineno'):
+                        duplicated_lines_count += (node.end_lineno - node.lineno + 1)
+                        duplicated_blocks_info.append(f"Block near line {node.lineno} duplicated.")
+
+        if total_relevant_lines == 0:
+            duplication_percentage = 0.0
+            duplicated_blocks_info = []
+        else:
+            duplication_percentage = round((duplicated_lines_count / total_relevant_lines) * 100, 2)
 
-    for fingerprint, nodes in fingerprints.items():
-        if len(nodes) > 1:
-            for node in nodes[1:]: 
-                if hasattr(node, 'lineno') and hasattr(node, 'end_lineno'):
-                    duplicated_lines_count += (node.end_lineno - node.lineno + 1)
-                    duplicated_blocks_info.append(f"Block near line {node.lineno} duplicated.")
+        return {
+            'percentage': duplication_percentage,
+            'blocks_info': duplicated_blocks_info,
+            'clone_blocks': self.clone_blocks
+        }
 
-    if total_relevant_lines == 0:
+@timed_stage
+def calculate_duplication_ast(source): #Duplicated code
+    unit = parse_unit(source)
+    if unit.tree is None:
         return 0.0, []
-        
-    duplication_percentage = (duplicated_lines_count / total_relevant_lines) * 100
-    
-    return round(duplication_percentage, 2), duplicated_blocks_info
 
-class VariableNameVisitor(ast.NodeVisitor):
-    
+    duplication = visitor_results(unit)[DuplicationVisitor.name]
+    return duplication['percentage'], duplication['blocks_info']
+
+@timed_stage
+def calculate_clone_blocks(source):
+    """
+    Function-level blocks for the cross-file clone index
+
+    Each entry has the function's structural hash (exact clones), its
+    position and the LSH band keys of its MinHash signature (near-clones).
+    """
+    unit = parse_unit(source)
+    if unit.tree is None:
+        return []
+
+    return list(visitor_results(unit)[DuplicationVisitor.name]['clone_blocks'])
+
+@register_visitor
+class VariableNameVisitor(MetricVisitor):
+    name = 'naming'
+
     def __init__(self):
         self.all_names = []
         self.single_letter_warnings = []
         self.unclear_names = []
-        self.name_lengths = []
+        # name_length_counts[n] is how many Name nodes are n characters long
+        self.name_length_counts = []
+
+    def enter_handlers(self):
+        return {
+            ast.Name: self.visit_Name,
+            ast.FunctionDef: self.visit_FunctionDef
+        }
 
-    def visit_Name(self, node):
+    def visit_Name(self, node, depth):
         name = node.id
         self.all_names.append(name)
-        self.name_lengths.append(len(name))
-        
+
+        length = len(name)
+        counts = self.name_length_counts
+        if length >= len(counts):
+            counts.extend([0] * (length + 1 - len(counts)))
+        counts[length] += 1
+
         # Flag single-letter variables unless they are common loop indices
         if len(name) == 1 and name not in ('i', 'j', 'k', 'n', 'e', 'x', 'y'):
             # Only flag names used for assigning or loading (not built-in context)
             if isinstance(node.ctx, (ast.Load, ast.Store)):
                 self.single_letter_warnings.append(name)
-        
-        self.generic_visit(node)
 
-    def visit_FunctionDef(self, node):
+    def visit_FunctionDef(self, node, depth):
         # Analyze argument names
         for arg in node.args.args:
             name = arg.arg
             self.all_names.append(name)
             if len(name) == 1 and name not in ('a', 'b', 'c', 'x', 'y'):
                 self.single_letter_warnings.append(name)
-        self.generic_visit(node)
 
-def calculate_naming_quality(code):
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
+    def result(self):
+        return {
+            'all_names': self.all_names,
+            'single_letter_warnings': self.single_letter_warnings,
+            'name_length_counts': self.name_length_counts
+        }
+
+#Fixed (min, max) length buckets of the name length histogram, None is open-ended
+NAME_LENGTH_BUCKETS = ((1, 1), (2, 2), (3, 3), (4, 5), (6, 7), (8, 10), (11, 15), (16, 20), (21, 30), (31, None))
+NAME_LENGTH_QUANTILES = (('p25', 0.25), ('median', 0.5), ('p75', 0.75), ('p90', 0.9))
+
+def name_length_summary(counts):
+    """
+    Histogram and quantiles of name lengths from their counting array
+
+    Args:
+        counts: List where counts[n] is the number of names of length n
+
+    Returns:
+        Dict with count, min, max, nearest-rank quantiles and a histogram
+        of NAME_LENGTH_BUCKETS as [{'min', 'max', 'count'}]
+    """
+    total = sum(counts)
+    summary = {'count': total, 'min': None, 'max': None}
+    summary.update({label: None for label, _ in NAME_LENGTH_QUANTILES})
+    histogram = [{'min': low, 'max': high, 'count': 0} for low, high in NAME_LENGTH_BUCKETS]
+    summary['histogram'] = histogram
+    if not total:
+        return summary
+
+    # Rank (1-based) each quantile falls on in the sorted lengths
+    ranks = [(label, max(1, math.ceil(q * total))) for label, q in NAME_LENGTH_QUANTILES]
+    seen = 0
+    bucket = 0
+    for length, count in enumerate(counts):
+        if not count:
+            continue
+        if summary['min'] is None:
+            summary['min'] = length
+        summary['max'] = length
+        seen += count
+        while ranks and ranks[0][1] <= seen:
+            summary[ranks.pop(0)[0]] = length
+
+        while bucket < len(histogram) - 1 and histogram[bucket]['max'] < length:
+            bucket += 1
+        histogram[bucket]['count'] += count
+
+    return summary
+
+def expand_name_lengths(counts):
+    """Sorted list of every name length, rebuilt from the counting array."""
+    return [length for length, count in enumerate(counts) for _ in range(count)]
+
+@timed_stage
+def calculate_naming_quality(source):
+    unit = parse_unit(source)
+    if unit.tree is None:
         return {
             'avg_name_length': 0.0, 
             'single_letter_warnings': [], 
-            'unclear_name_flags': []
+            'unclear_name_flags': [],
+            'name_length_counts': [],
+            'name_length_stats': name_length_summary([])
         }
 
-    visitor = VariableNameVisitor()
-    visitor.visit(tree)
+    names = visitor_results(unit)[VariableNameVisitor.name]
 
     # 1. Calculate Average Length
     # Exclude Python's standard dunder names (e.g., __name__, __init__)
-    meaningful_names = [name for name in visitor.all_names if not name.startswith('__')]
+    meaningful_names = [name for name in names['all_names'] if not name.startswith('__')]
     
     if not meaningful_names:
         avg_length = 0.0
@@ -116,12 +354,15 @@ def calculate_naming_quality(code):
     # 3. Compile and return results
     return {
         'avg_name_length': round(avg_length, 2),
-        'single_letter_warnings': list(set(visitor.single_letter_warnings)),
+        'single_letter_warnings': list(set(names['single_letter_warnings'])),
         'unclear_name_flags': list(set(unclear_flags)),
-        'sorted_name_lengths': sorted(visitor.name_lengths)
+        'name_length_counts': names['name_length_counts'],
+        'name_length_stats': name_length_summary(names['name_length_counts'])
     }
 
-class NestingDepthVisitor(ast.NodeVisitor):
+@register_visitor
+class NestingDepthVisitor(MetricVisitor):
+    name = 'nesting'
     NESTING_NODES = (ast.If, ast.For, ast.While, ast.With, ast.Try, 
                      ast.ExceptHandler, ast.FunctionDef, ast.AsyncFor, ast.AsyncWith)
     
@@ -129,63 +370,78 @@ class NestingDepthVisitor(ast.NodeVisitor):
         self.max_depth = 0
         self.current_depth = 0
         self.depth_counts = []
-    
-    def visit(self, node):
-        if isinstance(node, self.NESTING_NODES):
-            self.current_depth += 1
-            self.max_depth = max(self.max_depth, self.current_depth)
-            self.depth_counts.append(self.current_depth)
-            self.generic_visit(node)
-            self.current_depth -= 1
-        else:
-            self.generic_visit(node)
 
-def calculate_nesting_depth(code):
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
+    def enter_handlers(self):
+        return {self.NESTING_NODES: self.enter_block}
+
+    def leave_handlers(self):
+        return {self.NESTING_NODES: self.leave_block}
+
+    def enter_block(self, node, depth):
+        self.current_depth += 1
+        self.max_depth = max(self.max_depth, self.current_depth)
+        self.depth_counts.append(self.current_depth)
+
+    def leave_block(self, node, depth):
+        self.current_depth -= 1
+
+    def result(self):
+        avg_depth = sum(self.depth_counts) / len(self.depth_counts) if self.depth_counts else 0.0
+
+        return {
+            'max_depth': self.max_depth,
+            'avg_depth': round(avg_depth, 2)
+        }
+
+@timed_stage
+def calculate_nesting_depth(source):
+    unit = parse_unit(source)
+    if unit.tree is None:
         return {'max_depth': 0, 'avg_depth': 0.0}
-    
-    visitor = NestingDepthVisitor()
-    visitor.visit(tree)
-    
-    avg_depth = sum(visitor.depth_counts) / len(visitor.depth_counts) if visitor.depth_counts else 0.0
-    
-    return {
-        'max_depth': visitor.max_depth,
-        'avg_depth': round(avg_depth, 2)
-    }
+
+    return dict(visitor_results(unit)[NestingDepthVisitor.name])
 
 
-class CognitiveComplexityVisitor(ast.NodeVisitor):
+@register_visitor
+class CognitiveComplexityVisitor(MetricVisitor):
+    name = 'cognitive_complexity'
     NESTING_NODES = (ast.If, ast.For, ast.While, ast.Try)
+    INCREMENT_NODES = (ast.ExceptHandler, ast.Lambda, ast.ListComp, ast.DictComp)
     
     def __init__(self):
         self.complexity = 0
         self.nesting_level = 0
-    
-    def visit(self, node):
-        if isinstance(node, self.NESTING_NODES):
-            self.complexity += 1 + self.nesting_level
-            self.nesting_level += 1
-            self.generic_visit(node)
-            self.nesting_level -= 1
-        elif isinstance(node, (ast.ExceptHandler, ast.Lambda, ast.ListComp, ast.DictComp)):
-            self.complexity += 1 + self.nesting_level
-            self.generic_visit(node)
-        elif isinstance(node, ast.BoolOp):
-            self.complexity += len(node.values) - 1 + self.nesting_level
-            self.generic_visit(node)
-        else:
-            self.generic_visit(node)
 
-def calculate_cognitive_complexity(code):
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
+    def enter_handlers(self):
+        return {
+            self.NESTING_NODES: self.enter_nesting,
+            self.INCREMENT_NODES: self.visit_increment,
+            ast.BoolOp: self.visit_BoolOp
+        }
+
+    def leave_handlers(self):
+        return {self.NESTING_NODES: self.leave_nesting}
+
+    def enter_nesting(self, node, depth):
+        self.complexity += 1 + self.nesting_level
+        self.nesting_level += 1
+
+    def leave_nesting(self, node, depth):
+        self.nesting_level -= 1
+
+    def visit_increment(self, node, depth):
+        self.complexity += 1 + self.nesting_level
+
+    def visit_BoolOp(self, node, depth):
+        self.complexity += len(node.values) - 1 + self.nesting_level
+
+    def result(self):
+        return self.complexity
+
+@timed_stage
+def calculate_cognitive_complexity(source):
+    unit = parse_unit(source)
+    if unit.tree is None:
         return 0
-    
-    visitor = CognitiveComplexityVisitor()
-    visitor.visit(tree)
-    return visitor.complexity
 
+    return visitor_results(unit)[CognitiveComplexityVisitor.name]
@@ -1,49 +1,55 @@
-from radon.raw import analyze
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
+from ..parsing import parse_unit
+from ..telemetry import timed_stage
 
-def calculate_lines(code):
-    raw_metrics = analyze(code)
+#Every metric accepts raw code or a ParsedUnit shared across metrics
+
+@timed_stage
+def calculate_lines(source):
+    raw_metrics = parse_unit(source).raw
     return raw_metrics.sloc
 
-def calculate_complexity(code):
-    complexity_results = cc_visit(code)
-    
+@timed_stage
+def calculate_complexity(source):
+    complexity_results = parse_unit(source).cc_blocks
+
     if complexity_results:
         avg_complexity = sum(result.complexity for result in complexity_results) / len(complexity_results)
         return round(avg_complexity, 2)
     return 0
 
-def calculate_maintainability(code):
-    mi_score = mi_visit(code, multi=True)
-    
+@timed_stage
+def calculate_maintainability(source):
+    mi_score = parse_unit(source).maintainability(multi=True)
+
     if mi_score:
         return round(mi_score, 2)
     return 0
 
-def calculate_comment_density(code):
-    raw_metrics = analyze(code)
-    
+@timed_stage
+def calculate_comment_density(source):
+    raw_metrics = parse_unit(source).raw
+
     total_lines = raw_metrics.loc
     comment_lines = raw_metrics.comments
-    
+
     if total_lines > 0:
         density = (comment_lines / total_lines) * 100
         return round(density, 2)
     return 0
 
-def calculate_function_length(code):
-    complexity_results = cc_visit(code)
-    
+@timed_stage
+def calculate_function_length(source):
+    complexity_results = parse_unit(source).cc_blocks
+
     if complexity_results:
         function_lengths = [result.endline - result.lineno + 1 for result in complexity_results]
-        
+
         avg_length = sum(function_lengths) / len(function_lengths)
         max_length = max(function_lengths)
-        
+
         return {
             'avg': round(avg_length, 2),
             'max': max_length
         }
-    
-    return {'avg': 0, 'max': 0}
\ No newline at end of file
+
+    return {'avg': 0, 'max': 0}
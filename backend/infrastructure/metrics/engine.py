@@ -0,0 +1,115 @@
+# infrastructure/metrics/engine.py
+
+import ast
+
+from ..budget import checkpoint, current_deadline
+from ..telemetry import stage_timer
+
+#Nodes walked between checks of the analysis deadline
+CHECKPOINT_INTERVAL = 1024
+
+_registered_visitors = []
+
+def register_visitor(visitor_class):
+    """Add a MetricVisitor subclass to the shared traversal.
+
+    Usable as a class decorator. Plugins register the same way and are fed
+    by the existing pass instead of walking the tree again.
+    """
+    if visitor_class not in _registered_visitors:
+        _registered_visitors.append(visitor_class)
+    return visitor_class
+
+def registered_visitors():
+    return list(_registered_visitors)
+
+
+class MetricVisitor:
+    """Base class for metrics computed in the shared AST traversal.
+
+    Subclasses map node types (or tuples of them) to callbacks in
+    enter_handlers/leave_handlers. Callbacks receive the node and its depth
+    in the tree. Registering ast.AST hooks every node.
+    """
+    name = None
+
+    def enter_handlers(self):
+        return {}
+
+    def leave_handlers(self):
+        return {}
+
+    def result(self):
+        raise NotImplementedError
+
+
+class _Dispatch:
+    #Maps concrete node types to their callbacks, resolved once per type
+
+    def __init__(self, visitors, handlers_attr):
+        self.handlers = {}
+        for visitor in visitors:
+            for node_types, callback in getattr(visitor, handlers_attr)().items():
+                if not isinstance(node_types, tuple):
+                    node_types = (node_types,)
+                for node_type in node_types:
+                    self.handlers.setdefault(node_type, []).append(callback)
+        self.resolved = {}
+
+    def get(self, node_type):
+        callbacks = self.resolved.get(node_type)
+        if callbacks is None:
+            #Catch-all ast.AST callbacks run before type-specific ones
+            callbacks = self.handlers.get(ast.AST, []) + self.handlers.get(node_type, [])
+            self.resolved[node_type] = callbacks
+        return callbacks
+
+
+def run_visitors(tree, visitors):
+    """Walk tree once, depth-first, feeding every visitor's callbacks.
+
+    The walk is iterative so deeply nested code cannot hit the recursion
+    limit. Checks the current analysis budget every CHECKPOINT_INTERVAL
+    nodes. Returns a dict of visitor name -> result.
+    """
+    deadline = current_deadline()
+    countdown = CHECKPOINT_INTERVAL
+    enter = _Dispatch(visitors, 'enter_handlers')
+    leave = _Dispatch(visitors, 'leave_handlers')
+
+    #(node, depth, leaving) - a node is pushed again to fire its leave callbacks
+    stack = [(tree, 0, False)]
+    while stack:
+        node, depth, leaving = stack.pop()
+        node_type = type(node)
+
+        if deadline is not None:
+            countdown -= 1
+            if not countdown:
+                countdown = CHECKPOINT_INTERVAL
+                checkpoint()
+
+        if leaving:
+            for callback in leave.get(node_type):
+                callback(node, depth)
+            continue
+
+        for callback in enter.get(node_type):
+            callback(node, depth)
+
+        if leave.get(node_type):
+            stack.append((node, depth, True))
+
+        children = list(ast.iter_child_nodes(node))
+        for child in reversed(children):
+            stack.append((child, depth + 1, False))
+
+    return {visitor.name: visitor.result() for visitor in visitors}
+
+def visitor_results(unit):
+    """Run every registered visitor over a ParsedUnit once and cache the results."""
+    if unit.visitor_results is None:
+        visitors = [visitor_class() for visitor_class in _registered_visitors]
+        with stage_timer('shared_traversal'):
+            unit.visitor_results = run_visitors(unit.require_tree(), visitors)
+    return unit.visitor_results
@@ -0,0 +1,41 @@
+# infrastructure/metrics/minhash.py
+
+from hashlib import blake2b
+
+# 32 permutations in 8 bands of 4 rows: blocks whose shingle sets have a
+# Jaccard similarity around 0.6 or more usually share at least one band
+NUM_PERMUTATIONS = 32
+BAND_ROWS = 4
+
+_PRIME = (1 << 61) - 1
+
+def _coefficient(label, index):
+    #Derived from a fixed hash, so signatures are stable across processes and releases
+    digest = blake2b(f'{label}{index}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % _PRIME
+
+_PERMUTATIONS = [
+    (_coefficient('a', index) | 1, _coefficient('b', index))
+    for index in range(NUM_PERMUTATIONS)
+]
+
+def minhash_signature(shingles):
+    """MinHash signature of a set of byte-string shingles (e.g. subtree digests)."""
+    values = {int.from_bytes(shingle[:8], 'big') for shingle in shingles}
+    if not values:
+        return []
+
+    return [
+        min((a * value + b) % _PRIME for value in values)
+        for a, b in _PERMUTATIONS
+    ]
+
+def lsh_bands(signature, rows=BAND_ROWS):
+    """Hash each band of a signature; equal band keys mark candidate near-clones."""
+    bands = []
+    for index in range(0, len(signature), rows):
+        data = index.to_bytes(2, 'big') + b''.join(
+            value.to_bytes(8, 'big') for value in signature[index:index + rows]
+        )
+        bands.append(blake2b(data, digest_size=8).hexdigest())
+    return bands
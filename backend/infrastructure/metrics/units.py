@@ -0,0 +1,92 @@
+# infrastructure/metrics/units.py
+
+import ast
+import textwrap
+from hashlib import blake2b
+
+from ..parsing import parse_unit
+from ..telemetry import timed_stage
+
+UNIT_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _unit_hash(node):
+    # ast.dump leaves out positions, so comments, blank lines and
+    # reindentation do not change a unit's identity
+    return blake2b(ast.dump(node).encode(), digest_size=16).hexdigest()
+
+def _class_shell(node):
+    # The class without its methods and nested classes, which are units of their own
+    shell = ast.ClassDef(**{field: getattr(node, field) for field in node._fields})
+    shell.body = [child for child in node.body if not isinstance(child, (ast.ClassDef, *UNIT_FUNCTIONS))]
+    return shell
+
+def _start_line(node):
+    return min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+
+@timed_stage
+def extract_units(source):
+    """
+    Split a module into function, method and class analysis units
+
+    Functions nested in a function belong to it. A class unit covers the
+    class body without its methods and nested classes.
+
+    Returns:
+        List of dicts with name (qualified, '#n' appended to repeats),
+        kind, start_line, end_line, hash of the normalized AST and, for
+        classes, the (start, end) line ranges of the excluded members
+    """
+    unit = parse_unit(source)
+    if unit.tree is None:
+        return []
+
+    units = []
+    seen = {}
+
+    def add(node, kind, name, exclude=None):
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f'{name}#{seen[name]}'
+
+        entry = {
+            'name': name,
+            'kind': kind,
+            'start_line': _start_line(node),
+            'end_line': node.end_lineno,
+            'hash': _unit_hash(_class_shell(node) if kind == 'class' else node)
+        }
+        if exclude is not None:
+            entry['exclude'] = exclude
+        units.append(entry)
+
+    def visit(body, prefix, in_class):
+        for node in body:
+            if isinstance(node, UNIT_FUNCTIONS):
+                add(node, 'method' if in_class else 'function', prefix + node.name)
+            elif isinstance(node, ast.ClassDef):
+                members = [child for child in node.body if isinstance(child, (ast.ClassDef, *UNIT_FUNCTIONS))]
+                add(node, 'class', prefix + node.name, [[_start_line(child), child.end_lineno] for child in members])
+                visit(node.body, f'{prefix}{node.name}.', True)
+
+    visit(unit.tree.body, '', False)
+    return units
+
+def unit_source(lines, unit):
+    """
+    Dedented source of a unit from the file's lines
+
+    Excluded class members are replaced by a `pass` at their indentation,
+    so a class made only of methods still parses.
+    """
+    start, end = unit['start_line'], unit['end_line']
+    selected = []
+    line_number = start
+    for start_excluded, end_excluded in unit.get('exclude', ()):
+        selected.extend(lines[line_number - 1:start_excluded - 1])
+        first = lines[start_excluded - 1]
+        selected.append(first[:len(first) - len(first.lstrip())] + 'pass')
+        line_number = end_excluded + 1
+    selected.extend(lines[line_number - 1:end])
+
+    return textwrap.dedent('\n'.join(selected)) + '\n'
@@ -0,0 +1,71 @@
+# infrastructure/parsing.py
+
+import ast
+from functools import cached_property
+
+from radon.raw import analyze
+from radon.metrics import h_visit_ast, mi_compute
+from radon.visitors import ComplexityVisitor
+
+from .telemetry import stage_timer
+
+
+class ParsedUnit:
+    """Source code parsed once and shared by every metric.
+
+    The AST is built eagerly; radon's raw metrics and complexity blocks are
+    computed on first access and then reused.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.syntax_error = None
+        #Filled by metrics.engine.visitor_results after the shared traversal
+        self.visitor_results = None
+        try:
+            self.tree = ast.parse(code)
+        except SyntaxError as e:
+            self.tree = None
+            self.syntax_error = e
+
+    def require_tree(self):
+        #Radon metrics cannot work without a tree, fail like radon would
+        if self.tree is None:
+            raise self.syntax_error
+        return self.tree
+
+    @cached_property
+    def raw(self):
+        return analyze(self.code)
+
+    @cached_property
+    def complexity_visitor(self):
+        return ComplexityVisitor.from_ast(self.require_tree())
+
+    @property
+    def cc_blocks(self):
+        return self.complexity_visitor.blocks
+
+    @cached_property
+    def halstead(self):
+        return h_visit_ast(self.require_tree())
+
+    def maintainability(self, multi=True):
+        #Same inputs as radon.metrics.mi_parameters, without re-parsing
+        raw = self.raw
+        comment_lines = raw.comments + (raw.multi if multi else 0)
+        comments = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+        return mi_compute(
+            self.halstead.total.volume,
+            self.complexity_visitor.total_complexity,
+            raw.lloc,
+            comments
+        )
+
+
+def parse_unit(source):
+    """Return a ParsedUnit for source, which may already be one."""
+    if isinstance(source, ParsedUnit):
+        return source
+    with stage_timer('parse'):
+        return ParsedUnit(source)
@@ -0,0 +1,116 @@
+# infrastructure/profiling.py
+
+import cProfile
+import io
+import os
+import pstats
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from .telemetry import recording_stages
+
+#Optional cProfile output: pstats text in the response, or a saved .prof file
+PROFILE_FORMATS = ('pstats', 'prof')
+
+#Functions listed in a pstats summary
+PSTATS_LIMIT = 30
+
+
+class RequestProfile:
+    """
+    Timing breakdown of one request, collected in the current thread
+
+    Work is grouped into named sections (e.g. analysis, persistence). Each
+    section lists the analysis stages timed inside it: parse, the shared
+    traversal, every metric function and scoring. Stage times are
+    inclusive, so a metric that triggers the shared traversal includes it.
+    With a profile_format the whole request also runs under cProfile.
+    """
+
+    def __init__(self, profile_format=None):
+        self.profile_format = profile_format
+        self.sections = []
+        self.elapsed = None
+        self._current = None
+        self._profiler = cProfile.Profile() if profile_format else None
+
+    def __enter__(self):
+        # Enabling fails first if another profiler is active in this thread
+        if self._profiler is not None:
+            self._profiler.enable()
+        self._recording = recording_stages(self._record)
+        self._recording.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profiler is not None:
+            self._profiler.disable()
+        self.elapsed = time.perf_counter() - self._started
+        self._recording.__exit__(*exc_info)
+        return False
+
+    def _record(self, stage, elapsed):
+        if self._current is not None:
+            timing = self._current['stages'].setdefault(stage, [0.0, 0])
+            timing[0] += elapsed
+            timing[1] += 1
+
+    @contextmanager
+    def section(self, name):
+        section = {'name': name, 'elapsed': 0.0, 'stages': {}}
+        self.sections.append(section)
+        previous, self._current = self._current, section
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            section['elapsed'] = time.perf_counter() - start
+            self._current = previous
+
+    def _pstats_summary(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(PSTATS_LIMIT)
+        return stream.getvalue()
+
+    def _save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'analyze-{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof')
+        self._profiler.dump_stats(path)
+        return path
+
+    def report(self, profile_dir=None):
+        """
+        JSON-ready breakdown, in milliseconds
+
+        Returns:
+            Dict with total_ms, the sections with their stages (ms and
+            calls) and, depending on profile_format, a pstats summary or
+            the path of the saved .prof file
+        """
+        report = {
+            'total_ms': round(self.elapsed * 1000, 3),
+            'sections': [
+                {
+                    'name': section['name'],
+                    'ms': round(section['elapsed'] * 1000, 3),
+                    'stages': {
+                        stage: {'ms': round(elapsed * 1000, 3), 'calls': calls}
+                        for stage, (elapsed, calls) in section['stages'].items()
+                    }
+                }
+                for section in self.sections
+            ]
+        }
+        if self.profile_format == 'pstats':
+            report['pstats'] = self._pstats_summary()
+        elif self.profile_format == 'prof':
+            report['prof_file'] = self._save(profile_dir)
+        return report
+
+
+def profile_section(profile, name):
+    """profile.section(name), or a no-op when the request is not profiled."""
+    return profile.section(name) if profile is not None else nullcontext()
@@ -1,3 +1,5 @@
+from .telemetry import timed_stage
+
 config = {
     'max_function_length': 40,
     'max_complexity': 10,
@@ -16,6 +18,7 @@ config = {
     }
 }
 
+@timed_stage
 def calculate_readability_score(lines, complexity, maintainability, cognitive_complexity, 
                                 max_nesting, avg_nesting, comment_density, avg_name_length):
     weights = config['readability_weights']
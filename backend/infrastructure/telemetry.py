@@ -0,0 +1,282 @@
+# infrastructure/telemetry.py
+
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+#Directory shared by every process (gunicorn workers, analysis pool
+#workers) for their metric snapshots. Unset keeps metrics per process.
+#Like any multiprocess metrics directory it should be emptied on deploy.
+METRICS_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+
+#Seconds, from a fast metric function to a slow repository scan request
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_metrics = {}
+#(metric name, label values) -> [value] for counters, or the bucket
+#counts followed by sum and count for histograms
+_values = {}
+_lock = threading.Lock()
+_dirty = False
+_flusher = None
+#Threads collecting their own stage timings, see recording_stages
+_recording = 0
+_recorders = threading.local()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def _entry(self, labels):
+        # Caller holds _lock
+        key = (self.name, tuple(str(labels[label]) for label in self.labelnames))
+        entry = _values.get(key)
+        if entry is None:
+            entry = _values[key] = self._empty()
+        return entry
+
+    def _labels(self, label_values, extra=()):
+        return tuple(zip(self.labelnames, label_values)) + extra
+
+    def _samples(self, label_values, entry):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count, exposed with a _total suffix."""
+
+    kind = 'counter'
+
+    def _empty(self):
+        return [0.0]
+
+    def inc(self, amount=1, **labels):
+        with _lock:
+            self._entry(labels)[0] += amount
+        _changed()
+
+    def _samples(self, label_values, entry):
+        yield f'{self.name}_total', self._labels(label_values), entry[0]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _empty(self):
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value, **labels):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._entry(labels)
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+        _changed()
+
+    @contextmanager
+    def timer(self, **labels):
+        """Observe the wall time of a block; also usable as a decorator."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, label_values, entry):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), entry):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            yield f'{self.name}_bucket', self._labels(label_values, (('le', le),)), cumulative
+        yield f'{self.name}_sum', self._labels(label_values), entry[-2]
+        yield f'{self.name}_count', self._labels(label_values), entry[-1]
+
+
+REQUESTS = Counter('http_requests', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time to build an HTTP response', ('endpoint', 'method'))
+ANALYSIS_STAGE_DURATION = Histogram(
+    'analysis_stage_duration_seconds',
+    'Run time of analysis stages and metric functions, including lazy work they trigger',
+    ('stage',)
+)
+DB_DURATION = Histogram('db_operation_duration_seconds', 'Session flush and commit durations', ('operation',))
+GIT_DURATION = Histogram('git_command_duration_seconds', 'git subprocess durations', ('command',))
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups by result', ('cache', 'result'))
+
+
+def observe_stage(stage, elapsed):
+    ANALYSIS_STAGE_DURATION.observe(elapsed, stage=stage)
+    # A single global check while nobody is recording
+    if _recording:
+        recorder = getattr(_recorders, 'current', None)
+        if recorder is not None:
+            recorder(stage, elapsed)
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block as an analysis stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def timed_stage(function):
+    """Decorator recording each call of function under its own stage name."""
+    stage = function.__name__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            observe_stage(stage, time.perf_counter() - start)
+    return wrapper
+
+@contextmanager
+def recording_stages(recorder):
+    """Also pass every stage timed in this thread to recorder(stage, elapsed)."""
+    global _recording
+    with _lock:
+        _recording += 1
+    previous = getattr(_recorders, 'current', None)
+    _recorders.current = recorder
+    try:
+        yield
+    finally:
+        _recorders.current = previous
+        with _lock:
+            _recording -= 1
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _snapshot_path():
+    return os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+
+def flush():
+    """Write this process's values to the shared directory, if there is one."""
+    global _dirty
+    if METRICS_DIR is None:
+        return
+    with _lock:
+        snapshot = [[name, list(label_values), list(entry)] for (name, label_values), entry in _values.items()]
+        _dirty = False
+
+    path = _snapshot_path()
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temporary, path)
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        if _dirty:
+            try:
+                flush()
+            except OSError:
+                pass
+
+def _changed():
+    # Snapshots are written by a background thread, never on the hot path
+    global _dirty, _flusher
+    _dirty = True
+    if METRICS_DIR is not None and _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+                _flusher.start()
+
+def _reset_after_fork():
+    # A forked child starts from zero, its parent keeps reporting its own values
+    global _dirty, _flusher, _lock, _recording
+    _lock = threading.Lock()
+    _values.clear()
+    _dirty = False
+    _flusher = None
+    _recording = 0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def collect():
+    """
+    Current values of every metric, summed across processes
+
+    Returns:
+        Dict of (metric name, label values) -> value list
+    """
+    if METRICS_DIR is None:
+        with _lock:
+            return {key: list(entry) for key, entry in _values.items()}
+
+    flush()
+    merged = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            # Removed or replaced while listing
+            continue
+        for name, label_values, entry in snapshot:
+            key = (name, tuple(label_values))
+            total = merged.get(key)
+            if total is None or len(total) != len(entry):
+                merged[key] = entry
+            else:
+                merged[key] = [a + b for a, b in zip(total, entry)]
+    return merged
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    values = collect()
+    by_metric = {}
+    for (name, label_values), entry in values.items():
+        by_metric.setdefault(name, []).append((label_values, entry))
+
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for label_values, entry in sorted(by_metric.get(name, [])):
+            for sample, labels, value in metric._samples(label_values, entry):
+                if labels:
+                    pairs = ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+                    sample = f'{sample}{{{pairs}}}'
+                lines.append(f'{sample} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+def clear():
+    """Reset this process's values, e.g. between tests."""
+    with _lock:
+        _values.clear()
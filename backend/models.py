@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import json
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
@@ -36,26 +37,42 @@ class Project(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     git_repo_path = db.Column(db.String(500)) 
     git_remote_url = db.Column(db.String(500)) 
     auto_detect_git = db.Column(db.Boolean, default=True)
+    last_scanned_commit = db.Column(db.String(40))
     
     files = db.relationship('ProjectFile', backref='project', lazy=True, cascade='all, delete-orphan')
+    scan_jobs = db.relationship('ScanJob', backref='project', lazy=True, cascade='all, delete-orphan')
+    rollups = db.relationship('MetricRollup', backref='project', lazy=True, cascade='all, delete-orphan')
 
-    def to_dict(self):
+    def to_dict(self, stats=None):
+        # stats is (file_count, avg_score, last_analyzed) when the caller
+        # already aggregated it; otherwise one COUNT query, never a file load
+        if stats is None:
+            stats = project_file_stats([self.id]).get(self.id)
+        file_count, avg_score, last_analyzed = stats or (0, None, None)
+        
         return {
             'id': self.id,
             'name': self.name,
             'created_at': self.created_at.isoformat(),
-            'file_count': len(self.files),
+            'file_count': file_count,
+            'avg_score': round(avg_score, 2) if avg_score is not None else None,
+            'last_analyzed': last_analyzed.isoformat() if last_analyzed else None,
             'git_repo_path': self.git_repo_path,
             'git_remote_url': self.git_remote_url,
-            'auto_detect_git': self.auto_detect_git
+            'auto_detect_git': self.auto_detect_git,
+            'last_scanned_commit': self.last_scanned_commit
         }
 
 class ProjectFile(db.Model):
     __tablename__ = 'project_files'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'filename', name='uq_project_files_project_filename'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -64,8 +81,13 @@ class ProjectFile(db.Model):
     current_score = db.Column(db.Float)
     last_analyzed = db.Column(db.DateTime)
     total_analyses = db.Column(db.Integer, default=0)
+    is_deleted = db.Column(db.Boolean, default=False)
+    # code_hash of the content the stored units were extracted from
+    units_hash = db.Column(db.String(64))
     
     analyses = db.relationship('FileAnalysis', backref='file', lazy=True, cascade='all, delete-orphan')
+    clone_blocks = db.relationship('CloneBlock', backref='file', lazy=True, cascade='all, delete-orphan')
+    units = db.relationship('CodeUnit', backref='file', lazy=True, cascade='all, delete-orphan')
     def to_dict(self):
         return {
             'id': self.id,
@@ -74,11 +96,33 @@ class ProjectFile(db.Model):
             'current_score': self.current_score,
             'last_analyzed': self.last_analyzed.isoformat() if self.last_analyzed else None,
             'total_analyses': self.total_analyses,
+            'is_deleted': bool(self.is_deleted),
             'project_id': self.project_id
         }
 
+def project_file_stats(project_ids):
+    """File count, average score and last analysis of live files per project, in one grouped query."""
+    if not project_ids:
+        return {}
+    
+    rows = db.session.query(
+        ProjectFile.project_id,
+        db.func.count(ProjectFile.id),
+        db.func.avg(ProjectFile.current_score),
+        db.func.max(ProjectFile.last_analyzed)
+    ).filter(
+        ProjectFile.project_id.in_(project_ids),
+        ProjectFile.is_deleted.isnot(True)
+    ).group_by(ProjectFile.project_id)
+    
+    return {project_id: (count, avg_score, last_analyzed) for project_id, count, avg_score, last_analyzed in rows}
+
 class FileAnalysis(db.Model):
     __tablename__ = 'file_analyses'
+    __table_args__ = (
+        db.Index('ix_file_analyses_file_timestamp', 'file_id', 'timestamp'),
+        db.Index('ix_file_analyses_code_hash', 'code_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey('project_files.id'), nullable=False)
@@ -104,6 +148,15 @@ class FileAnalysis(db.Model):
     avg_function_length = db.Column(db.Float)
     max_function_length = db.Column(db.Integer)
 
+    # Keys of to_dict, selectable one by one for history projections
+    SERIALIZED_FIELDS = (
+        'id', 'timestamp', 'commit_hash', 'commit_message', 'branch',
+        'readability_score', 'cyclomatic_complexity', 'maintainability_index',
+        'lines_of_code', 'comment_density', 'duplication_percentage',
+        'avg_name_length', 'max_nesting_depth', 'avg_nesting_depth',
+        'cognitive_complexity', 'avg_function_length', 'max_function_length'
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -123,4 +176,202 @@ class FileAnalysis(db.Model):
             'cognitive_complexity': self.cognitive_complexity,
             'avg_function_length': self.avg_function_length,
             'max_function_length': self.max_function_length
-        }
\ No newline at end of file
+        }
+
+class AnalysisCacheEntry(db.Model):
+    __tablename__ = 'analysis_cache'
+
+    # sha256 of code hash, language, analyzer version and config
+    cache_key = db.Column(db.String(64), primary_key=True)
+    results = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CodeUnit(db.Model):
+    """Stored metrics of one function, method or class of a file."""
+    __tablename__ = 'code_units'
+    __table_args__ = (
+        db.Index('ix_code_units_project_hash', 'project_id', 'unit_hash'),
+        db.Index('ix_code_units_project_readability', 'project_id', 'readability_score'),
+        db.Index('ix_code_units_project_complexity', 'project_id', 'cyclomatic_complexity'),
+        db.Index('ix_code_units_project_cognitive', 'project_id', 'cognitive_complexity'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('project_files.id'), nullable=False, index=True)
+    # Qualified name, e.g. 'Calculator.add'
+    name = db.Column(db.String(500), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    # Hash of the normalized AST, metrics are only recomputed when it changes
+    unit_hash = db.Column(db.String(32), nullable=False)
+    start_line = db.Column(db.Integer)
+    end_line = db.Column(db.Integer)
+
+    lines_of_code = db.Column(db.Integer)
+    cyclomatic_complexity = db.Column(db.Float)
+    maintainability_index = db.Column(db.Float)
+    cognitive_complexity = db.Column(db.Integer)
+    max_nesting_depth = db.Column(db.Integer)
+    readability_score = db.Column(db.Float)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_id': self.file_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_line': self.start_line,
+            'end_line': self.end_line,
+            'lines_of_code': self.lines_of_code,
+            'cyclomatic_complexity': self.cyclomatic_complexity,
+            'maintainability_index': self.maintainability_index,
+            'cognitive_complexity': self.cognitive_complexity,
+            'max_nesting_depth': self.max_nesting_depth,
+            'readability_score': self.readability_score
+        }
+
+
+class CloneBlock(db.Model):
+    __tablename__ = 'clone_blocks'
+    __table_args__ = (
+        db.Index('ix_clone_blocks_project_hash', 'project_id', 'block_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('project_files.id'), nullable=False, index=True)
+    # Structural hash of the function, equal for exact clones
+    block_hash = db.Column(db.String(32), nullable=False)
+    name = db.Column(db.String(200))
+    start_line = db.Column(db.Integer)
+    end_line = db.Column(db.Integer)
+
+    bands = db.relationship('CloneBand', backref='block', lazy=True, cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_id': self.file_id,
+            'name': self.name,
+            'start_line': self.start_line,
+            'end_line': self.end_line
+        }
+
+class CloneBand(db.Model):
+    __tablename__ = 'clone_bands'
+    __table_args__ = (
+        db.Index('ix_clone_bands_project_band', 'project_id', 'band_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    block_id = db.Column(db.Integer, db.ForeignKey('clone_blocks.id'), nullable=False, index=True)
+    # Denormalised so candidate lookups need no join
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('project_files.id'), nullable=False, index=True)
+    # MinHash LSH band hash, equal for likely near-clones
+    band_key = db.Column(db.String(16), nullable=False)
+
+
+class MetricRollup(db.Model):
+    __tablename__ = 'metric_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'file_id', 'period', 'bucket', name='uq_metric_rollups_key'),
+        db.Index('ix_metric_rollups_series', 'project_id', 'file_id', 'period', 'bucket_start'),
+    )
+
+    # file_id for project-wide rows
+    PROJECT_SCOPE = 0
+    PERIODS = ('day', 'week', 'commit')
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    file_id = db.Column(db.Integer, nullable=False, default=PROJECT_SCOPE)
+    period = db.Column(db.String(10), nullable=False)
+    # ISO date of the day or week start, or the commit hash
+    bucket = db.Column(db.String(40), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+
+    # Sums and counts so averages stay exact as rows are merged in
+    count = db.Column(db.Integer, nullable=False, default=0)
+    readability_sum = db.Column(db.Float, nullable=False, default=0)
+    readability_min = db.Column(db.Float)
+    readability_max = db.Column(db.Float)
+    complexity_sum = db.Column(db.Float, nullable=False, default=0)
+    complexity_min = db.Column(db.Float)
+    complexity_max = db.Column(db.Float)
+    maintainability_sum = db.Column(db.Float, nullable=False, default=0)
+    loc_sum = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        def avg(total):
+            return round(total / self.count, 2) if self.count else None
+
+        return {
+            'bucket': self.bucket,
+            'start': self.bucket_start.isoformat(),
+            'count': self.count,
+            'readability_avg': avg(self.readability_sum),
+            'readability_min': self.readability_min,
+            'readability_max': self.readability_max,
+            'complexity_avg': avg(self.complexity_sum),
+            'complexity_min': self.complexity_min,
+            'complexity_max': self.complexity_max,
+            'maintainability_avg': avg(self.maintainability_sum),
+            'loc_sum': self.loc_sum,
+            'loc_avg': avg(self.loc_sum)
+        }
+
+
+class ScanJob(db.Model):
+    __tablename__ = 'scan_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED, index=True)
+    incremental = db.Column(db.Boolean, default=False)
+    cancel_requested = db.Column(db.Boolean, default=False)
+
+    # Progress counters
+    files_seen = db.Column(db.Integer, default=0)
+    files_analyzed = db.Column(db.Integer, default=0)
+    files_failed = db.Column(db.Integer, default=0)
+    files_skipped = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON list of {'file', 'error'}
+    skipped = db.Column(db.Text)  # JSON list of {'file', 'reason'}, e.g. over the analysis budget
+    error_message = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Touched by the worker after every batch; stale running jobs are recovered
+    heartbeat_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'incremental': bool(self.incremental),
+            'cancel_requested': self.cancel_requested,
+            'files_seen': self.files_seen,
+            'files_analyzed': self.files_analyzed,
+            'files_failed': self.files_failed,
+            'files_skipped': self.files_skipped,
+            'errors': json.loads(self.errors) if self.errors else None,
+            'skipped': json.loads(self.skipped) if self.skipped else None,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
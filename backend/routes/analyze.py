@@ -1,15 +1,125 @@
-from flask import Blueprint, request, jsonify
-from infrastructure.code_analyzer import analyze_code
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import func, select
 from models import db, Project, ProjectFile, FileAnalysis
-from routes.auth import token_required
+from routes.auth import token_required, is_admin
 from utils.git_utils import get_git_info, get_code_hash
+from utils.analysis_cache import analyze_code_cached, analyze_many_cached
+from utils.persistence import AnalysisWriter
+from utils.archive import iter_archive_files, is_archive_name, ArchiveError
+from utils.clone_index import replace_file_blocks
+from utils.rollups import apply_rollups
+from utils.units import sync_file_units
+from utils.db_utils import upsert
+from infrastructure.budget import BudgetExceeded
+from infrastructure.code_analyzer import public_results, RESPONSE_FORMATS
+from infrastructure.executor import iter_batches, SerialExecutor
+from infrastructure.profiling import RequestProfile, PROFILE_FORMATS, profile_section
 from datetime import datetime
+from contextlib import nullcontext
+from itertools import chain
 
 analyze_bp = Blueprint('analyze', __name__)
 
 
 
 
+def _save_analysis(current_user, project_name, filename, language, code, code_hash, results, executor=None):
+    """Store one /analyze result as a FileAnalysis of the named or default project."""
+    #get or create project
+    if project_name:
+        project = Project.query.filter_by(
+            user_id=current_user.id, 
+            name=project_name
+        ).first()
+        
+        if not project:
+            project = Project(user_id=current_user.id, name=project_name)
+            db.session.add(project)
+            db.session.flush()
+    else:
+        # Use default project
+        project = Project.query.filter_by(
+            user_id=current_user.id, 
+            name='Default Project'
+        ).first()
+        
+        if not project:
+            project = Project(user_id=current_user.id, name='Default Project')
+            db.session.add(project)
+            db.session.flush()
+    
+    #Create or update the file in one statement on its unique key
+    now = datetime.utcnow()
+    upsert(
+        ProjectFile,
+        [{
+            'project_id': project.id,
+            'filename': filename,
+            'language': language,
+            'current_score': results['readability_score'],
+            'last_analyzed': now,
+            'total_analyses': 1,
+            'is_deleted': False
+        }],
+        ('project_id', 'filename'),
+        set_=lambda table, excluded: {
+            'current_score': excluded.current_score,
+            'last_analyzed': excluded.last_analyzed,
+            'total_analyses': func.coalesce(table.total_analyses, 0) + 1,
+            'is_deleted': excluded.is_deleted
+        }
+    )
+    file_id = db.session.scalar(
+        select(ProjectFile.id).where(
+            ProjectFile.project_id == project.id,
+            ProjectFile.filename == filename
+        )
+    )
+    
+    #Get git 
+    git_info = None
+    if hasattr(project, 'git_repo_path') and project.git_repo_path:
+        git_info = get_git_info(project.git_repo_path)
+    else:
+        git_info = get_git_info()
+    
+    #Create analysis record
+    analysis = FileAnalysis(
+        file_id=file_id,
+        timestamp=now,
+        commit_hash=git_info['commit_hash'] if git_info else None,
+        commit_message=git_info['commit_message'] if git_info else None,
+        branch=git_info['branch'] if git_info else None,
+        code_hash=code_hash,
+        readability_score=results['readability_score'],
+        cyclomatic_complexity=results['cyclomatic_complexity'],
+        maintainability_index=results['maintainability_index'],
+        lines_of_code=results['lines_of_code'],
+        comment_density=results['comment_density'],
+        duplication_percentage=results['duplication_percentage'],
+        avg_name_length=results['avg_name_length'],
+        max_nesting_depth=results['max_nesting_depth'],
+        avg_nesting_depth=results['avg_nesting_depth'],
+        cognitive_complexity=results['cognitive_complexity'],
+        avg_function_length=results['avg_function_length'],
+        max_function_length=results['max_function_length']
+    )
+    
+    db.session.add(analysis)
+    replace_file_blocks(project.id, {file_id: results.get('clone_blocks') or []})
+    sync_file_units(project.id, {file_id: (code_hash, code)}, executor)
+    apply_rollups(project.id, [{
+        'file_id': file_id,
+        'timestamp': now,
+        'commit_hash': analysis.commit_hash,
+        'readability_score': analysis.readability_score,
+        'cyclomatic_complexity': analysis.cyclomatic_complexity,
+        'maintainability_index': analysis.maintainability_index,
+        'lines_of_code': analysis.lines_of_code
+    }])
+    
+    return analysis
+
 @analyze_bp.route('/analyze', methods=['POST'])
 @token_required
 def analyze(current_user):
@@ -19,93 +129,52 @@ def analyze(current_user):
     project_name = data.get('project_name') 
     filename = data.get('filename', 'untitled.py') 
     save_results = data.get('save_results', False)
+    response_format = data.get('response_format', 'compact')
     
     if not code:
         return jsonify({'error': 'No code provided'}), 400
     
+    if response_format not in RESPONSE_FORMATS:
+        return jsonify({'error': f"response_format must be one of {', '.join(RESPONSE_FORMATS)}"}), 400
+    
+    #Admin-only stage timings, plus an optional cProfile of the request
+    profile = str(data.get('profile', '')).lower() in ('1', 'true', 'yes')
+    profile_format = data.get('profile_format')
+    if profile and not is_admin(current_user):
+        return jsonify({'error': 'Profiling is restricted to admins'}), 403
+    if profile_format is not None and profile_format not in PROFILE_FORMATS:
+        return jsonify({'error': f"profile_format must be one of {', '.join(PROFILE_FORMATS)}"}), 400
+    
+    request_profile = RequestProfile(profile_format) if profile else None
+    
     try:
-        #Run analysis
-        results = analyze_code(code, language)
-        
-        #Save to database if requested
-        if save_results and current_user:
-            #get or create project
-            if project_name:
-                project = Project.query.filter_by(
-                    user_id=current_user.id, 
-                    name=project_name
-                ).first()
-                
-                if not project:
-                    project = Project(user_id=current_user.id, name=project_name)
-                    db.session.add(project)
-                    db.session.flush()
-            else:
-                # Use default project
-                project = Project.query.filter_by(
-                    user_id=current_user.id, 
-                    name='Default Project'
-                ).first()
-                
-                if not project:
-                    project = Project(user_id=current_user.id, name='Default Project')
-                    db.session.add(project)
-                    db.session.flush()
-            
-            file = ProjectFile.query.filter_by(
-                project_id=project.id,
-                filename=filename
-            ).first()
-            
-            if not file:
-                file = ProjectFile(
-                    project_id=project.id,
-                    filename=filename,
-                    language=language
-                )
-                db.session.add(file)
-                db.session.flush()
-            
-            #Update file stats
-            file.current_score = results['readability_score']
-            file.last_analyzed = datetime.utcnow()
-            file.total_analyses += 1
-            
-            #Get git 
-            git_info = None
-            if hasattr(project, 'git_repo_path') and project.git_repo_path:
-                git_info = get_git_info(project.git_repo_path)
-            else:
-                git_info = get_git_info()
-            
-            #Create analysis record
-            analysis = FileAnalysis(
-                file_id=file.id,
-                commit_hash=git_info['commit_hash'] if git_info else None,
-                commit_message=git_info['commit_message'] if git_info else None,
-                branch=git_info['branch'] if git_info else None,
-                code_hash=get_code_hash(code),
-                readability_score=results['readability_score'],
-                cyclomatic_complexity=results['cyclomatic_complexity'],
-                maintainability_index=results['maintainability_index'],
-                lines_of_code=results['lines_of_code'],
-                comment_density=results['comment_density'],
-                duplication_percentage=results['duplication_percentage'],
-                avg_name_length=results['avg_name_length'],
-                max_nesting_depth=results['max_nesting_depth'],
-                avg_nesting_depth=results['avg_nesting_depth'],
-                cognitive_complexity=results['cognitive_complexity'],
-                avg_function_length=results['avg_function_length'],
-                max_function_length=results['max_function_length']
-            )
-            
-            db.session.add(analysis)
-            db.session.commit()
+        with request_profile or nullcontext():
+            #Run analysis, reusing cached results for identical code unless profiling
+            code_hash = get_code_hash(code)
+            with profile_section(request_profile, 'analysis'):
+                results = analyze_code_cached(code, language, code_hash, refresh=request_profile is not None)
             
+            #Save to database if requested, the commit also persists the cache entry
+            analysis = None
+            with profile_section(request_profile, 'persistence'):
+                if save_results and current_user:
+                    # Profiled units are analyzed in this thread so their stages are timed
+                    executor = SerialExecutor() if request_profile is not None else None
+                    analysis = _save_analysis(current_user, project_name, filename, language,
+                                              code, code_hash, results, executor)
+                db.session.commit()
+        
+        results = public_results(results, response_format)
+        if analysis is not None:
             results['saved'] = True
             results['analysis_id'] = analysis.id
+        if request_profile is not None:
+            results['profile'] = request_profile.report(current_app.config.get('PROFILE_DIR'))
         
         return jsonify(results)
+    except BudgetExceeded as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -114,12 +183,37 @@ def analyze(current_user):
 @token_required
 def analyze_batch(current_user):
     files = request.files.getlist('files')
+    archive = request.files.get('archive')
     
-    if not files:
+    if not files and not archive:
         return jsonify({'error': 'No files uploaded'}), 400
     
     language = request.form.get('language', 'python')
     project_name = request.form.get('project_name', 'Batch Upload')
+    response_format = request.form.get('response_format', 'compact')
+    
+    if response_format not in RESPONSE_FORMATS:
+        return jsonify({'error': f"response_format must be one of {', '.join(RESPONSE_FORMATS)}"}), 400
+    
+    config = current_app.config
+    # .zip and .tar.gz files sent as regular uploads are expanded like the archive field
+    archives = [archive] if archive else []
+    archives += [file for file in files if is_archive_name(file.filename)]
+    files = [file for file in files if not is_archive_name(file.filename)]
+    if archives:
+        # Compressed uploads, members are read lazily as analysis consumes them
+        try:
+            sources = chain(
+                _multipart_sources(files, language),
+                *[_archive_sources(upload, language, config) for upload in archives]
+            )
+        except ArchiveError as e:
+            return jsonify({'error': str(e)}), 400
+        buffered_chunk_size = config.get('SCAN_BATCH_SIZE', 200)
+    else:
+        sources = _multipart_sources(files, language)
+        # Analysis is fanned out for the whole upload in one go
+        buffered_chunk_size = len(files)
     
     # Get or create project
     project = Project.query.filter_by(
@@ -132,8 +226,44 @@ def analyze_batch(current_user):
         db.session.add(project)
         db.session.flush()
     
-    results = []
+    # Get git info once, results are written set-based
+    writer = AnalysisWriter(
+        project,
+        language,
+        get_git_info(),
+        batch_size=config.get('DB_WRITE_BATCH_SIZE', 500)
+    )
+    summary = BatchSummary(project.id, project.name)
+    
+    if _wants_stream():
+        chunk_size = config.get('BATCH_STREAM_CHUNK_SIZE', 32)
+        return Response(
+            stream_with_context(_stream_batch(sources, language, response_format, writer, summary, chunk_size)),
+            mimetype='application/x-ndjson'
+        )
+    
+    try:
+        results = list(_batch_results(sources, language, response_format, writer, summary, buffered_chunk_size))
+    except ArchiveError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    if not summary.total_files:
+        return jsonify({'error': 'No valid files found'}), 400
+    
+    project_summary = summary.to_dict()
+    project_summary['files'] = results
     
+    return jsonify(project_summary)
+
+def _wants_stream():
+    # NDJSON with ?stream=true, a stream form field or an Accept header
+    flag = request.args.get('stream') or request.form.get('stream') or ''
+    return flag.lower() in ('1', 'true', 'yes') or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+def _multipart_sources(files, language):
+    # (filename, code, error) for each uploaded file of the language
     for file in files:
         filename = file.filename
         
@@ -144,97 +274,133 @@ def analyze_batch(current_user):
             continue
         
         try:
-            code = file.read().decode('utf-8')
-            analysis_results = analyze_code(code, language)
-            
-            # Save to database
-            project_file = ProjectFile.query.filter_by(
-                project_id=project.id,
-                filename=filename
-            ).first()
-            
-            if not project_file:
-                project_file = ProjectFile(
-                    project_id=project.id,
-                    filename=filename,
-                    language=language
-                )
-                db.session.add(project_file)
-                db.session.flush()
-            
-            # Update file stats
-            project_file.current_score = analysis_results['readability_score']
-            project_file.last_analyzed = datetime.utcnow()
-            project_file.total_analyses += 1
-            
-            # Get git info
-            git_info = get_git_info()
-            
-            # Create analysis record
-            analysis = FileAnalysis(
-                file_id=project_file.id,
-                commit_hash=git_info['commit_hash'] if git_info else None,
-                commit_message=git_info['commit_message'] if git_info else None,
-                branch=git_info['branch'] if git_info else None,
-                code_hash=get_code_hash(code),
-                readability_score=analysis_results['readability_score'],
-                cyclomatic_complexity=analysis_results['cyclomatic_complexity'],
-                maintainability_index=analysis_results['maintainability_index'],
-                lines_of_code=analysis_results['lines_of_code'],
-                comment_density=analysis_results['comment_density'],
-                duplication_percentage=analysis_results['duplication_percentage'],
-                avg_name_length=analysis_results['avg_name_length'],
-                max_nesting_depth=analysis_results['max_nesting_depth'],
-                avg_nesting_depth=analysis_results['avg_nesting_depth'],
-                cognitive_complexity=analysis_results['cognitive_complexity'],
-                avg_function_length=analysis_results['avg_function_length'],
-                max_function_length=analysis_results['max_function_length']
-            )
-            
-            db.session.add(analysis)
-            
-            results.append({
-                'filename': filename,
-                'metrics': analysis_results
-            })
-            
+            yield filename, file.read().decode('utf-8'), None
         except Exception as e:
-            results.append({
+            yield filename, None, str(e)
+
+def _archive_sources(archive, language, config):
+    # (member_path, code, error) for archive members, skipped ones reported as errors
+    skipped = []
+    members = iter_archive_files(
+        archive.stream,
+        archive.filename,
+        language=language,
+        max_file_size=config.get('SCAN_MAX_FILE_SIZE'),
+        max_total_size=config.get('ARCHIVE_MAX_TOTAL_SIZE'),
+        skipped=skipped
+    )
+    
+    def drain_skipped():
+        while skipped:
+            path, reason = skipped.pop(0)
+            yield path, None, reason
+    
+    def sources():
+        for path, code in members:
+            yield from drain_skipped()
+            yield path, code, None
+        yield from drain_skipped()
+    
+    return sources()
+
+def _batch_results(sources, language, response_format, writer, summary, chunk_size):
+    """Yield one result dict per source file, analyzing chunk_size files at a time."""
+    for chunk in iter_batches(sources, chunk_size):
+        uploads = []
+        
+        for filename, code, error in chunk:
+            if error is not None:
+                yield {
+                    'filename': filename,
+                    'error': error
+                }
+            else:
+                uploads.append((filename, code))
+        
+        outcomes = analyze_many_cached([code for _, code in uploads], language)
+        
+        for (filename, code), (code_hash, analysis_results, error) in zip(uploads, outcomes):
+            if error is not None:
+                yield {
+                    'filename': filename,
+                    'error': error
+                }
+                continue
+            
+            writer.add(filename, code_hash, analysis_results, code)
+            metrics = public_results(analysis_results, response_format)
+            summary.add(metrics)
+            yield {
                 'filename': filename,
-                'error': str(e)
-            })
+                'metrics': metrics
+            }
     
-    db.session.commit()
+    writer.commit()
+
+def _stream_batch(sources, language, response_format, writer, summary, chunk_size):
+    # One JSON line per file as soon as its chunk is analyzed, then the summary
+    dumps = current_app.json.dumps
+    try:
+        for result in _batch_results(sources, language, response_format, writer, summary, chunk_size):
+            yield dumps(result) + '\n'
+    except Exception as e:
+        db.session.rollback()
+        yield dumps({'error': str(e)}) + '\n'
+        return
     
-    # Calculate aggregates
-    valid_results = [r for r in results if 'metrics' in r]
+    if not summary.total_files:
+        yield dumps({'error': 'No valid files found'}) + '\n'
+    else:
+        yield dumps({'summary': summary.to_dict()}) + '\n'
+
+
+class BatchSummary:
+    """Running project aggregates over a batch's per-file metrics."""
     
-    if not valid_results:
-        return jsonify({'error': 'No valid files found'}), 400
+    AVERAGED = (
+        ('avg_readability', 'readability_score'),
+        ('avg_complexity', 'cyclomatic_complexity'),
+        ('avg_maintainability', 'maintainability_index'),
+        ('avg_comment_density', 'comment_density'),
+        ('avg_duplication', 'duplication_percentage'),
+        ('avg_name_length', 'avg_name_length'),
+        ('avg_nesting_depth', 'avg_nesting_depth'),
+        ('avg_cognitive_complexity', 'cognitive_complexity')
+    )
+    
+    def __init__(self, project_id, project_name):
+        self.project_id = project_id
+        self.project_name = project_name
+        self.total_files = 0
+        self.total_lines = 0
+        self.max_nesting_depth = None
+        self.sums = {key: 0 for _, key in self.AVERAGED}
+        self.counts = {key: 0 for _, key in self.AVERAGED}
+    
+    def add(self, metrics):
+        self.total_files += 1
+        self.total_lines += metrics['lines_of_code']
+        
+        for _, key in self.AVERAGED:
+            if metrics.get(key) is not None:
+                self.sums[key] += metrics[key]
+                self.counts[key] += 1
+        
+        depth = metrics.get('max_nesting_depth')
+        if depth is not None and (self.max_nesting_depth is None or depth > self.max_nesting_depth):
+            self.max_nesting_depth = depth
+    
+    def _avg(self, key):
+        return round(self.sums[key] / self.counts[key], 2) if self.counts[key] else 0
     
-    def safe_avg(key):
-        values = [r['metrics'][key] for r in valid_results if r['metrics'].get(key) is not None]
-        return round(sum(values) / len(values), 2) if values else 0
-    
-    def safe_max(key):
-        values = [r['metrics'][key] for r in valid_results if r['metrics'].get(key) is not None]
-        return max(values) if values else 0
-    
-    project_summary = {
-        'project_id': project.id,
-        'project_name': project.name,
-        'total_files': len(valid_results),
-        'avg_readability': safe_avg('readability_score'),
-        'avg_complexity': safe_avg('cyclomatic_complexity'),
-        'avg_maintainability': safe_avg('maintainability_index'),
-        'total_lines': sum(r['metrics']['lines_of_code'] for r in valid_results),
-        'avg_comment_density': safe_avg('comment_density'),
-        'avg_duplication': safe_avg('duplication_percentage'),
-        'avg_name_length': safe_avg('avg_name_length'),
-        'max_nesting_depth': safe_max('max_nesting_depth'),
-        'avg_nesting_depth': safe_avg('avg_nesting_depth'),
-        'avg_cognitive_complexity': safe_avg('cognitive_complexity'),
-        'files': results
-    }
-    
-    return jsonify(project_summary)
\ No newline at end of file
+    def to_dict(self):
+        summary = {
+            'project_id': self.project_id,
+            'project_name': self.project_name,
+            'total_files': self.total_files
+        }
+        for label, key in self.AVERAGED:
+            summary[label] = self._avg(key)
+        summary['total_lines'] = self.total_lines
+        summary['max_nesting_depth'] = self.max_nesting_depth or 0
+        return summary
@@ -1,13 +1,67 @@
 from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import event
 from models import db, User
+from infrastructure.cache import LRUCache
+from infrastructure.telemetry import record_cache
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 from functools import wraps
 import os
+import time
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+# user_id -> (expires_at, AuthenticatedUser)
+user_cache = LRUCache(int(os.environ.get('AUTH_USER_CACHE_SIZE', 1024)))
+
+
+class AuthenticatedUser:
+    """Identity of the requesting user, detached from any session."""
+
+    __slots__ = ('id', 'email', 'name')
+
+    def __init__(self, id, email, name):
+        self.id = id
+        self.email = email
+        self.name = name
+
+def load_user(user_id):
+    """
+    Identity for a token's user_id, from the cache while it is fresh
+
+    Entries expire after AUTH_USER_CACHE_TTL seconds and are dropped when
+    the user is updated or deleted through this process. Returns None
+    for unknown users, which are not cached.
+    """
+    ttl = current_app.config.get('AUTH_USER_CACHE_TTL', 60)
+    now = time.monotonic()
+
+    cached = user_cache.get(user_id)
+    hit = cached is not None and cached[0] > now
+    record_cache('auth_user', hit)
+    if hit:
+        return cached[1]
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        user_cache.pop(user_id)
+        return None
+
+    identity = AuthenticatedUser(user.id, user.email, user.name)
+    if ttl > 0:
+        user_cache.set(user_id, (now + ttl, identity))
+    return identity
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    user_cache.pop(target.id)
+
+def is_admin(user):
+    """Whether the user's email is listed in ADMIN_EMAILS."""
+    return user is not None and user.email in current_app.config.get('ADMIN_EMAILS', ())
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -25,7 +79,7 @@ def token_required(f):
                 token = token[7:]
             
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            current_user = load_user(data['user_id'])
             
             if not current_user:
                 return jsonify({'error': 'User not found'}), 401
@@ -0,0 +1,35 @@
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from infrastructure import telemetry
+from infrastructure.telemetry import REQUESTS, REQUEST_DURATION
+import hmac
+import time
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metrics_bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@metrics_bp.after_app_request
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Endpoint names keep label values bounded, unlike raw paths
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint, summed over every process sharing the metrics directory."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+
+    return Response(telemetry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
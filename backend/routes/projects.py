@@ -1,7 +1,8 @@
-from flask import request, jsonify, Blueprint
-from models import db, Project, ProjectFile, FileAnalysis
+from flask import request, jsonify, Blueprint, current_app, abort
+from sqlalchemy.orm import load_only
+from models import db, Project, ProjectFile, ScanJob, MetricRollup, CodeUnit, project_file_stats
 from routes.auth import token_required
-from datetime import datetime
+from utils.http_cache import conditional, stamp_etag, projects_stamp, history_stamp
 
 projects_bp = Blueprint('projects', __name__)
 
@@ -25,10 +26,24 @@ def get_projects(current_user):
         db.session.add(new_project)
         db.session.commit()
         
-        return jsonify(new_project.to_dict()), 201
+        return jsonify(new_project.to_dict(stats=(0, None, None))), 201
     
-    projects = Project.query.filter_by(user_id=current_user.id).all()
-    return jsonify([p.to_dict() for p in projects])
+    return conditional(stamp_etag('projects', projects_stamp(current_user.id)), lambda: _project_list(current_user))
+
+def _project_list(current_user):
+    # Only the serialized columns, file stats aggregated in one query
+    projects = Project.query.options(load_only(
+        Project.id,
+        Project.name,
+        Project.created_at,
+        Project.git_repo_path,
+        Project.git_remote_url,
+        Project.auto_detect_git,
+        Project.last_scanned_commit
+    )).filter_by(user_id=current_user.id).all()
+    stats = project_file_stats([p.id for p in projects])
+    
+    return jsonify([p.to_dict(stats=stats.get(p.id, (0, None, None))) for p in projects])
 
 
 
@@ -50,6 +65,14 @@ def get_project_detail(current_user, project_id):
 
        
 
+    # Only stamp projects the user owns, the body still 404s otherwise
+    stamp = projects_stamp(current_user.id, project_id)
+    if not stamp[0]:
+        abort(404)
+    
+    return conditional(stamp_etag('project', stamp), lambda: _project_detail(current_user, project_id))
+
+def _project_detail(current_user, project_id):
     project = Project.query.filter_by(
         id=project_id, 
         user_id=current_user.id
@@ -57,8 +80,18 @@ def get_project_detail(current_user, project_id):
     
     files = ProjectFile.query.filter_by(project_id=project_id).all()
     
+    # Stats come from the files already loaded, deleted ones left out like in the listing
+    live = [f for f in files if not f.is_deleted]
+    scores = [f.current_score for f in live if f.current_score is not None]
+    analyzed = [f.last_analyzed for f in live if f.last_analyzed]
+    stats = (
+        len(live),
+        sum(scores) / len(scores) if scores else None,
+        max(analyzed) if analyzed else None
+    )
+    
     return jsonify({
-        'project': project.to_dict(),
+        'project': project.to_dict(stats=stats),
         'files': [f.to_dict() for f in files]
     })
 
@@ -74,12 +107,37 @@ def get_file_history(current_user, project_id, file_id):
     if file.project.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    analyses = FileAnalysis.query.filter_by(file_id=file_id)\
-        .order_by(FileAnalysis.timestamp.desc()).all()
+    return conditional(stamp_etag('history', history_stamp(file)), lambda: _file_history(file))
+
+def _file_history(file):
+    from utils.history import history_page, history_chart, HistoryQueryError
+    
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else None
+    
+    try:
+        if request.args.get('mode') == 'chart':
+            # Downsampled series for plotting, oldest first
+            points = min(max(request.args.get('points', 300, type=int), 1), 2000)
+            return jsonify({
+                'file': file.to_dict(),
+                'chart': history_chart(file.id, points=points, metrics=fields)
+            })
+        
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        history, next_cursor = history_page(
+            file.id,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            fields=fields
+        )
+    except HistoryQueryError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'file': file.to_dict(),
-        'history': [a.to_dict() for a in analyses]
+        'history': history,
+        'next_cursor': next_cursor
     })
 
 
@@ -135,6 +193,7 @@ def unlink_git_repo(current_user, project_id):
 @projects_bp.route('/projects/<int:project_id>/scan-repo', methods=['POST', 'OPTIONS'])
 @token_required
 def scan_git_repo(current_user, project_id):
+    """Queue a background scan, like POST /scan-jobs; poll the returned job for progress."""
     if request.method == "OPTIONS":
         return jsonify({"ok": True}), 200
     
@@ -143,81 +202,175 @@ def scan_git_repo(current_user, project_id):
         user_id=current_user.id
     ).first_or_404()
     
+    return _enqueue_scan(current_user, project)
+
+def _enqueue_scan(current_user, project):
+    from utils.jobs import enqueue_scan, ensure_workers
+    
     if not project.git_repo_path:
         return jsonify({'error': 'No git repository linked'}), 400
     
-    from utils.git_utils import scan_repo_files
-    from infrastructure.code_analyzer import analyze_code
-    from utils.git_utils import get_git_info, get_code_hash
-    
-    # Scan for Python files
-    files_found = scan_repo_files(project.git_repo_path, language='python')
-    
-    if not files_found:
-        return jsonify({'message': 'No Python files found', 'files_analyzed': 0})
-    
-    analyzed_count = 0
-    errors = []
-    
-    # Get git info once
-    git_info = get_git_info(project.git_repo_path)
-    
-    for file_path, code in files_found:
-        try:
-            # Run analysis
-            results = analyze_code(code, 'python')
-            
-            # Get or create file
-            project_file = ProjectFile.query.filter_by(
-                project_id=project.id,
-                filename=file_path
-            ).first()
-            
-            if not project_file:
-                project_file = ProjectFile(
-                    project_id=project.id,
-                    filename=file_path,
-                    language='python'
-                )
-                db.session.add(project_file)
-                db.session.flush()
-            
-            # Update file stats
-            project_file.current_score = results['readability_score']
-            project_file.last_analyzed = datetime.utcnow()
-            project_file.total_analyses += 1
-            
-            # Create analysis record
-            analysis = FileAnalysis(
-                file_id=project_file.id,
-                commit_hash=git_info['commit_hash'] if git_info else None,
-                commit_message=git_info['commit_message'] if git_info else None,
-                branch=git_info['branch'] if git_info else None,
-                code_hash=get_code_hash(code),
-                readability_score=results['readability_score'],
-                cyclomatic_complexity=results['cyclomatic_complexity'],
-                maintainability_index=results['maintainability_index'],
-                lines_of_code=results['lines_of_code'],
-                comment_density=results['comment_density'],
-                duplication_percentage=results['duplication_percentage'],
-                avg_name_length=results['avg_name_length'],
-                max_nesting_depth=results['max_nesting_depth'],
-                avg_nesting_depth=results['avg_nesting_depth'],
-                cognitive_complexity=results['cognitive_complexity'],
-                avg_function_length=results['avg_function_length'],
-                max_function_length=results['max_function_length']
-            )
-            
-            db.session.add(analysis)
-            analyzed_count += 1
-            
-        except Exception as e:
-            errors.append({'file': file_path, 'error': str(e)})
+    job = enqueue_scan(project, current_user.id, incremental=_wants_incremental())
+    ensure_workers(current_app._get_current_object())
     
-    db.session.commit()
+    return jsonify(job.to_dict()), 202
+
+def _wants_incremental():
+    # Accept {"incremental": true} in the body or ?incremental=true
+    options = request.get_json(silent=True) or {}
+    if 'incremental' in options:
+        return bool(options['incremental'])
+    return request.args.get('incremental', '').lower() in ('1', 'true', 'yes')
+
+
+@projects_bp.route('/projects/<int:project_id>/scan-jobs', methods=['GET', 'POST', 'OPTIONS'])
+@token_required
+def scan_jobs(current_user, project_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    project = Project.query.filter_by(
+        id=project_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    if request.method == 'POST':
+        return _enqueue_scan(current_user, project)
+    
+    jobs = ScanJob.query.filter_by(project_id=project.id)\
+        .order_by(ScanJob.created_at.desc()).limit(20).all()
+    
+    return jsonify([job.to_dict() for job in jobs])
+
+@projects_bp.route('/projects/<int:project_id>/scan-jobs/<int:job_id>', methods=['GET', 'DELETE', 'OPTIONS'])
+@token_required
+def scan_job_detail(current_user, project_id, job_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    job = ScanJob.query.filter_by(
+        id=job_id,
+        project_id=project_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    if request.method == 'DELETE':
+        from utils.jobs import cancel_job
+        
+        if job.status in ScanJob.FINISHED_STATUSES:
+            return jsonify({'error': f'Job already {job.status}'}), 409
+        
+        job = cancel_job(job)
+    
+    return jsonify(job.to_dict())
+
+
+@projects_bp.route('/projects/<int:project_id>/clones', methods=['GET', 'OPTIONS'])
+@token_required
+def get_project_clones(current_user, project_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    project = Project.query.filter_by(
+        id=project_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    from utils.clone_index import find_clone_pairs
+    
+    file_id = request.args.get('file_id', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 500)
     
     return jsonify({
-        'message': f'Successfully analyzed {analyzed_count} files',
-        'files_analyzed': analyzed_count,
-        'errors': errors if errors else None
-    })
\ No newline at end of file
+        'project_id': project.id,
+        'pairs': find_clone_pairs(project.id, file_id=file_id, limit=limit)
+    })
+
+@projects_bp.route('/projects/<int:project_id>/units', methods=['GET', 'OPTIONS'])
+@token_required
+def get_worst_units(current_user, project_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    project = Project.query.filter_by(
+        id=project_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    from utils.units import worst_units, WORST_UNIT_ORDERS
+    
+    metric = request.args.get('metric', 'readability_score')
+    if metric not in WORST_UNIT_ORDERS:
+        return jsonify({'error': f"metric must be one of {', '.join(WORST_UNIT_ORDERS)}"}), 400
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+    
+    return jsonify({
+        'project_id': project.id,
+        'metric': metric,
+        'units': worst_units(project.id, metric=metric, limit=limit, kind=request.args.get('kind'))
+    })
+
+@projects_bp.route('/projects/<int:project_id>/files/<int:file_id>/units', methods=['GET', 'OPTIONS'])
+@token_required
+def get_file_units(current_user, project_id, file_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    file = ProjectFile.query.filter_by(id=file_id, project_id=project_id).first_or_404()
+    
+    if file.project.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    from utils.units import file_unit_summary
+    
+    units = CodeUnit.query.filter_by(file_id=file.id).order_by(CodeUnit.start_line, CodeUnit.id).all()
+    
+    return jsonify({
+        'file': file.to_dict(),
+        'summary': file_unit_summary(file.id),
+        'units': [unit.to_dict() for unit in units]
+    })
+
+@projects_bp.route('/projects/<int:project_id>/trends', methods=['GET', 'OPTIONS'])
+@token_required
+def get_project_trends(current_user, project_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    project = Project.query.filter_by(
+        id=project_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    return _trend_response(project.id, MetricRollup.PROJECT_SCOPE)
+
+@projects_bp.route('/projects/<int:project_id>/files/<int:file_id>/trends', methods=['GET', 'OPTIONS'])
+@token_required
+def get_file_trends(current_user, project_id, file_id):
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+    
+    file = ProjectFile.query.filter_by(id=file_id, project_id=project_id).first_or_404()
+    
+    if file.project.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return _trend_response(project_id, file.id)
+
+def _trend_response(project_id, file_id):
+    # Trends read only the rollup tables, never raw analyses
+    from utils.rollups import get_trend
+    
+    period = request.args.get('period', 'day')
+    if period not in MetricRollup.PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(MetricRollup.PERIODS)}"}), 400
+    
+    limit = min(max(request.args.get('limit', 90, type=int), 1), 1000)
+    
+    return jsonify({
+        'project_id': project_id,
+        'file_id': file_id or None,
+        'period': period,
+        'points': get_trend(project_id, period, file_id=file_id, limit=limit)
+    })
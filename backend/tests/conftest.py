@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import app as flask_app
 from models import db, User, Project, ProjectFile, FileAnalysis
+from routes.auth import user_cache
 
 
 @pytest.fixture
@@ -14,11 +15,14 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'SECRET_KEY': 'test-secret-key',
-        'WTF_CSRF_ENABLED': False
+        'WTF_CSRF_ENABLED': False,
+        'SCAN_WORKERS': 0
     })
 
     with flask_app.app_context():
         db.create_all()
+        # Users are recreated with the same ids in every test database
+        user_cache.clear()
         yield flask_app
         db.session.remove()
         db.drop_all()
@@ -1,5 +1,7 @@
+import pstats
 import pytest
 from io import BytesIO
+from infrastructure import budget
 
 
 class TestAnalyzeRoute:
@@ -35,6 +37,7 @@ class TestAnalyzeRoute:
         assert 'comment_density' in data
         assert isinstance(data['readability_score'], (int, float))
         assert isinstance(data['lines_of_code'], int)
+        assert 'clone_blocks' not in data
 
     def test_analyze_no_code(self, client, auth_headers):
         """Test analysis with no code provided"""
@@ -48,6 +51,16 @@ class TestAnalyzeRoute:
         assert response.status_code == 400
         assert 'error' in response.json
 
+    def test_analyze_over_budget(self, client, auth_headers, monkeypatch):
+        """Test analysis cut short by the time budget"""
+        monkeypatch.setattr(budget, 'TIME_BUDGET', 1e-9)
+        code = ''.join(f'def f{i}(a, b):\n    return a + b * {i}\n' for i in range(200))
+
+        response = client.post('/analyze', json={'code': code}, headers=auth_headers)
+
+        assert response.status_code == 422
+        assert response.json['error'].startswith(budget.BUDGET_EXCEEDED)
+
     def test_analyze_with_save(self, client, auth_headers, sample_code):
         """Test analysis with save results enabled"""
         response = client.post('/analyze',
@@ -68,6 +81,65 @@ class TestAnalyzeRoute:
         assert 'analysis_id' in data
         assert 'readability_score' in data
 
+    def test_analyze_reuses_file_row(self, client, auth_headers, sample_code):
+        """Test that saving the same filename twice updates one file row"""
+        from models import ProjectFile, FileAnalysis
+
+        for _ in range(2):
+            response = client.post('/analyze',
+                json={
+                    'code': sample_code,
+                    'language': 'python',
+                    'save_results': True,
+                    'project_name': 'Test Project',
+                    'filename': 'test.py'
+                },
+                headers=auth_headers
+            )
+            assert response.status_code == 200
+
+        with client.application.app_context():
+            files = ProjectFile.query.filter_by(filename='test.py').all()
+            assert len(files) == 1
+            assert files[0].total_analyses == 2
+            assert files[0].last_analyzed is not None
+            assert FileAnalysis.query.filter_by(file_id=files[0].id).count() == 2
+
+    def test_analyze_restores_deleted_file(self, client, auth_headers, sample_code):
+        """Test that saving a file flagged deleted brings it back"""
+        from models import db, ProjectFile
+
+        payload = {'code': sample_code, 'save_results': True, 'project_name': 'Test Project', 'filename': 'test.py'}
+        client.post('/analyze', json=payload, headers=auth_headers)
+        with client.application.app_context():
+            ProjectFile.query.filter_by(filename='test.py').update({'is_deleted': True})
+            db.session.commit()
+
+        client.post('/analyze', json=payload, headers=auth_headers)
+
+        with client.application.app_context():
+            assert ProjectFile.query.filter_by(filename='test.py').one().is_deleted is False
+
+    def test_analyze_response_formats(self, client, auth_headers, sample_code):
+        """Test compact name length stats by default and the full list on request"""
+        compact = client.post('/analyze', json={'code': sample_code}, headers=auth_headers).json
+        assert 'sorted_name_lengths' not in compact
+        assert 'name_length_counts' not in compact
+        assert compact['name_length_stats']['count'] > 0
+
+        full = client.post('/analyze',
+            json={'code': sample_code, 'response_format': 'full'},
+            headers=auth_headers
+        ).json
+        assert len(full['sorted_name_lengths']) == compact['name_length_stats']['count']
+        assert full['sorted_name_lengths'] == sorted(full['sorted_name_lengths'])
+
+        response = client.post('/analyze',
+            json={'code': sample_code, 'response_format': 'raw'},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
     def test_analyze_creates_default_project(self, client, auth_headers, sample_code):
         """Test that analysis creates default project when no project name provided"""
         response = client.post('/analyze',
@@ -104,6 +176,68 @@ def hello():
         assert data['lines_of_code'] > 0
 
 
+class TestAnalyzeProfile:
+    """Test admin-only profiling of /analyze"""
+
+    @pytest.fixture
+    def admin(self, app):
+        app.config['ADMIN_EMAILS'] = {'test@example.com'}
+        yield
+        app.config['ADMIN_EMAILS'] = set()
+
+    def test_profile_requires_admin(self, client, auth_headers, sample_code):
+        response = client.post('/analyze', json={'code': sample_code, 'profile': True}, headers=auth_headers)
+
+        assert response.status_code == 403
+
+    def test_stage_breakdown(self, client, auth_headers, admin, sample_code):
+        client.post('/analyze', json={'code': sample_code}, headers=auth_headers)
+
+        # The cached result is bypassed so the stages actually run
+        response = client.post('/analyze',
+            json={'code': sample_code, 'profile': True, 'save_results': True},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        profile = response.json['profile']
+        sections = {section['name']: section for section in profile['sections']}
+        assert set(sections) == {'analysis', 'persistence'}
+        analysis_stages = sections['analysis']['stages']
+        for stage in ('parse', 'calculate_lines', 'calculate_duplication_ast', 'calculate_readability_score'):
+            assert analysis_stages[stage]['calls'] == 1
+        assert sections['persistence']['stages']['analyze_unit']['calls'] >= 1
+        assert profile['total_ms'] >= sections['analysis']['ms']
+        assert 'pstats' not in profile
+
+    def test_unprofiled_response_has_no_profile(self, client, auth_headers, admin, sample_code):
+        response = client.post('/analyze', json={'code': sample_code}, headers=auth_headers)
+
+        assert 'profile' not in response.json
+
+    def test_cprofile_outputs(self, app, client, auth_headers, admin, sample_code, tmp_path, monkeypatch):
+        response = client.post('/analyze',
+            json={'code': sample_code, 'profile': True, 'profile_format': 'pstats'},
+            headers=auth_headers
+        )
+        assert 'function calls' in response.json['profile']['pstats']
+
+        monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmp_path))
+        response = client.post('/analyze',
+            json={'code': sample_code, 'profile': True, 'profile_format': 'prof'},
+            headers=auth_headers
+        )
+        prof_file = response.json['profile']['prof_file']
+        assert prof_file.startswith(str(tmp_path)) and prof_file.endswith('.prof')
+        assert pstats.Stats(prof_file).total_calls > 0
+
+        response = client.post('/analyze',
+            json={'code': sample_code, 'profile': True, 'profile_format': 'svg'},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+
 class TestAnalyzeBatch:
     """Test batch file analysis endpoint"""
 
@@ -215,3 +349,178 @@ def add(a, b):
             result = response.json
             # Only Python file should be analyzed
             assert all(f['filename'].endswith('.py') for f in result['files'] if 'error' not in f)
+
+
+class TestAnalyzeBatchStream:
+    """Test NDJSON streaming of batch analysis"""
+
+    def post_stream(self, client, auth_headers, files, **form):
+        import json
+
+        data = {'language': 'python', 'project_name': 'Stream Test', 'stream': 'true', **form}
+        data['files'] = [(BytesIO(code), name) for name, code in files]
+        response = client.post('/analyze-batch',
+            data=data,
+            content_type='multipart/form-data',
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def test_stream_emits_line_per_file_then_summary(self, app, client, auth_headers):
+        """Test one line per file followed by the summary"""
+        from models import FileAnalysis
+
+        files = [(f'mod{index}.py', f'def f{index}(x):\n    return x + {index}\n'.encode()) for index in range(5)]
+        lines = self.post_stream(client, auth_headers, files)
+
+        assert [line['filename'] for line in lines[:-1]] == [name for name, _ in files]
+        assert all('metrics' in line for line in lines[:-1])
+        summary = lines[-1]['summary']
+        assert summary['total_files'] == 5
+        assert summary['total_lines'] == sum(line['metrics']['lines_of_code'] for line in lines[:-1])
+        assert 'files' not in summary
+
+        with app.app_context():
+            assert FileAnalysis.query.count() == 5
+
+    def test_stream_summary_matches_buffered_response(self, client, auth_headers):
+        """Test that running aggregates equal the buffered summary"""
+        files = [
+            ('a.py', b'def a(x):\n    if x:\n        return 1\n    return 2\n'),
+            ('b.py', b'def b():\n    return [i for i in range(3)]\n')
+        ]
+        summary = self.post_stream(client, auth_headers, files)[-1]['summary']
+
+        buffered = client.post('/analyze-batch',
+            data={
+                'language': 'python',
+                'project_name': 'Stream Test',
+                'files': [(BytesIO(code), name) for name, code in files]
+            },
+            content_type='multipart/form-data',
+            headers=auth_headers
+        ).json
+        buffered.pop('files')
+
+        assert summary == buffered
+
+    def test_stream_reports_errors_inline(self, client, auth_headers):
+        """Test that unreadable files become error lines"""
+        lines = self.post_stream(client, auth_headers, [('bad.py', b'\xff\xfe'), ('notes.txt', b'text')])
+
+        assert lines[0]['filename'] == 'bad.py'
+        assert 'error' in lines[0]
+        assert lines[-1] == {'error': 'No valid files found'}
+
+
+class TestAnalyzeBatchArchive:
+    """Test batch analysis of a single .zip or .tar.gz upload"""
+
+    FILES = {
+        'pkg/__init__.py': b'',
+        'pkg/core.py': b'def core(value):\n    return value * 2\n',
+        'pkg/util.py': b'def util(items):\n    return [item for item in items]\n',
+        'README.md': b'# not code',
+        'node_modules/dep/index.py': b'def vendored():\n    pass\n'
+    }
+
+    def zip_archive(self, files):
+        import zipfile
+
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+        buffer.seek(0)
+        return buffer
+
+    def tar_archive(self, files):
+        import tarfile
+
+        buffer = BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for name, content in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(info, BytesIO(content))
+        buffer.seek(0)
+        return buffer
+
+    def post_archive(self, client, auth_headers, buffer, filename, **form):
+        return client.post('/analyze-batch',
+            data={'language': 'python', 'project_name': 'Archive', 'archive': (buffer, filename), **form},
+            content_type='multipart/form-data',
+            headers=auth_headers
+        )
+
+    @pytest.mark.parametrize('kind, filename', [('zip', 'repo.zip'), ('tar', 'repo.tar.gz')])
+    def test_archive_members_are_analyzed(self, client, auth_headers, kind, filename):
+        """Test that matching members are analyzed and others skipped"""
+        buffer = getattr(self, f'{kind}_archive')(self.FILES)
+
+        response = self.post_archive(client, auth_headers, buffer, filename)
+
+        assert response.status_code == 200
+        names = sorted(entry['filename'] for entry in response.json['files'])
+        assert names == ['pkg/__init__.py', 'pkg/core.py', 'pkg/util.py']
+        assert response.json['total_files'] == 3
+
+    def test_oversized_members_are_reported(self, app, client, auth_headers):
+        """Test the per-member size limit"""
+        files = dict(self.FILES)
+        files['pkg/huge.py'] = b'x = 1\n' * 1000
+        app.config['SCAN_MAX_FILE_SIZE'] = 1000
+        try:
+            response = self.post_archive(client, auth_headers, self.zip_archive(files), 'repo.zip')
+        finally:
+            app.config['SCAN_MAX_FILE_SIZE'] = 1024 * 1024
+
+        errors = {entry['filename']: entry['error'] for entry in response.json['files'] if 'error' in entry}
+        assert errors == {'pkg/huge.py': 'too large'}
+
+    def test_total_size_limit_stops_reading(self, app, client, auth_headers):
+        """Test that the total size limit cuts the archive short"""
+        app.config['ARCHIVE_MAX_TOTAL_SIZE'] = 50
+        try:
+            response = self.post_archive(client, auth_headers, self.tar_archive(self.FILES), 'repo.tgz')
+        finally:
+            app.config['ARCHIVE_MAX_TOTAL_SIZE'] = 100 * 1024 * 1024
+
+        analyzed = [entry for entry in response.json['files'] if 'metrics' in entry]
+        assert len(analyzed) == 2
+        assert any(entry.get('error') == 'scan size limit reached' for entry in response.json['files'])
+
+    def test_archive_streams_ndjson(self, client, auth_headers):
+        """Test archive ingestion combined with NDJSON streaming"""
+        import json
+
+        response = self.post_archive(client, auth_headers, self.zip_archive(self.FILES), 'repo.zip', stream='true')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        assert lines[-1]['summary']['total_files'] == 3
+
+    def test_archive_in_files_field(self, client, auth_headers):
+        """Test that archives among the uploaded files are expanded"""
+        response = client.post('/analyze-batch',
+            data={
+                'language': 'python',
+                'project_name': 'Archive',
+                'files': [(self.zip_archive(self.FILES), 'repo.zip'), (BytesIO(b'x = 1\n'), 'extra.py')]
+            },
+            content_type='multipart/form-data',
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        names = sorted(entry['filename'] for entry in response.json['files'])
+        assert names == ['extra.py', 'pkg/__init__.py', 'pkg/core.py', 'pkg/util.py']
+
+    def test_invalid_archive(self, client, auth_headers):
+        """Test that unreadable archives are rejected"""
+        response = self.post_archive(client, auth_headers, BytesIO(b'not a zip'), 'repo.zip')
+        assert response.status_code == 400
+
+        response = self.post_archive(client, auth_headers, BytesIO(b'data'), 'repo.rar')
+        assert response.status_code == 400
@@ -82,3 +82,52 @@ class TestAuthRoutes:
 
         assert response.status_code == 401
         assert 'error' in response.json
+
+
+class TestUserCache:
+
+    def user_queries(self, app, client, auth_headers, requests=3):
+        from sqlalchemy import event
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM users' in statement:
+                statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                for _ in range(requests):
+                    assert client.get('/auth/me', headers=auth_headers).status_code == 200
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+        return len(statements)
+
+    def test_repeated_requests_skip_user_lookup(self, app, client, auth_headers):
+        assert self.user_queries(app, client, auth_headers) == 1
+
+    def test_expired_entries_are_reloaded(self, app, client, auth_headers):
+        app.config['AUTH_USER_CACHE_TTL'] = 0
+        try:
+            assert self.user_queries(app, client, auth_headers) == 3
+        finally:
+            app.config['AUTH_USER_CACHE_TTL'] = 60
+
+    def test_update_invalidates_cached_user(self, app, client, auth_headers):
+        client.get('/auth/me', headers=auth_headers)
+
+        with app.app_context():
+            user = User.query.filter_by(email='test@example.com').first()
+            user.name = 'Renamed'
+            db.session.commit()
+
+        assert client.get('/auth/me', headers=auth_headers).json['name'] == 'Renamed'
+
+    def test_deleted_user_is_rejected(self, app, client, auth_headers):
+        client.get('/auth/me', headers=auth_headers)
+
+        with app.app_context():
+            db.session.delete(User.query.filter_by(email='test@example.com').first())
+            db.session.commit()
+
+        assert client.get('/auth/me', headers=auth_headers).status_code == 401
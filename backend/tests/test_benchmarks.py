@@ -0,0 +1,54 @@
+import ast
+from benchmarks.corpus import generate_module, generate_corpus
+from benchmarks.compare import compare_results
+from benchmarks.timing import measure
+from infrastructure.code_analyzer import analyze_code
+
+
+class TestCorpus:
+    """Test the synthetic benchmark corpus"""
+
+    def test_modules_are_valid_and_deterministic(self):
+        source = generate_module(lines=300, max_nesting=4, seed=3)
+
+        ast.parse(source)
+        assert source == generate_module(lines=300, max_nesting=4, seed=3)
+        assert source != generate_module(lines=300, max_nesting=4, seed=4)
+
+    def test_controls_nesting_and_duplication(self):
+        flat = analyze_code(generate_module(lines=300, max_nesting=1, duplication=0.0), 'python')
+        nested = analyze_code(generate_module(lines=300, max_nesting=5, duplication=0.5), 'python')
+
+        assert flat['duplication_percentage'] == 0
+        assert nested['duplication_percentage'] > 0
+        assert nested['max_nesting_depth'] > flat['max_nesting_depth']
+
+    def test_corpus_files(self):
+        corpus = generate_corpus(files=3, lines=40)
+
+        assert [name for name, _ in corpus] == ['module_0.py', 'module_1.py', 'module_2.py']
+
+
+class TestBenchmarkResults:
+    """Test timing summaries and run comparison"""
+
+    def test_measure_summary(self):
+        calls = []
+
+        stats = measure(lambda: calls.append(1), rounds=5, warmup=1)
+
+        assert len(calls) == 6
+        assert stats['rounds'] == 5
+        assert stats['min'] <= stats['median'] <= stats['p95']
+
+    def test_compare_classifies_changes(self):
+        baseline = {'benchmarks': {
+            'a': {'median': 1.0}, 'b': {'median': 1.0}, 'c': {'median': 1.0}, 'gone': {'median': 1.0}
+        }}
+        current = {'benchmarks': {
+            'a': {'median': 1.5}, 'b': {'median': 0.5}, 'c': {'median': 1.05}, 'added': {'median': 1.0}
+        }}
+
+        statuses = {row[0]: row[4] for row in compare_results(baseline, current, threshold=0.1)}
+
+        assert statuses == {'a': 'slower', 'b': 'faster', 'c': 'same', 'gone': 'removed', 'added': 'new'}
@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy import event
+from infrastructure.cache import LRUCache, AnalysisCache, analysis_cache_key
+from infrastructure.scoring import config
+from models import db, AnalysisCacheEntry
+from infrastructure.executor import SerialExecutor
+import utils.analysis_cache as cache_module
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache_module.analysis_cache.clear()
+    yield
+    cache_module.analysis_cache.clear()
+
+
+@pytest.fixture
+def counted_analysis(monkeypatch):
+    calls = []
+    original = cache_module.analyze_code
+
+    def counting_analyze(code, language):
+        calls.append(code)
+        return original(code, language)
+
+    monkeypatch.setattr(cache_module, 'analyze_code', counting_analyze)
+    return calls
+
+
+class DictTier:
+    def __init__(self):
+        self.data = {}
+
+    def get_many(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_many(self, payloads):
+        self.data.update(payloads)
+
+
+class TestLRUCache:
+    """Test the in-process LRU"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert len(cache) == 2
+
+
+class TestAnalysisCache:
+    """Test the two-tier analysis result cache"""
+
+    def test_key_depends_on_version_and_config(self):
+        base = analysis_cache_key('abc', 'python', 1, config)
+
+        assert base == analysis_cache_key('abc', 'python', 1, config)
+        assert base != analysis_cache_key('abc', 'python', 2, config)
+        assert base != analysis_cache_key('abc', 'python', 1, {**config, 'max_complexity': 99})
+
+    def test_returns_fresh_copies(self):
+        cache = AnalysisCache(maxsize=4)
+        cache.set('key', {'score': 1})
+
+        first = cache.get('key')
+        first['saved'] = True
+
+        assert cache.get('key') == {'score': 1}
+
+    def test_falls_back_to_tier(self):
+        tier = DictTier()
+        cache = AnalysisCache(maxsize=4, tier=tier)
+        cache.set('key', {'score': 1})
+        cache.clear()
+
+        assert cache.get('key') == {'score': 1}
+        assert cache.hits == 1
+
+
+class TestCachedAnalyzeRoute:
+    """Test that analysis endpoints reuse results for identical code"""
+
+    def test_repeat_analyze_hits_cache(self, client, auth_headers, sample_code, counted_analysis):
+        for _ in range(2):
+            response = client.post('/analyze',
+                json={'code': sample_code, 'language': 'python'},
+                headers=auth_headers
+            )
+            assert response.status_code == 200
+
+        assert len(counted_analysis) == 1
+
+    def test_result_survives_memory_eviction(self, app, client, auth_headers, sample_code, counted_analysis):
+        client.post('/analyze',
+            json={'code': sample_code, 'language': 'python'},
+            headers=auth_headers
+        )
+        cache_module.analysis_cache.clear()
+
+        response = client.post('/analyze',
+            json={'code': sample_code, 'language': 'python', 'save_results': True},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        assert response.json['saved'] is True
+        assert len(counted_analysis) == 1
+        with app.app_context():
+            assert AnalysisCacheEntry.query.count() == 1
+
+
+class TestDatabaseCacheTier:
+    """Test the persistent cache tier"""
+
+    def test_batch_reads_and_writes_once(self, app):
+        sources = [f'def f{index}(value):\n    return value + {index}\n' for index in range(60)]
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if 'analysis_cache' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            cache_module.analyze_many_cached(sources, 'python', SerialExecutor())
+            cache_module.analysis_cache.clear()
+            outcomes = cache_module.analyze_many_cached(sources, 'python', SerialExecutor())
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        # Lookup and write for the first batch, one lookup for the second
+        assert len(statements) == 3
+        assert all(results is not None for _, results, _ in outcomes)
+
+    def test_refresh_overwrites_stored_result(self, app, sample_code):
+        key = cache_module._cache_key(cache_module.get_code_hash(sample_code), 'python')
+        cache_module.analysis_cache.set(key, {'stale': True})
+
+        results = cache_module.analyze_code_cached(sample_code, 'python', refresh=True)
+
+        cache_module.analysis_cache.clear()
+        assert cache_module.analysis_cache.get(key) == results
+
+    def test_table_is_bounded(self, app):
+        tier = cache_module.DatabaseCacheTier(max_entries=3, prune_every=1)
+        for index in range(5):
+            tier.set_many({f'key{index}': '{}'})
+
+        assert AnalysisCacheEntry.query.count() == 3
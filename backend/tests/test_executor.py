@@ -0,0 +1,117 @@
+import ast
+import time
+import pytest
+import infrastructure.code_analyzer as code_analyzer
+from infrastructure import budget
+from infrastructure.budget import BudgetExceeded, analysis_budget, BUDGET_EXCEEDED
+from infrastructure.metrics.engine import run_visitors
+from infrastructure.executor import (
+    SerialExecutor, ProcessPoolAnalysisExecutor, analyze_task, create_executor
+)
+import utils.analysis_cache as cache_module
+
+
+SOURCES = [
+    'def first():\n    return 1\n',
+    'def broken(:\n',
+    'def second(value):\n    if value:\n        return value\n',
+    'def first():\n    return 1\n',
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache_module.analysis_cache.clear()
+    yield
+    cache_module.analysis_cache.clear()
+
+
+class TestExecutors:
+    """Test serial and process-pool batch execution"""
+
+    def test_create_executor(self):
+        assert isinstance(create_executor(workers=1), SerialExecutor)
+        assert isinstance(create_executor(workers=4), ProcessPoolAnalysisExecutor)
+
+    def test_analyze_task_returns_errors(self):
+        results, error = analyze_task(('def broken(:\n', 'python'))
+
+        assert results is None
+        assert error
+
+    def test_process_pool_keeps_input_order(self):
+        tasks = [(code, 'python') for code in SOURCES]
+        executor = ProcessPoolAnalysisExecutor(max_workers=2, chunksize=1, min_items=0)
+        try:
+            parallel = executor.map(analyze_task, tasks)
+        finally:
+            executor.shutdown()
+
+        assert parallel == SerialExecutor().map(analyze_task, tasks)
+
+
+#Enough nodes for the traversal to reach a checkpoint
+LARGE_SOURCE = ''.join(f'def f{i}(a, b):\n    return a + b * {i}\n' for i in range(200))
+
+
+class TestAnalysisBudget:
+    """Test per-file time budgets"""
+
+    def test_traversal_checks_deadline(self):
+        tree = ast.parse(LARGE_SOURCE)
+
+        with pytest.raises(BudgetExceeded):
+            with analysis_budget(seconds=1e-9, memory_mb=0):
+                run_visitors(tree, [])
+
+        # Without a budget the same walk runs to the end
+        assert run_visitors(tree, []) == {}
+
+    def test_over_budget_file_is_skipped(self, monkeypatch):
+        monkeypatch.setattr(budget, 'TIME_BUDGET', 1e-9)
+        results, error = analyze_task((LARGE_SOURCE, 'python'))
+
+        assert results is None
+        assert error.startswith(BUDGET_EXCEEDED)
+
+        # The next file gets a fresh budget
+        monkeypatch.setattr(budget, 'TIME_BUDGET', 30)
+        results, error = analyze_task((SOURCES[0], 'python'))
+        assert error is None
+
+    def test_alarm_interrupts_worker_between_checkpoints(self, monkeypatch):
+        monkeypatch.setattr(budget, '_in_worker_process', lambda: True)
+        monkeypatch.setattr(code_analyzer, 'calculate_complexity', lambda unit: time.sleep(5))
+
+        started = time.monotonic()
+        with pytest.raises(BudgetExceeded):
+            with analysis_budget(seconds=0.05, memory_mb=0):
+                code_analyzer.analyze_code(SOURCES[0], 'python')
+        assert time.monotonic() - started < 2
+
+
+class TestAnalyzeMany:
+    """Test batch analysis through the cache"""
+
+    def test_outcomes_follow_input_order(self, app):
+        outcomes = cache_module.analyze_many_cached(SOURCES, 'python', SerialExecutor())
+
+        assert len(outcomes) == len(SOURCES)
+        assert outcomes[1][1] is None and outcomes[1][2]
+        assert outcomes[0][1] == outcomes[3][1]
+        assert outcomes[0][1] is not outcomes[3][1]
+        assert outcomes[2][1]['cyclomatic_complexity'] == 2
+
+    def test_duplicates_and_cached_files_are_not_reanalyzed(self, app):
+        executed = []
+
+        class RecordingExecutor(SerialExecutor):
+            def map(self, fn, items):
+                executed.extend(items)
+                return super().map(fn, items)
+
+        cache_module.analyze_many_cached(SOURCES, 'python', RecordingExecutor())
+        cache_module.analyze_many_cached(SOURCES, 'python', RecordingExecutor())
+
+        # Three distinct sources; only the broken one is retried
+        assert len(executed) == 4
@@ -0,0 +1,180 @@
+import os
+import subprocess
+import types
+import pytest
+from utils.git_utils import scan_repo_files, get_changed_files, get_git_info
+
+
+def write(path, content, mode='w'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+class TestScanRepoFiles:
+    """Test the streaming repository scanner"""
+
+    def test_is_lazy_generator(self, tmp_path):
+        write(tmp_path / 'a.py', 'x = 1\n')
+
+        files = scan_repo_files(str(tmp_path))
+
+        assert isinstance(files, types.GeneratorType)
+        assert list(files) == [('a.py', 'x = 1\n')]
+
+    def test_skips_ignored_dirs_and_extensions(self, tmp_path):
+        write(tmp_path / 'pkg' / 'mod.py', 'y = 2\n')
+        write(tmp_path / 'node_modules' / 'dep.py', 'z = 3\n')
+        write(tmp_path / 'lib.egg-info' / 'meta.py', 'z = 3\n')
+        write(tmp_path / 'notes.txt', 'hello')
+
+        paths = [path for path, _ in scan_repo_files(str(tmp_path))]
+
+        assert paths == ['pkg/mod.py']
+
+    def test_skips_binary_and_oversized_files(self, tmp_path):
+        write(tmp_path / 'ok.py', 'ok = True\n')
+        write(tmp_path / 'blob.py', b'\x00\x01binary', mode='wb')
+        write(tmp_path / 'huge.py', 'a = 1\n' * 100)
+        skipped = []
+
+        paths = [path for path, _ in scan_repo_files(str(tmp_path), max_file_size=100, skipped=skipped)]
+
+        assert paths == ['ok.py']
+        assert dict(skipped) == {'blob.py': 'binary', 'huge.py': 'too large'}
+
+    def test_total_size_limit_stops_scan(self, tmp_path):
+        for index in range(5):
+            write(tmp_path / f'm{index}.py', 'v = 1\n')
+
+        paths = list(scan_repo_files(str(tmp_path), max_total_size=13))
+
+        assert len(paths) == 2
+
+    def test_line_endings_are_normalized(self, tmp_path):
+        write(tmp_path / 'crlf.py', b'x = 1\r\ny = 2\r\n', mode='wb')
+        write(tmp_path / 'cr.py', b'x = 1\ry = 2\r', mode='wb')
+
+        assert dict(scan_repo_files(str(tmp_path))) == {'cr.py': 'x = 1\ny = 2\n', 'crlf.py': 'x = 1\ny = 2\n'}
+
+    def test_missing_path(self, tmp_path):
+        assert list(scan_repo_files(str(tmp_path / 'missing'))) == []
+
+
+class TestGetChangedFiles:
+    """Test git diff parsing for incremental scans"""
+
+    def test_reports_added_modified_deleted(self, tmp_path):
+        def git(*args):
+            subprocess.run(['git', '-C', str(tmp_path), '-c', 'user.name=T', '-c', 'user.email=t@e.x', *args],
+                           check=True, capture_output=True)
+
+        write(tmp_path / 'keep.py', 'a = 1\n')
+        write(tmp_path / 'gone.py', 'b = 1\n')
+        write(tmp_path / 'old name.py', 'c = 1\n')
+        git('init', '-q')
+        git('add', '.')
+        git('commit', '-q', '-m', 'one')
+        first = subprocess.run(['git', '-C', str(tmp_path), 'rev-parse', 'HEAD'],
+                               capture_output=True, text=True).stdout.strip()
+
+        write(tmp_path / 'keep.py', 'a = 2\n')
+        (tmp_path / 'gone.py').unlink()
+        (tmp_path / 'old name.py').rename(tmp_path / 'new name.py')
+        git('add', '-A')
+        git('commit', '-q', '-m', 'two')
+
+        changes = get_changed_files(str(tmp_path), first)
+
+        assert changes == {
+            'added': ['new name.py'],
+            'modified': ['keep.py'],
+            'deleted': ['gone.py', 'old name.py']
+        }
+
+    def test_unknown_commit(self, tmp_path):
+        assert get_changed_files(str(tmp_path), 'deadbeef') is None
+
+
+def run_git(repo, *args):
+    return subprocess.run(
+        ['git', '-C', str(repo), '-c', 'user.name=T', '-c', 'user.email=t@e.x', *args],
+        check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    write(tmp_path / 'main.py', 'x = 1\n')
+    run_git(tmp_path, 'init', '-q', '-b', 'main')
+    run_git(tmp_path, 'add', '.')
+    run_git(tmp_path, 'commit', '-q', '-m', 'Initial commit\n\nWith a body')
+    return tmp_path
+
+
+class TestGetGitInfo:
+    """Test reading commit metadata from the .git directory"""
+
+    def expected(self, repo):
+        return {
+            'commit_hash': run_git(repo, 'rev-parse', 'HEAD'),
+            'branch': run_git(repo, 'rev-parse', '--abbrev-ref', 'HEAD'),
+            'commit_message': run_git(repo, 'log', '-1', '--pretty=%B')
+        }
+
+    def test_matches_git_cli(self, git_repo):
+        assert get_git_info(str(git_repo)) == self.expected(git_repo)
+
+    def test_reads_without_git_or_chdir(self, git_repo, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError('unexpected call')
+        monkeypatch.setattr(os, 'chdir', fail)
+        monkeypatch.setattr(subprocess, 'run', fail)
+
+        assert get_git_info(str(git_repo / 'sub' / '..'))['branch'] == 'main'
+
+    def test_searches_upward_from_subdirectory(self, git_repo):
+        (git_repo / 'pkg').mkdir()
+
+        assert get_git_info(str(git_repo / 'pkg')) == self.expected(git_repo)
+
+    def test_new_commit_invalidates_cache(self, git_repo):
+        first = get_git_info(str(git_repo))
+        write(git_repo / 'main.py', 'x = 2\n')
+        run_git(git_repo, 'commit', '-q', '-am', 'Second')
+
+        info = get_git_info(str(git_repo))
+
+        assert info['commit_hash'] != first['commit_hash']
+        assert info == self.expected(git_repo)
+
+    def test_detached_head(self, git_repo):
+        run_git(git_repo, 'checkout', '-q', '--detach')
+
+        info = get_git_info(str(git_repo))
+
+        assert info['branch'] == 'HEAD'
+        assert info == self.expected(git_repo)
+
+    def test_packed_refs_and_objects(self, git_repo):
+        run_git(git_repo, 'gc', '-q')
+        assert not (git_repo / '.git' / 'refs' / 'heads' / 'main').exists()
+
+        assert get_git_info(str(git_repo)) == self.expected(git_repo)
+
+    def test_worktree(self, git_repo, tmp_path_factory):
+        worktree = tmp_path_factory.mktemp('wt') / 'checkout'
+        run_git(git_repo, 'worktree', 'add', '-q', '-b', 'feature', str(worktree))
+
+        info = get_git_info(str(worktree))
+
+        assert info['branch'] == 'feature'
+        assert info == self.expected(worktree)
+
+    def test_not_a_repository(self, tmp_path):
+        assert get_git_info(str(tmp_path)) is None
+
+    def test_repository_without_commits(self, tmp_path):
+        run_git(tmp_path, 'init', '-q')
+
+        assert get_git_info(str(tmp_path)) is None
@@ -0,0 +1,323 @@
+import ast
+import pytest
+from radon.complexity import cc_visit
+from radon.metrics import mi_visit
+from radon.raw import analyze
+
+from infrastructure.parsing import ParsedUnit, parse_unit
+from infrastructure.code_analyzer import analyze_code, analyze_unit
+from infrastructure.metrics.units import extract_units, unit_source
+from infrastructure.metrics.basic import (
+    calculate_complexity, calculate_maintainability, calculate_function_length
+)
+from infrastructure.metrics import engine
+from infrastructure.metrics.engine import MetricVisitor, register_visitor, run_visitors, visitor_results
+from infrastructure.metrics.ast_analysis import (
+    calculate_nesting_depth, calculate_cognitive_complexity, calculate_naming_quality,
+    calculate_duplication_ast, calculate_clone_blocks, get_ast_digest, get_ast_fingerprint, DIGEST_SIZE,
+    name_length_summary, expand_name_lengths
+)
+
+
+class TestParsedUnit:
+    """Test the shared parse pipeline"""
+
+    def test_parse_unit_reuses_existing_unit(self, sample_code):
+        """Test that parse_unit does not re-parse a ParsedUnit"""
+        unit = ParsedUnit(sample_code)
+
+        assert parse_unit(unit) is unit
+        assert isinstance(unit.tree, ast.Module)
+
+    def test_matches_radon(self, sample_code):
+        """Test that shared radon results match radon's own entry points"""
+        unit = parse_unit(sample_code)
+
+        assert unit.raw == analyze(sample_code)
+        assert [b.name for b in unit.cc_blocks] == [b.name for b in cc_visit(sample_code)]
+        assert unit.maintainability() == mi_visit(sample_code, multi=True)
+
+    def test_metrics_accept_code_or_unit(self, sample_code):
+        """Test that metric functions give the same result for code and units"""
+        unit = parse_unit(sample_code)
+
+        assert calculate_complexity(unit) == calculate_complexity(sample_code)
+        assert calculate_maintainability(unit) == calculate_maintainability(sample_code)
+        assert calculate_function_length(unit) == calculate_function_length(sample_code)
+        assert calculate_nesting_depth(unit) == calculate_nesting_depth(sample_code)
+
+    def test_syntax_error(self):
+        """Test that AST metrics fall back and radon metrics still raise"""
+        unit = parse_unit('def broken(:\n    pass\n')
+
+        assert unit.tree is None
+        assert calculate_nesting_depth(unit) == {'max_depth': 0, 'avg_depth': 0.0}
+        with pytest.raises(SyntaxError):
+            calculate_complexity(unit)
+
+    def test_analyze_code_parses_once(self, sample_code, monkeypatch):
+        """Test that a full analysis only calls ast.parse once"""
+        calls = []
+        original_parse = ast.parse
+
+        def counting_parse(*args, **kwargs):
+            calls.append(args)
+            return original_parse(*args, **kwargs)
+
+        monkeypatch.setattr(ast, 'parse', counting_parse)
+        analyze_code(sample_code, 'python')
+
+        assert len(calls) == 1
+
+
+class CallCounter(MetricVisitor):
+    name = 'call_counter'
+
+    def __init__(self):
+        self.calls = 0
+        self.max_depth = 0
+
+    def enter_handlers(self):
+        return {ast.Call: self.visit_call, ast.AST: self.visit_any}
+
+    def visit_call(self, node, depth):
+        self.calls += 1
+
+    def visit_any(self, node, depth):
+        self.max_depth = max(self.max_depth, depth)
+
+    def result(self):
+        return {'calls': self.calls, 'max_depth': self.max_depth}
+
+
+class TestVisitorEngine:
+    """Test the fused single-traversal metric engine"""
+
+    def test_run_visitors_feeds_every_visitor(self, sample_code):
+        """Test that typed and catch-all callbacks both fire"""
+        results = run_visitors(ast.parse(sample_code), [CallCounter()])
+
+        assert results['call_counter']['calls'] == 1
+        assert results['call_counter']['max_depth'] > 0
+
+    def test_builtin_metrics_share_one_traversal(self, sample_code, monkeypatch):
+        """Test that all AST metrics of a unit are computed in a single pass"""
+        passes = []
+        original_run = engine.run_visitors
+
+        def counting_run(tree, visitors):
+            passes.append(tree)
+            return original_run(tree, visitors)
+
+        monkeypatch.setattr(engine, 'run_visitors', counting_run)
+        unit = parse_unit(sample_code)
+        calculate_nesting_depth(unit)
+        calculate_cognitive_complexity(unit)
+        calculate_naming_quality(unit)
+
+        assert len(passes) == 1
+
+    def test_registered_plugin_runs_in_shared_pass(self, sample_code, monkeypatch):
+        """Test that a registered plugin visitor is fed by the shared pass"""
+        monkeypatch.setattr(engine, '_registered_visitors', engine.registered_visitors())
+        register_visitor(CallCounter)
+
+        results = visitor_results(parse_unit(sample_code))
+
+        assert results['call_counter']['calls'] == 1
+        assert 'nesting' in results
+
+    def test_deep_nesting_does_not_recurse(self):
+        """Test that very deep trees are walked without RecursionError"""
+        tree = ast.Module(body=[], type_ignores=[])
+        body = tree.body
+        for _ in range(5000):
+            node = ast.If(test=ast.Name(id='flag', ctx=ast.Load()), body=[], orelse=[])
+            body.append(node)
+            body = node.body
+
+        results = run_visitors(tree, [CallCounter()])
+
+        assert results['call_counter']['max_depth'] > 5000
+
+    def test_nesting_and_cognitive_complexity(self):
+        """Test depth-aware metrics on a known snippet"""
+        code = '''
+def check(items):
+    for item in items:
+        if item and item.ready:
+            return item
+'''
+        assert calculate_nesting_depth(code) == {'max_depth': 3, 'avg_depth': 2.0}
+        assert calculate_cognitive_complexity(code) == 6
+
+
+class TestStructuralDigests:
+    """Test Merkle-hash fingerprints used for duplication detection"""
+
+    def test_digest_matches_fingerprint_equality(self):
+        tree = ast.parse('''
+def first(items):
+    total = 0
+    for item in items:
+        total += item * 2
+    return total
+
+def second(values):
+    count = 1
+    for value in values:
+        count += value * 7
+    return count
+
+def third(values):
+    count = 1
+    for value in values:
+        count -= value * 7
+    return count
+''')
+        first, second, third = tree.body
+
+        assert get_ast_fingerprint(first) == get_ast_fingerprint(second)
+        assert get_ast_digest(first) == get_ast_digest(second)
+        assert get_ast_digest(first) != get_ast_digest(third)
+        assert len(get_ast_digest(first)) == DIGEST_SIZE
+
+    def test_name_context_is_significant(self):
+        load = ast.parse('value', mode='eval').body
+        store = ast.parse('value = 1').body[0].targets[0]
+
+        assert get_ast_digest(load) != get_ast_digest(store)
+
+    def test_deep_tree_digest(self):
+        """Test that digests do not recurse on very deep trees"""
+        node = ast.Name(id='leaf', ctx=ast.Load())
+        for _ in range(5000):
+            node = ast.UnaryOp(op=ast.Not(), operand=node)
+
+        assert len(get_ast_digest(node)) == DIGEST_SIZE
+
+    def test_duplication_report(self):
+        code = '''
+def first(items):
+    for item in items:
+        print(item)
+
+def second(things):
+    for thing in things:
+        print(thing)
+'''
+        percentage, blocks = calculate_duplication_ast(code)
+
+        assert blocks == ['Block near line 6 duplicated.', 'Block near line 7 duplicated.']
+        assert percentage == 50.0
+
+    def test_clone_blocks(self):
+        code = '''
+def short(value):
+    return value
+
+def first(items):
+    total = 0
+    for item in items:
+        total += item
+    print(total)
+    return total
+
+def second(things):
+    count = 0
+    for thing in things:
+        count += thing
+    print(count)
+    return count
+'''
+        blocks = calculate_clone_blocks(code)
+
+        assert [block['name'] for block in blocks] == ['first', 'second']
+        assert blocks[0]['hash'] == blocks[1]['hash']
+        assert blocks[0]['bands'] == blocks[1]['bands'] and len(blocks[0]['bands']) == 8
+        assert (blocks[0]['start_line'], blocks[0]['end_line']) == (5, 10)
+
+
+class TestNameLengthStats:
+    """Test the compact name length histogram and quantiles"""
+
+    def test_counts_match_sorted_lengths(self, sample_code):
+        """Test that the counting array expands to the old sorted list"""
+        names = [node.id for node in ast.walk(ast.parse(sample_code)) if isinstance(node, ast.Name)]
+        naming = calculate_naming_quality(sample_code)
+
+        assert expand_name_lengths(naming['name_length_counts']) == sorted(len(name) for name in names)
+        assert naming['name_length_stats']['count'] == len(names)
+
+    def test_quantiles_and_histogram(self):
+        """Test nearest-rank quantiles and fixed buckets"""
+        lengths = [1, 2, 3, 3, 4, 5, 8, 9, 12, 40]
+        counts = [0] * 41
+        for length in lengths:
+            counts[length] += 1
+
+        summary = name_length_summary(counts)
+
+        assert (summary['min'], summary['max']) == (1, 40)
+        assert summary['median'] == 4
+        assert summary['p25'] == 3
+        assert summary['p90'] == 12
+        histogram = {(bucket['min'], bucket['max']): bucket['count'] for bucket in summary['histogram']}
+        assert histogram[(4, 5)] == 2
+        assert histogram[(8, 10)] == 2
+        assert histogram[(31, None)] == 1
+        assert sum(histogram.values()) == len(lengths)
+
+    def test_empty_summary(self):
+        """Test the summary of code without names"""
+        summary = name_length_summary([])
+
+        assert summary['count'] == 0
+        assert summary['median'] is None
+        assert all(bucket['count'] == 0 for bucket in summary['histogram'])
+
+
+class TestAnalysisUnits:
+    """Test function and class unit extraction"""
+
+    def test_units_and_qualified_names(self, sample_code):
+        """Test that functions, classes and methods become units"""
+        units = {unit['name']: unit for unit in extract_units(sample_code)}
+
+        assert set(units) == {
+            'calculate_sum', 'calculate_product', 'Calculator', 'Calculator.__init__', 'Calculator.add'
+        }
+        assert units['Calculator.add']['kind'] == 'method'
+        assert units['Calculator']['kind'] == 'class'
+
+    def test_hash_ignores_formatting_and_position(self):
+        """Test that comments, blank lines and moves keep the hash"""
+        before = 'def f(x):\n    return x + 1\n'
+        after = '\n\n# moved\ndef f(x):\n\n    return x + 1  # same\n'
+
+        assert extract_units(before)[0]['hash'] == extract_units(after)[0]['hash']
+        assert extract_units(before)[0]['hash'] != extract_units('def f(x):\n    return x + 2\n')[0]['hash']
+
+    def test_class_hash_excludes_methods(self):
+        """Test that editing a method leaves its class unit unchanged"""
+        before = 'class A:\n    size = 1\n    def m(self):\n        return 1\n'
+        after = 'class A:\n    size = 1\n    def m(self):\n        return 2\n'
+        units_before = {unit['name']: unit['hash'] for unit in extract_units(before)}
+        units_after = {unit['name']: unit['hash'] for unit in extract_units(after)}
+
+        assert units_before['A'] == units_after['A']
+        assert units_before['A.m'] != units_after['A.m']
+
+    def test_repeated_names_are_numbered(self):
+        """Test that redefinitions get distinct names"""
+        code = 'def f():\n    pass\n\ndef f():\n    return 1\n'
+
+        assert [unit['name'] for unit in extract_units(code)] == ['f', 'f#2']
+
+    def test_unit_source_is_analyzable(self, sample_code):
+        """Test that method and class sources parse on their own"""
+        lines = sample_code.splitlines()
+        for unit in extract_units(sample_code):
+            metrics = analyze_unit(unit_source(lines, unit))
+            assert metrics['lines_of_code'] > 0
+            assert 0 <= metrics['readability_score'] <= 100
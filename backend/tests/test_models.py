@@ -1,5 +1,8 @@
 import pytest
 from models import db, User, Project, ProjectFile, FileAnalysis
+from utils import db_utils
+from utils.persistence import AnalysisWriter
+from utils.analysis_cache import analyze_code_cached
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
@@ -112,6 +115,85 @@ class TestProjectFileModel:
             assert project_file.total_analyses == 1
 
 
+    def test_project_file_unique_per_project(self, app, sample_project):
+        with app.app_context():
+            for _ in range(2):
+                db.session.add(ProjectFile(project_id=sample_project.id, filename='dup.py', language='python'))
+
+            with pytest.raises(Exception):
+                db.session.commit()
+
+
+class TestUpsert:
+    def upsert_file(self, project_id, score):
+        db_utils.upsert(
+            ProjectFile,
+            [{'project_id': project_id, 'filename': 'up.py', 'language': 'python',
+              'current_score': score, 'total_analyses': 1}],
+            ('project_id', 'filename'),
+            set_=lambda table, excluded: {
+                'current_score': excluded.current_score,
+                'total_analyses': table.total_analyses + 1
+            }
+        )
+
+    def test_upsert_updates_existing_row(self, app, sample_project):
+        with app.app_context():
+            self.upsert_file(sample_project.id, 50.0)
+            self.upsert_file(sample_project.id, 70.0)
+            db.session.commit()
+
+            files = ProjectFile.query.filter_by(filename='up.py').all()
+            assert len(files) == 1
+            assert files[0].current_score == 70.0
+            assert files[0].total_analyses == 2
+
+    def test_upsert_do_nothing_keeps_row(self, app, sample_project):
+        with app.app_context():
+            self.upsert_file(sample_project.id, 50.0)
+            db_utils.upsert(
+                ProjectFile,
+                [{'project_id': sample_project.id, 'filename': 'up.py', 'language': 'python', 'current_score': 10.0}],
+                ('project_id', 'filename')
+            )
+            db.session.commit()
+
+            assert ProjectFile.query.filter_by(filename='up.py').one().current_score == 50.0
+
+    def test_fallback_without_on_conflict(self, app, sample_project, monkeypatch):
+        monkeypatch.setattr(db_utils, 'UPSERT_DIALECTS', ())
+
+        with app.app_context():
+            self.upsert_file(sample_project.id, 50.0)
+            self.upsert_file(sample_project.id, 70.0)
+            db.session.commit()
+
+            row = ProjectFile.query.filter_by(filename='up.py').one()
+            assert row.current_score == 70.0
+            assert row.total_analyses == 2
+
+
+class TestAnalysisWriter:
+    def test_total_analyses_counted_in_sql(self, app, sample_project, sample_code):
+        with app.app_context():
+            project = db.session.get(Project, sample_project.id)
+            results = analyze_code_cached(sample_code, 'python')
+            first = AnalysisWriter(project, 'python')
+            first.add('counted.py', 'a', results)
+            first.add('counted.py', 'b', results)
+            first.commit()
+
+            # Both prefetch the file, neither may overwrite the other's count
+            second = AnalysisWriter(project, 'python')
+            third = AnalysisWriter(project, 'python')
+            second.add('counted.py', 'c', results)
+            second.commit()
+            third.add('counted.py', 'd', results)
+            third.commit()
+
+            assert ProjectFile.query.filter_by(filename='counted.py').one().total_analyses == 4
+
+
 class TestFileAnalysisModel:
     def test_create_file_analysis(self, app, sample_project):
         with app.app_context():
@@ -0,0 +1,858 @@
+import pytest
+from models import db, Project, ProjectFile, FileAnalysis
+
+
+@pytest.fixture
+def repo_project(app, client, auth_headers, tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'main.py').write_text('def main():\n    return 1\n')
+    (tmp_path / 'pkg' / 'util.py').write_text('def helper(value):\n    return value\n')
+
+    response = client.post('/projects', json={'name': 'Repo'}, headers=auth_headers)
+    project_id = response.json['id']
+
+    with app.app_context():
+        project = db.session.get(Project, project_id)
+        project.git_repo_path = str(tmp_path)
+        db.session.commit()
+
+    return project_id
+
+
+class TestScanRepo:
+    """Test repository scanning"""
+
+    def test_scan_repo_analyzes_files(self, app, repo_project):
+        summary = scan(app, repo_project)
+
+        assert summary['files_analyzed'] == 2
+        with app.app_context():
+            filenames = {f.filename for f in ProjectFile.query.filter_by(project_id=repo_project)}
+            assert filenames == {'main.py', 'pkg/util.py'}
+            assert FileAnalysis.query.count() == 2
+
+    def test_scan_repo_commits_in_batches(self, app, repo_project):
+        app.config['SCAN_BATCH_SIZE'] = 1
+        try:
+            summary = scan(app, repo_project)
+        finally:
+            app.config['SCAN_BATCH_SIZE'] = 200
+
+        assert summary['files_analyzed'] == 2
+
+    def test_scan_repo_endpoint_queues_a_job(self, app, client, auth_headers, repo_project):
+        from utils.jobs import run_pending_jobs
+
+        response = client.post(f'/projects/{repo_project}/scan-repo', json={'incremental': True}, headers=auth_headers)
+
+        assert response.status_code == 202
+        assert response.json['status'] == 'queued'
+        assert response.json['incremental'] is True
+        with app.app_context():
+            assert FileAnalysis.query.count() == 0
+            run_pending_jobs()
+
+        job = client.get(f"/projects/{repo_project}/scan-jobs/{response.json['id']}", headers=auth_headers).json
+        assert job['status'] == 'completed'
+        assert job['files_analyzed'] == 2
+
+    def test_scan_repo_without_git(self, client, auth_headers):
+        response = client.post('/projects', json={'name': 'No Git'}, headers=auth_headers)
+
+        response = client.post(f"/projects/{response.json['id']}/scan-repo", headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestScanJobs:
+    """Test background scan jobs"""
+
+    def test_enqueue_and_run_job(self, app, client, auth_headers, repo_project):
+        from utils.jobs import run_pending_jobs
+
+        response = client.post(f'/projects/{repo_project}/scan-jobs', headers=auth_headers)
+
+        assert response.status_code == 202
+        job_id = response.json['id']
+        assert response.json['status'] == 'queued'
+
+        with app.app_context():
+            run_pending_jobs()
+
+        response = client.get(f'/projects/{repo_project}/scan-jobs/{job_id}', headers=auth_headers)
+
+        assert response.json['status'] == 'completed'
+        assert response.json['files_analyzed'] == 2
+        assert response.json['files_failed'] == 0
+
+    def test_job_records_skipped_files(self, app, client, auth_headers, repo_project, monkeypatch):
+        from infrastructure import budget
+        from utils.jobs import run_pending_jobs
+        import utils.analysis_cache as cache_module
+
+        cache_module.analysis_cache.clear()
+        monkeypatch.setattr(budget, 'TIME_BUDGET', 1e-9)
+        job_id = client.post(f'/projects/{repo_project}/scan-jobs', headers=auth_headers).json['id']
+
+        with app.app_context():
+            run_pending_jobs()
+
+        response = client.get(f'/projects/{repo_project}/scan-jobs/{job_id}', headers=auth_headers)
+
+        assert response.json['status'] == 'completed'
+        assert response.json['files_skipped'] == 2
+        assert {entry['file'] for entry in response.json['skipped']} == {'main.py', 'pkg/util.py'}
+        assert all(entry['reason'].startswith(budget.BUDGET_EXCEEDED) for entry in response.json['skipped'])
+
+    def test_cancel_queued_job(self, app, client, auth_headers, repo_project):
+        from utils.jobs import run_pending_jobs
+
+        job_id = client.post(f'/projects/{repo_project}/scan-jobs', headers=auth_headers).json['id']
+
+        response = client.delete(f'/projects/{repo_project}/scan-jobs/{job_id}', headers=auth_headers)
+
+        assert response.json['status'] == 'cancelled'
+        with app.app_context():
+            run_pending_jobs()
+            assert FileAnalysis.query.count() == 0
+
+        response = client.delete(f'/projects/{repo_project}/scan-jobs/{job_id}', headers=auth_headers)
+        assert response.status_code == 409
+
+    def test_running_job_stops_when_cancelled(self, app, client, auth_headers, repo_project):
+        from utils.jobs import claim_next_job, run_job
+
+        app.config['SCAN_BATCH_SIZE'] = 1
+        job_id = client.post(f'/projects/{repo_project}/scan-jobs', headers=auth_headers).json['id']
+        try:
+            with app.app_context():
+                job = claim_next_job()
+                assert job.id == job_id
+                job.cancel_requested = True
+                db.session.commit()
+                job = run_job(job)
+
+                assert job.status == 'cancelled'
+                assert job.files_analyzed == 0
+        finally:
+            app.config['SCAN_BATCH_SIZE'] = 200
+
+    def test_stale_running_jobs_are_recovered(self, app, client, auth_headers, repo_project):
+        from datetime import datetime, timedelta
+        from utils.jobs import claim_next_job, STALE_JOB_ERROR
+        from models import ScanJob
+
+        long_ago = datetime.utcnow() - timedelta(hours=1)
+        with app.app_context():
+            owner_id = db.session.get(Project, repo_project).user_id
+            crashed = ScanJob(project_id=repo_project, user_id=owner_id, status='running',
+                              started_at=long_ago, heartbeat_at=long_ago, attempts=1)
+            exhausted = ScanJob(project_id=repo_project, user_id=owner_id, status='running',
+                                started_at=long_ago, attempts=3)
+            stopping = ScanJob(project_id=repo_project, user_id=owner_id, status='running',
+                               started_at=long_ago, attempts=1, cancel_requested=True)
+            db.session.add_all([crashed, exhausted, stopping])
+            db.session.commit()
+
+            # The project is no longer blocked and the crashed job runs again
+            job = claim_next_job()
+
+            assert job.id == crashed.id
+            assert job.status == 'running' and job.attempts == 2
+            db.session.refresh(exhausted)
+            db.session.refresh(stopping)
+            assert exhausted.status == 'failed' and exhausted.error_message == STALE_JOB_ERROR
+            assert stopping.status == 'cancelled'
+
+    def test_live_running_job_is_not_recovered(self, app, client, auth_headers, repo_project):
+        from datetime import datetime
+        from utils.jobs import recover_stale_jobs
+        from models import ScanJob
+
+        with app.app_context():
+            owner_id = db.session.get(Project, repo_project).user_id
+            db.session.add(ScanJob(project_id=repo_project, user_id=owner_id, status='running',
+                                   started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow()))
+            db.session.commit()
+
+            assert recover_stale_jobs() == 0
+
+    def test_claim_is_fair_across_users(self, app, sample_user, sample_project, repo_project):
+        from utils.jobs import claim_next_job
+        from models import ScanJob
+
+        with app.app_context():
+            owner_id = db.session.get(Project, repo_project).user_id
+            second_project = Project(user_id=owner_id, name='Second')
+            db.session.add(second_project)
+            db.session.flush()
+
+            # First user has a scan running and another queued ahead of user two
+            db.session.add_all([
+                ScanJob(project_id=repo_project, user_id=owner_id, status='running'),
+                ScanJob(project_id=second_project.id, user_id=owner_id),
+                ScanJob(project_id=sample_project.id, user_id=sample_user.id),
+            ])
+            db.session.commit()
+
+            job = claim_next_job()
+
+            assert job.user_id == sample_user.id
+
+
+def git(repo, *args):
+    import subprocess
+    subprocess.run(
+        ['git', '-C', str(repo), '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        check=True, capture_output=True
+    )
+
+
+def scan(app, project_id, incremental=False):
+    """Run a scan in this thread and return its summary"""
+    from utils.repo_scan import scan_project_repo
+
+    with app.app_context():
+        return scan_project_repo(db.session.get(Project, project_id), incremental=incremental)
+
+
+class TestIncrementalScan:
+    """Test git-diff-driven incremental rescans"""
+
+    def test_only_changed_files_are_analyzed(self, app, client, auth_headers, repo_project, tmp_path):
+        git(tmp_path, 'init', '-q')
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', 'initial')
+
+        summary = scan(app, repo_project, incremental=True)
+        # No previous scan yet, so the first one is full
+        assert summary['mode'] == 'full'
+        assert summary['files_analyzed'] == 2
+
+        (tmp_path / 'main.py').unlink()
+        (tmp_path / 'pkg' / 'util.py').write_text('def helper(value):\n    return value * 2\n')
+        (tmp_path / 'new.py').write_text('NEW = 1\n')
+        git(tmp_path, 'add', '-A')
+        git(tmp_path, 'commit', '-q', '-m', 'change')
+
+        summary = scan(app, repo_project, incremental=True)
+
+        assert summary['mode'] == 'incremental'
+        assert summary['files_analyzed'] == 2
+        assert summary['files_deleted'] == 1
+        with app.app_context():
+            files = {f.filename: f for f in ProjectFile.query.filter_by(project_id=repo_project)}
+            assert files['main.py'].is_deleted is True
+            assert files['pkg/util.py'].total_analyses == 2
+            assert files['new.py'].total_analyses == 1
+
+        summary = scan(app, repo_project, incremental=True)
+
+        assert summary['files_analyzed'] == 0
+        assert summary['files_unchanged'] == 2
+
+    def test_project_in_repo_subdirectory(self, app, client, auth_headers, repo_project, tmp_path):
+        repo = tmp_path.parent / f'{tmp_path.name}-outer'
+        (repo / 'other').mkdir(parents=True)
+        (repo / 'other' / 'x.py').write_text('X = 1\n')
+        tmp_path.rename(repo / 'svc')
+        with app.app_context():
+            db.session.get(Project, repo_project).git_repo_path = str(repo / 'svc')
+            db.session.commit()
+        git(repo, 'init', '-q')
+        git(repo, 'add', '.')
+        git(repo, 'commit', '-q', '-m', 'initial')
+        scan(app, repo_project, incremental=True)
+
+        (repo / 'svc' / 'main.py').write_text('def main():\n    return 2\n')
+        (repo / 'other' / 'x.py').write_text('X = 2\n')
+        git(repo, 'commit', '-qam', 'change')
+
+        summary = scan(app, repo_project, incremental=True)
+
+        assert summary['mode'] == 'incremental'
+        assert summary['files_analyzed'] == 1
+        assert summary['files_skipped'] == []
+
+    def test_unreadable_file_keeps_baseline(self, app, client, auth_headers, repo_project, tmp_path):
+        git(tmp_path, 'init', '-q')
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', 'initial')
+        scan(app, repo_project, incremental=True)
+        with app.app_context():
+            baseline = db.session.get(Project, repo_project).last_scanned_commit
+
+        # A dangling symlink is in git but cannot be read from disk
+        (tmp_path / 'broken.py').symlink_to(tmp_path / 'missing.py')
+        git(tmp_path, 'add', '-A')
+        git(tmp_path, 'commit', '-q', '-m', 'link')
+
+        summary = scan(app, repo_project, incremental=True)
+
+        assert summary['files_skipped'][0]['file'] == 'broken.py'
+        with app.app_context():
+            assert db.session.get(Project, repo_project).last_scanned_commit == baseline
+
+    def test_falls_back_to_full_scan_without_git(self, app, repo_project):
+        summary = scan(app, repo_project, incremental=True)
+
+        assert summary['mode'] == 'full'
+        assert summary['files_analyzed'] == 2
+
+
+class TestBulkPersistence:
+    """Test set-based writes of analysis results"""
+
+    def test_scan_statement_count_does_not_grow_with_files(self, app, client, auth_headers, repo_project, tmp_path):
+        from sqlalchemy import event
+
+        for index in range(30):
+            (tmp_path / f'module_{index}.py').write_text(f'VALUE_{index} = {index}\n')
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('INSERT', 'UPDATE', 'SELECT')):
+                statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+            event.listen(engine, 'before_cursor_execute', count)
+            try:
+                summary = scan(app, repo_project)
+            finally:
+                event.remove(engine, 'before_cursor_execute', count)
+
+            assert summary['files_analyzed'] == 32
+            file_writes = [s for s in statements if 'project_files' in s or 'file_analyses' in s]
+            assert len(file_writes) < 15
+            assert FileAnalysis.query.count() == 32
+
+    def test_rescan_updates_existing_files(self, app, client, auth_headers, repo_project):
+        scan(app, repo_project)
+        scan(app, repo_project)
+
+        with app.app_context():
+            files = ProjectFile.query.filter_by(project_id=repo_project).all()
+            assert len(files) == 2
+            assert all(f.total_analyses == 2 for f in files)
+            assert all(f.current_score is not None and f.last_analyzed for f in files)
+
+
+SHARED_FUNCTION = '''
+def normalize(records):
+    cleaned = []
+    for record in records:
+        if record.get('active'):
+            cleaned.append(record['name'].strip())
+    return sorted(cleaned)
+'''
+
+
+class TestCloneIndex:
+    """Test the project-wide cross-file clone index"""
+
+    def test_scan_reports_files_sharing_blocks(self, app, client, auth_headers, repo_project, tmp_path):
+        (tmp_path / 'main.py').write_text(SHARED_FUNCTION)
+        (tmp_path / 'pkg' / 'util.py').write_text(SHARED_FUNCTION.replace('records', 'rows'))
+
+        scan(app, repo_project)
+        response = client.get(f'/projects/{repo_project}/clones', headers=auth_headers)
+
+        assert response.status_code == 200
+        pairs = response.json['pairs']
+        assert len(pairs) == 1
+        assert {pairs[0]['file_a']['filename'], pairs[0]['file_b']['filename']} == {'main.py', 'pkg/util.py'}
+        assert pairs[0]['exact_blocks'] == 1
+        assert pairs[0]['duplicated_lines'] == 6
+
+    def test_near_clones_share_bands(self, app, client, auth_headers, repo_project, tmp_path):
+        shapes = ['value = source.get(1)', 'value = value + 1', 'items = [value]', 'items.append(value * 2)',
+                  'total = sum(items)', 'if total:\n        total -= 1', 'name = str(total)', 'print(name, value)',
+                  'flag = not items', 'value = {value: total}', 'count = len(value)', 'del items']
+        body = ''.join(f'    {shape}\n' for shape in shapes)
+        (tmp_path / 'main.py').write_text(f'def first(source):\n{body}    return value_0\n')
+        (tmp_path / 'pkg' / 'util.py').write_text(f'def second(source):\n{body}    print(source)\n    return value_0\n')
+
+        scan(app, repo_project)
+        pairs = client.get(f'/projects/{repo_project}/clones', headers=auth_headers).json['pairs']
+
+        assert len(pairs) == 1
+        assert pairs[0]['exact_blocks'] == 0
+        assert pairs[0]['near_blocks'] == 1
+
+    def test_rescan_replaces_blocks_and_deleted_files_leave_index(self, app, client, auth_headers, repo_project, tmp_path):
+        from models import CloneBlock
+
+        (tmp_path / 'main.py').write_text(SHARED_FUNCTION)
+        (tmp_path / 'pkg' / 'util.py').write_text(SHARED_FUNCTION)
+        git(tmp_path, 'init', '-q')
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', 'initial')
+
+        scan(app, repo_project)
+        scan(app, repo_project)
+        with app.app_context():
+            assert CloneBlock.query.count() == 2
+
+        (tmp_path / 'main.py').unlink()
+        git(tmp_path, 'add', '-A')
+        git(tmp_path, 'commit', '-q', '-m', 'remove')
+        scan(app, repo_project, incremental=True)
+
+        with app.app_context():
+            assert CloneBlock.query.count() == 1
+        assert client.get(f'/projects/{repo_project}/clones', headers=auth_headers).json['pairs'] == []
+
+    def test_batch_upload_updates_index(self, app, client, auth_headers):
+        from io import BytesIO
+
+        response = client.post('/analyze-batch', data={
+            'project_name': 'Clones',
+            'files': [
+                (BytesIO(SHARED_FUNCTION.encode()), 'a.py'),
+                (BytesIO(SHARED_FUNCTION.encode()), 'b.py')
+            ]
+        }, headers=auth_headers, content_type='multipart/form-data')
+
+        assert 'clone_blocks' not in response.json['files'][0]['metrics']
+        project_id = response.json['project_id']
+        pairs = client.get(f'/projects/{project_id}/clones', headers=auth_headers).json['pairs']
+        assert pairs[0]['exact_blocks'] == 1
+
+
+class TestProjectListing:
+    """Test aggregated project listing and detail stats"""
+
+    def create_projects(self, app, client, auth_headers, count=3):
+        from datetime import datetime
+
+        ids = []
+        for index in range(count):
+            ids.append(client.post('/projects', json={'name': f'P{index}'}, headers=auth_headers).json['id'])
+
+        with app.app_context():
+            for project_id in ids[:2]:
+                for score in (60.0, 80.0, 90.0):
+                    db.session.add(ProjectFile(
+                        project_id=project_id,
+                        filename=f'f{score}.py',
+                        language='python',
+                        current_score=score,
+                        last_analyzed=datetime(2026, 1, int(score) // 10)
+                    ))
+            db.session.commit()
+        return ids
+
+    def test_listing_uses_constant_queries(self, app, client, auth_headers):
+        from sqlalchemy import event
+
+        ids = self.create_projects(app, client, auth_headers, count=5)
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                response = client.get('/projects', headers=auth_headers)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+        projects = {p['id']: p for p in response.json}
+        assert projects[ids[0]]['file_count'] == 3
+        assert projects[ids[0]]['avg_score'] == 76.67
+        assert projects[ids[0]]['last_analyzed'] == '2026-01-09T00:00:00'
+        assert projects[ids[4]]['file_count'] == 0
+        assert projects[ids[4]]['avg_score'] is None
+        # Version stamp, projects and one grouped stats query
+        assert len([s for s in statements if 'project_files' in s]) == 2
+        assert len(statements) <= 4
+
+    def test_detail_stats(self, app, client, auth_headers):
+        ids = self.create_projects(app, client, auth_headers, count=1)
+
+        response = client.get(f'/projects/{ids[0]}', headers=auth_headers)
+
+        assert response.json['project']['file_count'] == 3
+        assert response.json['project']['avg_score'] == 76.67
+        assert len(response.json['files']) == 3
+
+    def test_stats_skip_deleted_files(self, app, client, auth_headers):
+        ids = self.create_projects(app, client, auth_headers, count=1)
+        with app.app_context():
+            ProjectFile.query.filter_by(project_id=ids[0], filename='f60.0.py').update({'is_deleted': True})
+            db.session.commit()
+
+        project = client.get('/projects', headers=auth_headers).json[0]
+        detail = client.get(f'/projects/{ids[0]}', headers=auth_headers).json['project']
+
+        assert project['file_count'] == detail['file_count'] == 2
+        assert project['avg_score'] == detail['avg_score'] == 85.0
+
+    def test_stats_count_files_without_deleted_flag(self, app, client, auth_headers):
+        ids = self.create_projects(app, client, auth_headers, count=1)
+        with app.app_context():
+            # Rows from before is_deleted existed
+            ProjectFile.query.filter_by(project_id=ids[0]).update({'is_deleted': None})
+            db.session.commit()
+
+        project = client.get('/projects', headers=auth_headers).json[0]
+
+        assert project['file_count'] == 3
+
+
+class TestFileHistory:
+    """Test paginated, projected and downsampled file history"""
+
+    @pytest.fixture
+    def history_file(self, app, client, auth_headers):
+        from datetime import datetime, timedelta
+
+        project_id = client.post('/projects', json={'name': 'History'}, headers=auth_headers).json['id']
+        with app.app_context():
+            file = ProjectFile(project_id=project_id, filename='a.py', language='python')
+            db.session.add(file)
+            db.session.flush()
+            start = datetime(2026, 1, 1)
+            for index in range(25):
+                db.session.add(FileAnalysis(
+                    file_id=file.id,
+                    # Pairs share a timestamp so the id tie-break matters
+                    timestamp=start + timedelta(hours=index // 2),
+                    readability_score=float(index),
+                    cyclomatic_complexity=1.0,
+                    maintainability_index=50.0,
+                    lines_of_code=index
+                ))
+            db.session.commit()
+            return project_id, file.id
+
+    def url(self, history_file):
+        project_id, file_id = history_file
+        return f'/projects/{project_id}/files/{file_id}/history'
+
+    def test_keyset_pagination_walks_all_rows_once(self, client, auth_headers, history_file):
+        seen = []
+        cursor = None
+        while True:
+            query = '?limit=10' + (f'&cursor={cursor}' if cursor else '')
+            response = client.get(self.url(history_file) + query, headers=auth_headers)
+            assert response.status_code == 200
+            seen.extend(row['readability_score'] for row in response.json['history'])
+            cursor = response.json['next_cursor']
+            if not cursor:
+                break
+
+        assert seen == [float(index) for index in reversed(range(25))]
+
+    def test_fields_projection(self, client, auth_headers, history_file):
+        response = client.get(self.url(history_file) + '?fields=readability_score&limit=2', headers=auth_headers)
+
+        assert response.json['history'][0] == {'readability_score': 24.0}
+
+    def test_invalid_parameters(self, client, auth_headers, history_file):
+        assert client.get(self.url(history_file) + '?fields=password', headers=auth_headers).status_code == 400
+        assert client.get(self.url(history_file) + '?cursor=!!', headers=auth_headers).status_code == 400
+
+    def test_chart_mode_downsamples(self, client, auth_headers, history_file):
+        response = client.get(self.url(history_file) + '?mode=chart&points=5&fields=readability_score', headers=auth_headers)
+
+        chart = response.json['chart']
+        assert len(chart) == 5
+        assert [point['count'] for point in chart] == [5] * 5
+        assert chart[0]['readability_score'] == 2.0
+        assert (chart[0]['readability_score_min'], chart[0]['readability_score_max']) == (0.0, 4.0)
+        assert chart[0]['timestamp'] == '2026-01-01T00:00:00'
+        assert chart[0]['end_timestamp'] == '2026-01-01T02:00:00'
+
+    def test_chart_with_fewer_rows_than_points(self, client, auth_headers, history_file):
+        response = client.get(self.url(history_file) + '?mode=chart&points=100', headers=auth_headers)
+
+        assert len(response.json['chart']) == 25
+        assert response.json['chart'][-1]['maintainability_index'] == 50.0
+
+
+class TestTrends:
+    """Test rollup-backed trend endpoints"""
+
+    def test_scan_updates_rollups(self, app, client, auth_headers, repo_project, tmp_path):
+        git(tmp_path, 'init', '-q')
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', 'initial')
+
+        scan(app, repo_project)
+        scan(app, repo_project)
+
+        day = client.get(f'/projects/{repo_project}/trends', headers=auth_headers).json
+        assert day['period'] == 'day'
+        assert len(day['points']) == 1
+        assert day['points'][0]['count'] == 4
+        assert day['points'][0]['loc_sum'] == 8
+
+        commits = client.get(f'/projects/{repo_project}/trends?period=commit', headers=auth_headers).json
+        assert len(commits['points']) == 1
+        assert len(commits['points'][0]['bucket']) == 40
+
+    def test_analyze_save_updates_file_rollups(self, app, client, auth_headers):
+        for code in ('x = 1\n', 'def f(a):\n    if a:\n        return a\n    return 0\n'):
+            response = client.post('/analyze', json={
+                'code': code, 'save_results': True, 'project_name': 'Trend', 'filename': 'a.py'
+            }, headers=auth_headers)
+        with app.app_context():
+            file = ProjectFile.query.filter_by(filename='a.py').one()
+            project_id, file_id = file.project_id, file.id
+
+        points = client.get(f'/projects/{project_id}/files/{file_id}/trends?period=week', headers=auth_headers).json['points']
+
+        assert points[0]['count'] == 2
+        assert points[0]['complexity_min'] < points[0]['complexity_max']
+        assert response.status_code == 200
+
+    def test_backfill_rebuilds_rollups(self, app, client, auth_headers, runner, repo_project):
+        from models import MetricRollup
+
+        scan(app, repo_project)
+        before = client.get(f'/projects/{repo_project}/trends', headers=auth_headers).json['points']
+        with app.app_context():
+            MetricRollup.query.delete()
+            db.session.commit()
+
+        result = runner.invoke(args=['rollups', 'backfill'])
+
+        assert 'Rolled up 2 analyses' in result.output
+        assert client.get(f'/projects/{repo_project}/trends', headers=auth_headers).json['points'] == before
+
+    def test_invalid_period(self, client, auth_headers, repo_project):
+        response = client.get(f'/projects/{repo_project}/trends?period=hour', headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestConditionalResponses:
+    """Test ETag revalidation and compression of read endpoints"""
+
+    def test_unchanged_listing_returns_304(self, client, auth_headers):
+        client.post('/projects', json={'name': 'Polled'}, headers=auth_headers)
+
+        first = client.get('/projects', headers=auth_headers)
+        etag = first.headers['ETag']
+        assert etag.startswith('W/')
+
+        second = client.get('/projects', headers={**auth_headers, 'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == etag
+
+    def test_changes_invalidate_etag(self, app, client, auth_headers):
+        project_id = client.post('/projects', json={'name': 'Polled'}, headers=auth_headers).json['id']
+        listing = client.get('/projects', headers=auth_headers).headers['ETag']
+        detail = client.get(f'/projects/{project_id}', headers=auth_headers).headers['ETag']
+
+        client.post('/analyze', json={
+            'code': 'def f():\n    return 1\n',
+            'save_results': True,
+            'project_name': 'Polled',
+            'filename': 'f.py'
+        }, headers=auth_headers)
+
+        response = client.get('/projects', headers={**auth_headers, 'If-None-Match': listing})
+        assert response.status_code == 200
+        assert response.json[0]['file_count'] == 1
+
+        response = client.get(f'/projects/{project_id}', headers={**auth_headers, 'If-None-Match': detail})
+        assert response.status_code == 200
+
+        with app.app_context():
+            project = db.session.get(Project, project_id)
+            project.git_remote_url = 'https://example.com/repo.git'
+            db.session.commit()
+
+        etag = response.headers['ETag']
+        response = client.get(f'/projects/{project_id}', headers={**auth_headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+
+    def test_history_etag_varies_by_query(self, client, auth_headers):
+        client.post('/analyze', json={
+            'code': 'def f():\n    return 1\n',
+            'save_results': True,
+            'project_name': 'Polled',
+            'filename': 'f.py'
+        }, headers=auth_headers)
+        project = client.get('/projects', headers=auth_headers).json[0]
+        file_id = client.get(f"/projects/{project['id']}", headers=auth_headers).json['files'][0]['id']
+        url = f"/projects/{project['id']}/files/{file_id}/history"
+
+        etag = client.get(url, headers=auth_headers).headers['ETag']
+        assert client.get(url, headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+        chart = client.get(f'{url}?mode=chart', headers={**auth_headers, 'If-None-Match': etag})
+        assert chart.status_code == 200
+        assert 'chart' in chart.json
+
+    def test_other_users_project_is_not_revalidated(self, client, auth_headers):
+        response = client.get('/projects/999', headers={**auth_headers, 'If-None-Match': '*'})
+
+        assert response.status_code == 404
+
+    def test_large_responses_are_gzipped(self, client, auth_headers):
+        import gzip
+        import json
+
+        for index in range(30):
+            client.post('/projects', json={'name': f'Project {index}'}, headers=auth_headers)
+
+        response = client.get('/projects', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(json.loads(gzip.decompress(response.data))) == 30
+
+        plain = client.get('/projects', headers=auth_headers)
+        assert 'Content-Encoding' not in plain.headers
+        assert len(plain.json) == 30
+
+
+class TestCodeUnits:
+    """Test stored function-level metrics"""
+
+    MODULE = (
+        'def stable(value):\n'
+        '    return value * 2\n'
+        '\n'
+        'def tangled(items):\n'
+        '    total = 0\n'
+        '    for item in items:\n'
+        '        if item:\n'
+        '            for part in item:\n'
+        '                if part and total or not part:\n'
+        '                    total += 1\n'
+        '    return total\n'
+        '\n'
+        'class Holder:\n'
+        '    def get(self):\n'
+        '        return 1\n'
+    )
+
+    def save(self, client, auth_headers, code, filename='mod.py'):
+        response = client.post('/analyze', json={
+            'code': code,
+            'save_results': True,
+            'project_name': 'Units',
+            'filename': filename
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        return response
+
+    def test_units_are_stored(self, app, client, auth_headers):
+        from models import CodeUnit
+
+        self.save(client, auth_headers, self.MODULE)
+
+        with app.app_context():
+            names = {unit.name for unit in CodeUnit.query.all()}
+            assert names == {'stable', 'tangled', 'Holder', 'Holder.get'}
+
+    def test_only_changed_units_are_recomputed(self, app, client, auth_headers, monkeypatch):
+        from models import CodeUnit
+        from utils import units as units_module
+
+        self.save(client, auth_headers, self.MODULE)
+        with app.app_context():
+            stable_id = CodeUnit.query.filter_by(name='stable').one().id
+
+        analyzed = []
+        original = units_module.analyze_unit_task
+        monkeypatch.setattr(units_module, 'analyze_unit_task', lambda code: analyzed.append(code) or original(code))
+
+        edited = '# header\n' + self.MODULE.replace('return value * 2', 'return value * 3')
+        self.save(client, auth_headers, edited)
+
+        assert len(analyzed) == 1
+        assert 'value * 3' in analyzed[0]
+        with app.app_context():
+            stable = CodeUnit.query.filter_by(name='stable').one()
+            assert stable.id == stable_id
+            assert stable.start_line == 2
+            assert CodeUnit.query.filter_by(name='tangled').one().start_line == 5
+
+    def test_unchanged_file_skips_units(self, app, client, auth_headers, monkeypatch):
+        from models import CodeUnit
+        from utils import units as units_module
+
+        self.save(client, auth_headers, self.MODULE)
+
+        extracted = []
+        original = units_module.extract_units
+        monkeypatch.setattr(units_module, 'extract_units', lambda code: extracted.append(code) or original(code))
+
+        self.save(client, auth_headers, self.MODULE)
+        assert extracted == []
+
+        self.save(client, auth_headers, self.MODULE + '\n\ndef added():\n    return 1\n')
+        assert len(extracted) == 1
+        with app.app_context():
+            assert CodeUnit.query.filter_by(name='added').count() == 1
+
+    def test_over_budget_units_are_retried(self, app, client, auth_headers, monkeypatch):
+        from models import CodeUnit
+        from infrastructure.budget import BUDGET_EXCEEDED
+        from utils import units as units_module
+
+        original = units_module.analyze_unit_task
+        monkeypatch.setattr(units_module, 'analyze_unit_task', lambda code: (
+            (None, f'{BUDGET_EXCEEDED} (time limit 1s)') if 'def tangled' in code else original(code)
+        ))
+        self.save(client, auth_headers, self.MODULE)
+        with app.app_context():
+            assert CodeUnit.query.filter_by(name='tangled').count() == 0
+
+        # Same content, the file is synced again and the unit computed this time
+        monkeypatch.setattr(units_module, 'analyze_unit_task', original)
+        self.save(client, auth_headers, self.MODULE)
+        with app.app_context():
+            assert CodeUnit.query.filter_by(name='tangled').one().cognitive_complexity is not None
+
+    def test_removed_units_are_dropped(self, app, client, auth_headers):
+        from models import CodeUnit
+
+        self.save(client, auth_headers, self.MODULE)
+        self.save(client, auth_headers, 'def stable(value):\n    return value * 2\n')
+
+        with app.app_context():
+            assert [unit.name for unit in CodeUnit.query.all()] == ['stable']
+
+    def test_worst_units_endpoint(self, client, auth_headers):
+        self.save(client, auth_headers, self.MODULE)
+        project_id = client.get('/projects', headers=auth_headers).json[0]['id']
+
+        response = client.get(f'/projects/{project_id}/units?metric=cognitive_complexity&limit=2', headers=auth_headers)
+
+        assert response.status_code == 200
+        units = response.json['units']
+        assert units[0]['name'] == 'tangled'
+        assert units[0]['filename'] == 'mod.py'
+        assert len(units) == 2
+
+        response = client.get(f'/projects/{project_id}/units?metric=name', headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_file_units_summary(self, client, auth_headers):
+        self.save(client, auth_headers, self.MODULE)
+        project_id = client.get('/projects', headers=auth_headers).json[0]['id']
+        file_id = client.get(f'/projects/{project_id}', headers=auth_headers).json['files'][0]['id']
+
+        response = client.get(f'/projects/{project_id}/files/{file_id}/units', headers=auth_headers)
+
+        assert response.json['summary']['unit_count'] == 4
+        assert [unit['name'] for unit in response.json['units']] == ['stable', 'tangled', 'Holder', 'Holder.get']
+        assert response.json['summary']['max_complexity'] == max(
+            unit['cyclomatic_complexity'] for unit in response.json['units']
+        )
+
+    def test_scan_stores_units(self, app, client, auth_headers, repo_project):
+        from models import CodeUnit
+
+        scan(app, repo_project)
+
+        with app.app_context():
+            assert {unit.name for unit in CodeUnit.query.all()} == {'main', 'helper'}
@@ -0,0 +1,88 @@
+import json
+import os
+import pytest
+from infrastructure import telemetry
+from infrastructure.telemetry import Counter, Histogram
+import utils.analysis_cache as cache_module
+
+
+@pytest.fixture(autouse=True)
+def empty_metrics():
+    telemetry.clear()
+    yield
+    telemetry.clear()
+
+
+def sample(text, line_start):
+    """Value of the first exposition line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class TestTelemetry:
+    """Test in-process counters and histograms"""
+
+    def test_counter_and_histogram_exposition(self):
+        counter = Counter('test_events', 'Events', ('kind',))
+        histogram = Histogram('test_duration_seconds', 'Durations', ('kind',), buckets=(0.1, 1))
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, kind='a"b')
+
+        text = telemetry.render()
+
+        assert '# TYPE test_events counter' in text
+        assert sample(text, 'test_events_total{kind="a"}') == 3
+        assert sample(text, 'test_duration_seconds_bucket{kind="a\\"b",le="0.1"}') == 2
+        assert sample(text, 'test_duration_seconds_bucket{kind="a\\"b",le="1.0"}') == 3
+        assert sample(text, 'test_duration_seconds_bucket{kind="a\\"b",le="+Inf"}') == 4
+        assert sample(text, 'test_duration_seconds_count{kind="a\\"b"}') == 4
+        assert sample(text, 'test_duration_seconds_sum{kind="a\\"b"}') == pytest.approx(3.65)
+
+    def test_snapshots_are_summed_across_processes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(telemetry, 'METRICS_DIR', str(tmp_path))
+        counter = Counter('test_shared', 'Shared', ('kind',))
+        counter.inc(kind='a')
+
+        # Snapshot left by another worker process
+        other = [['test_shared', ['a'], [4.0]], ['test_shared', ['b'], [1.0]]]
+        (tmp_path / '1.json').write_text(json.dumps(other))
+
+        text = telemetry.render()
+
+        assert (tmp_path / f'{os.getpid()}.json').exists()
+        assert sample(text, 'test_shared_total{kind="a"}') == 5
+        assert sample(text, 'test_shared_total{kind="b"}') == 1
+
+
+class TestMetricsEndpoint:
+    """Test the /metrics scrape endpoint"""
+
+    def test_reports_requests_stages_db_and_cache(self, client, auth_headers, sample_code):
+        cache_module.analysis_cache.clear()
+        client.post('/analyze', json={'code': sample_code, 'save_results': True}, headers=auth_headers)
+
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert sample(text, 'http_requests_total{endpoint="analyze.analyze",method="POST",status="200"}') == 1
+        assert sample(text, 'http_request_duration_seconds_count{endpoint="analyze.analyze",method="POST"}') == 1
+        for stage in ('parse', 'calculate_lines', 'calculate_complexity', 'calculate_duplication_ast', 'shared_traversal'):
+            assert sample(text, f'analysis_stage_duration_seconds_count{{stage="{stage}"}}') >= 1
+        assert sample(text, 'db_operation_duration_seconds_count{operation="commit"}') >= 1
+        assert sample(text, 'cache_requests_total{cache="analysis",result="miss"}') >= 1
+        assert sample(text, 'cache_requests_total{cache="auth_user",result="miss"}') == 1
+
+    def test_token_is_required_when_configured(self, app, client):
+        app.config['METRICS_TOKEN'] = 'secret'
+        try:
+            assert client.get('/metrics').status_code == 401
+            response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+            assert response.status_code == 200
+        finally:
+            app.config['METRICS_TOKEN'] = None
@@ -0,0 +1,158 @@
+import os
+from datetime import datetime
+from sqlalchemy import delete, func, select
+from models import db, AnalysisCacheEntry
+from infrastructure.budget import analysis_budget
+from infrastructure.cache import AnalysisCache, analysis_cache_key
+from infrastructure.code_analyzer import analyze_code, ANALYZER_VERSION
+from infrastructure.executor import analyze_task, create_executor
+from infrastructure.scoring import config
+from utils.git_utils import get_code_hash
+from utils.db_utils import upsert
+
+
+# Keys per IN query, below every database's bound parameter limit
+CACHE_LOOKUP_CHUNK = 500
+
+
+class DatabaseCacheTier:
+    """Persistent cache tier stored in the analysis_cache table.
+
+    Lookups and writes are batched, one statement per call. Writes join
+    the current session and are committed with the request. The table is
+    kept to about max_entries rows: every prune_every writes the oldest
+    written entries beyond the bound are deleted.
+    """
+
+    def __init__(self, max_entries=100000, prune_every=1000):
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), CACHE_LOOKUP_CHUNK):
+            found.update(db.session.execute(
+                select(AnalysisCacheEntry.cache_key, AnalysisCacheEntry.results)
+                .where(AnalysisCacheEntry.cache_key.in_(keys[start:start + CACHE_LOOKUP_CHUNK]))
+            ).all())
+        return found
+
+    def set_many(self, payloads):
+        # Another request may have cached the same content concurrently
+        now = datetime.utcnow()
+        upsert(
+            AnalysisCacheEntry,
+            [{'cache_key': key, 'results': payload, 'created_at': now} for key, payload in payloads.items()],
+            ('cache_key',),
+            set_=lambda table, excluded: {'results': excluded.results, 'created_at': excluded.created_at}
+        )
+
+        self._writes += len(payloads)
+        if self.max_entries is not None and self._writes >= self.prune_every:
+            self._writes = 0
+            self.prune()
+
+    def prune(self):
+        """Delete the oldest written entries beyond max_entries."""
+        if db.session.scalar(select(func.count()).select_from(AnalysisCacheEntry)) <= self.max_entries:
+            return
+        oldest = select(AnalysisCacheEntry.cache_key).order_by(
+            AnalysisCacheEntry.created_at.desc(), AnalysisCacheEntry.cache_key
+        ).offset(self.max_entries).scalar_subquery()
+        db.session.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.cache_key.in_(oldest)))
+
+analysis_cache = AnalysisCache(
+    maxsize=int(os.environ.get('ANALYSIS_CACHE_SIZE', 1024)),
+    tier=DatabaseCacheTier(max_entries=int(os.environ.get('ANALYSIS_DB_CACHE_SIZE', 100000)))
+)
+
+_executor = None
+
+def get_executor():
+    """Return the executor used for batch analysis, configured from the environment."""
+    global _executor
+    if _executor is None:
+        workers = os.environ.get('ANALYSIS_WORKERS')
+        _executor = create_executor(
+            workers=int(workers) if workers else None,
+            chunksize=int(os.environ.get('ANALYSIS_CHUNK_SIZE', 8)),
+            min_items=int(os.environ.get('ANALYSIS_PARALLEL_MIN_FILES', 16))
+        )
+    return _executor
+
+def set_executor(executor):
+    """Swap the batch executor, e.g. for a serial one in tests."""
+    global _executor
+    if _executor is not None and _executor is not executor:
+        _executor.shutdown()
+    _executor = executor
+
+def _cache_key(code_hash, language):
+    return analysis_cache_key(code_hash, language, ANALYZER_VERSION, config)
+
+def analyze_code_cached(code, language, code_hash=None, refresh=False):
+    """
+    Run analyze_code, reusing the stored result for identical content
+
+    Fresh analysis runs under the per-file budget and raises BudgetExceeded
+    when it is cut short; nothing is cached in that case. It runs in the
+    calling thread, so only the cooperative deadline applies (see
+    analysis_budget). refresh skips the lookup and overwrites the stored
+    result, e.g. to profile analysis.
+    """
+    if code_hash is None:
+        code_hash = get_code_hash(code)
+
+    key = _cache_key(code_hash, language)
+    results = None if refresh else analysis_cache.get(key)
+
+    if results is None:
+        with analysis_budget():
+            results = analyze_code(code, language)
+        analysis_cache.set(key, results)
+
+    return results
+
+def analyze_many_cached(sources, language, executor=None):
+    """Analyze a list of code strings, fanning cache misses out to the executor.
+
+    The cache is read and written once per call, not once per file.
+    Returns (code_hash, results, error) tuples in input order; exactly one of
+    results and error is None.
+    """
+    code_hashes = [get_code_hash(code) for code in sources]
+    keys = [_cache_key(code_hash, language) for code_hash in code_hashes]
+    cached = analysis_cache.get_many(keys)
+    outcomes = [None] * len(sources)
+    served = set()
+    pending = {}
+
+    for index, (code_hash, key) in enumerate(zip(code_hashes, keys)):
+        results = cached.get(key)
+        if results is not None:
+            # Later duplicates get their own copy of the result dict
+            outcomes[index] = (code_hash, dict(results) if key in served else results, None)
+            served.add(key)
+        else:
+            # Identical files in one batch are analyzed once
+            pending.setdefault(code_hash, []).append(index)
+
+    if pending:
+        executor = executor or get_executor()
+        tasks = [(sources[indexes[0]], language) for indexes in pending.values()]
+        computed = executor.map(analyze_task, tasks)
+        fresh = {}
+
+        for (code_hash, indexes), (results, error) in zip(pending.items(), computed):
+            if error is None:
+                fresh[_cache_key(code_hash, language)] = results
+            for position, index in enumerate(indexes):
+                # Later duplicates get their own copy of the result dict
+                copy = results if position == 0 or results is None else dict(results)
+                outcomes[index] = (code_hash, copy, error)
+
+        analysis_cache.set_many(fresh)
+
+    return outcomes
@@ -0,0 +1,134 @@
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from utils.git_utils import LANGUAGE_EXTENSIONS, BINARY_SNIFF_BYTES, SCAN_LIMIT_REASON, _skip_dir, decode_source
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar.gz', '.tgz')
+
+
+class ArchiveError(ValueError):
+    """Raised for uploads that are not a readable .zip or .tar.gz archive."""
+
+
+def is_archive_name(filename):
+    return (filename or '').lower().endswith(ARCHIVE_EXTENSIONS)
+
+def _member_path(name):
+    # Archive-relative path, or None for entries outside the archive root
+    path = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    if path in ('', '.') or path.startswith('../'):
+        return None
+
+    parts = path.split('/')
+    if any(_skip_dir(part) for part in parts[:-1]):
+        return None
+    return path
+
+def _decode_member(path, raw, skipped):
+    if b'\0' in raw[:BINARY_SNIFF_BYTES]:
+        skipped.append((path, 'binary'))
+        return None
+    try:
+        return decode_source(raw)
+    except UnicodeDecodeError as e:
+        skipped.append((path, str(e)))
+        return None
+
+def _zip_members(stream):
+    try:
+        archive = zipfile.ZipFile(stream)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ArchiveError(f'Invalid zip archive: {e}')
+
+    def read(info, limit):
+        with archive.open(info) as member:
+            return member.read(limit)
+
+    def members():
+        with archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda limit, info=info: read(info, limit)
+    return members()
+
+def _tar_members(stream):
+    try:
+        # Stream mode reads members in order and never seeks
+        archive = tarfile.open(fileobj=stream, mode='r|gz')
+    except (tarfile.TarError, OSError, EOFError) as e:
+        raise ArchiveError(f'Invalid tar.gz archive: {e}')
+
+    def members():
+        with archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, member.size, lambda limit, member=member: archive.extractfile(member).read(limit)
+    return members()
+
+def iter_archive_files(stream, filename, language='python', max_file_size=None,
+                       max_total_size=None, skipped=None):
+    """
+    Lazily read the code files of an uploaded .zip or .tar.gz archive
+
+    Members are filtered by extension and declared size before any of
+    their content is decompressed, and read straight from the upload
+    stream without touching disk. Reads are capped at max_file_size + 1
+    bytes, so a member lying about its size cannot exceed the limit.
+    The archive is opened eagerly, so ArchiveError is raised by this call
+    rather than on first iteration.
+
+    Args:
+        stream: Binary file object of the upload, seekable for zip files
+        filename: Upload name, used to pick the archive format
+        language: Programming language to keep
+        max_file_size: Skip members larger than this many bytes
+        max_total_size: Stop once this many bytes have been yielded
+        skipped: Optional list that receives (member_path, reason) tuples
+
+    Yields:
+        Tuples of (member_path, file_content)
+    """
+    name = (filename or '').lower()
+    if name.endswith('.zip'):
+        members = _zip_members(stream)
+    elif name.endswith(('.tar.gz', '.tgz')):
+        members = _tar_members(stream)
+    else:
+        raise ArchiveError(f"Unsupported archive type, expected one of {', '.join(ARCHIVE_EXTENSIONS)}")
+
+    valid_extensions = tuple(LANGUAGE_EXTENSIONS.get(language, ['.py']))
+    if skipped is None:
+        skipped = []
+
+    def files():
+        total_size = 0
+        try:
+            for member_name, size, read in members:
+                path = _member_path(member_name)
+                if path is None or not path.endswith(valid_extensions):
+                    continue
+
+                if max_file_size is not None and size > max_file_size:
+                    skipped.append((path, 'too large'))
+                    continue
+
+                if max_total_size is not None and total_size + size > max_total_size:
+                    skipped.append((path, SCAN_LIMIT_REASON))
+                    return
+
+                raw = read(-1 if max_file_size is None else max_file_size + 1)
+                if max_file_size is not None and len(raw) > max_file_size:
+                    skipped.append((path, 'too large'))
+                    continue
+
+                content = _decode_member(path, raw, skipped)
+                if content is None:
+                    continue
+
+                total_size += len(raw)
+                yield path, content
+        except (zipfile.BadZipFile, tarfile.TarError, zlib.error, OSError, EOFError) as e:
+            raise ArchiveError(f'Corrupt archive: {e}')
+
+    return files()
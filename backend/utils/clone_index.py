@@ -0,0 +1,139 @@
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import aliased
+from models import db, ProjectFile, CloneBlock, CloneBand
+
+
+def remove_files(file_ids):
+    """Drop the indexed blocks of the given files."""
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+
+    db.session.execute(delete(CloneBand).where(CloneBand.file_id.in_(file_ids)))
+    db.session.execute(delete(CloneBlock).where(CloneBlock.file_id.in_(file_ids)))
+
+def replace_file_blocks(project_id, blocks_by_file):
+    """
+    Re-index files from their analysis results
+
+    Args:
+        project_id: Project the files belong to
+        blocks_by_file: Dict of file_id -> clone_blocks from analyze_code
+    """
+    remove_files(blocks_by_file)
+
+    rows = [
+        {
+            'project_id': project_id,
+            'file_id': file_id,
+            'block_hash': block['hash'],
+            'name': block['name'][:200],
+            'start_line': block['start_line'],
+            'end_line': block['end_line']
+        }
+        for file_id, blocks in blocks_by_file.items()
+        for block in blocks
+    ]
+    if not rows:
+        return
+
+    block_ids = db.session.scalars(
+        insert(CloneBlock).returning(CloneBlock.id, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+    bands = [
+        {'block_id': block_id, 'project_id': project_id, 'file_id': row['file_id'], 'band_key': band}
+        for block_id, row, block in zip(
+            block_ids,
+            rows,
+            (block for blocks in blocks_by_file.values() for block in blocks)
+        )
+        for band in block['bands']
+    ]
+    if bands:
+        db.session.execute(insert(CloneBand), bands)
+
+def find_clone_pairs(project_id, file_id=None, limit=50):
+    """
+    Report file pairs of a project that share exact or near-clone blocks
+
+    Exact clones are matched on the indexed block hash and near-clones on
+    shared LSH bands, both through index lookups rather than comparing
+    every pair of files.
+
+    Returns:
+        List of dicts with both files, the number of exact and near-clone
+        block pairs and the lines covered by the exact ones, most
+        duplicated pairs first
+    """
+    first = aliased(CloneBlock)
+    second = aliased(CloneBlock)
+
+    exact = select(
+        first.file_id.label('file_a'),
+        second.file_id.label('file_b'),
+        func.count().label('blocks'),
+        func.sum(second.end_line - second.start_line + 1).label('lines')
+    ).join(second, and_(
+        second.project_id == first.project_id,
+        second.block_hash == first.block_hash,
+        first.file_id < second.file_id
+    )).where(first.project_id == project_id)
+
+    band_a = aliased(CloneBand)
+    band_b = aliased(CloneBand)
+
+    # Distinct block pairs with a shared band whose hashes differ
+    near_pairs = select(
+        band_a.block_id.label('block_a'),
+        band_b.block_id.label('block_b'),
+        band_a.file_id.label('file_a'),
+        band_b.file_id.label('file_b')
+    ).join(band_b, and_(
+        band_b.project_id == band_a.project_id,
+        band_b.band_key == band_a.band_key,
+        band_a.file_id < band_b.file_id
+    )).join(first, first.id == band_a.block_id).join(second, and_(
+        second.id == band_b.block_id,
+        second.block_hash != first.block_hash
+    )).where(band_a.project_id == project_id).distinct()
+
+    if file_id is not None:
+        exact = exact.where(or_(first.file_id == file_id, second.file_id == file_id))
+        near_pairs = near_pairs.where(or_(band_a.file_id == file_id, band_b.file_id == file_id))
+
+    pairs = {}
+    for file_a, file_b, blocks, lines in db.session.execute(exact.group_by(first.file_id, second.file_id)):
+        pairs[(file_a, file_b)] = {'exact_blocks': blocks, 'duplicated_lines': lines or 0, 'near_blocks': 0}
+
+    near_pairs = near_pairs.subquery()
+    near = select(
+        near_pairs.c.file_a,
+        near_pairs.c.file_b,
+        func.count()
+    ).group_by(near_pairs.c.file_a, near_pairs.c.file_b)
+
+    for file_a, file_b, blocks in db.session.execute(near):
+        pair = pairs.setdefault((file_a, file_b), {'exact_blocks': 0, 'duplicated_lines': 0, 'near_blocks': 0})
+        pair['near_blocks'] = blocks
+
+    ranked = sorted(
+        pairs.items(),
+        key=lambda item: (item[1]['exact_blocks'], item[1]['near_blocks'], item[1]['duplicated_lines']),
+        reverse=True
+    )[:limit]
+
+    file_ids = {file_id for (file_a, file_b), _ in ranked for file_id in (file_a, file_b)}
+    filenames = dict(db.session.execute(
+        select(ProjectFile.id, ProjectFile.filename).where(ProjectFile.id.in_(file_ids))
+    ).all()) if file_ids else {}
+
+    return [
+        {
+            'file_a': {'id': file_a, 'filename': filenames.get(file_a)},
+            'file_b': {'id': file_b, 'filename': filenames.get(file_b)},
+            **counts
+        }
+        for (file_a, file_b), counts in ranked
+    ]
@@ -0,0 +1,114 @@
+import time
+from sqlalchemy import and_, event, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from models import db
+from infrastructure.telemetry import DB_DURATION
+
+# Dialects with INSERT ... ON CONFLICT
+UPSERT_DIALECTS = ('postgresql', 'sqlite')
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+def least(first, second):
+    """SQL minimum of two expressions for the current dialect."""
+    # SQLite's multi-argument min is a scalar function, not the aggregate
+    return func.min(first, second) if _dialect() == 'sqlite' else func.least(first, second)
+
+def greatest(first, second):
+    """SQL maximum of two expressions for the current dialect."""
+    return func.max(first, second) if _dialect() == 'sqlite' else func.greatest(first, second)
+
+
+class _RowValues:
+    #Stands in for the EXCLUDED pseudo-table in the fallback path
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key):
+        return literal(self.row[key], type_=self.table.c[key].type)
+
+    __getattr__ = __getitem__
+
+
+def upsert(model, rows, conflict_columns, set_=None):
+    """
+    Insert rows, resolving conflicts on a unique key in the database
+
+    Uses INSERT ... ON CONFLICT on PostgreSQL and SQLite as one
+    executemany statement, so concurrent writers cannot create duplicates.
+
+    Args:
+        model: Mapped class to insert into
+        rows: List of column dicts
+        conflict_columns: Columns of the unique constraint
+        set_: None to keep existing rows (DO NOTHING), or a callable
+            (table_columns, excluded) -> {column: expression} for DO UPDATE;
+            excluded gives the proposed row's values
+
+    Other dialects fall back to an UPDATE then INSERT per row.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = _dialect()
+
+    if dialect in UPSERT_DIALECTS:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(model)
+        if set_ is None:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+        else:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(conflict_columns),
+                set_=set_(table.c, stmt.excluded)
+            )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        match = and_(*[table.c[column] == row[column] for column in conflict_columns])
+        if set_ is not None:
+            updated = db.session.execute(
+                update(model).where(match).values(set_(table.c, _RowValues(table, row)))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated:
+                continue
+        elif db.session.execute(select(table.c[conflict_columns[0]]).where(match).limit(1)).first():
+            continue
+        db.session.execute(insert(model), [row])
+
+
+# Flush and commit durations of every session, for the /metrics endpoint
+@event.listens_for(Session, 'before_flush')
+def _flush_started(session, flush_context, instances):
+    session.info['flush_started'] = time.perf_counter()
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _flush_finished(session, flush_context):
+    started = session.info.pop('flush_started', None)
+    if started is not None:
+        DB_DURATION.observe(time.perf_counter() - started, operation='flush')
+
+@event.listens_for(Session, 'before_commit')
+def _commit_started(session):
+    session.info['commit_started'] = time.perf_counter()
+
+@event.listens_for(Session, 'after_commit')
+def _commit_finished(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        DB_DURATION.observe(time.perf_counter() - started, operation='commit')
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('flush_started', None)
+    session.info.pop('commit_started', None)
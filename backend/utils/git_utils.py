@@ -1,51 +1,194 @@
 import subprocess
 import hashlib
+import logging
 import os
+import zlib
+from infrastructure.cache import LRUCache
+from infrastructure.telemetry import GIT_DURATION, record_cache
 
-def get_git_info(repo_path=None):
+logger = logging.getLogger(__name__)
+
+# Parsed git metadata per repository, invalidated when HEAD or refs change
+_git_info_cache = LRUCache(maxsize=256)
+
+def _find_git_dirs(path):
+    # Walk up to the enclosing repository; returns (git_dir, common_dir) or None
+    path = os.path.abspath(path)
+    while True:
+        candidate = os.path.join(path, '.git')
+        if os.path.isdir(candidate):
+            git_dir = candidate
+            break
+        if os.path.isfile(candidate):
+            # Worktrees and submodules point at their git dir with a "gitdir:" file
+            with open(candidate, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content.startswith('gitdir:'):
+                return None
+            git_dir = os.path.normpath(os.path.join(path, content[len('gitdir:'):].strip()))
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, 'commondir')
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, 'r', encoding='utf-8') as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    
+    return git_dir, common_dir
+
+def _mtime(path):
     try:
-        original_dir = os.getcwd()
-        
-        if repo_path:
-            os.chdir(repo_path)
-        
-        # Check if it's a git repository
-        subprocess.run(['git', 'rev-parse', '--git-dir'], 
-                      check=True, 
-                      capture_output=True, 
-                      text=True)
-        
-        # Get commit hash
-        commit_hash = subprocess.run(['git', 'rev-parse', 'HEAD'], 
-                                    capture_output=True, 
-                                    text=True, 
-                                    check=True).stdout.strip()
-        
-        # Get branch name
-        branch = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], 
-                               capture_output=True, 
-                               text=True, 
-                               check=True).stdout.strip()
-        
-        # Get commit message
-        commit_message = subprocess.run(['git', 'log', '-1', '--pretty=%B'], 
-                                       capture_output=True, 
-                                       text=True, 
-                                       check=True).stdout.strip()
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _read_text(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _resolve_ref(git_dir, common_dir, ref):
+    # Resolve a ref name to a commit sha via loose refs, then packed-refs
+    for _ in range(10):
+        value = _read_text(os.path.join(git_dir, ref)) or _read_text(os.path.join(common_dir, ref))
         
-        if repo_path:
-            os.chdir(original_dir)
+        if value is None:
+            packed = _read_text(os.path.join(common_dir, 'packed-refs')) or ''
+            for line in packed.splitlines():
+                if line.startswith(('#', '^')):
+                    continue
+                sha, _, name = line.partition(' ')
+                if name == ref:
+                    value = sha
+                    break
         
-        return {
-            'commit_hash': commit_hash,
-            'branch': branch,
-            'commit_message': commit_message
-        }
-    
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        if repo_path and os.getcwd() != original_dir:
-            os.chdir(original_dir)
+        if value is None:
+            return None
+        if not value.startswith('ref:'):
+            return value
+        ref = value[len('ref:'):].strip()
+    return None
+
+def _read_commit_message(common_dir, commit_hash):
+    # Only loose objects are read here; packed ones return None
+    object_path = os.path.join(common_dir, 'objects', commit_hash[:2], commit_hash[2:])
+    try:
+        with open(object_path, 'rb') as f:
+            data = zlib.decompress(f.read())
+    except (OSError, zlib.error):
+        return None
+    
+    header, _, body = data.partition(b'\0')
+    if not header.startswith(b'commit '):
+        return None
+    
+    _, _, message = body.partition(b'\n\n')
+    return message.decode('utf-8', errors='replace').strip()
+
+def _git_info_from_cli(repo_path):
+    # One git call: hash, decorations (for the branch) and message
+    with GIT_DURATION.timer(command='log'):
+        result = subprocess.run(
+            ['git', '-C', repo_path, 'log', '-1', '--format=%H%x00%D%x00%B'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+    if result.returncode != 0:
+        return None
+    
+    commit_hash, decorations, commit_message = result.stdout.split('\0', 2)
+    branch = 'HEAD'
+    for decoration in decorations.split(', '):
+        if decoration.startswith('HEAD -> '):
+            branch = decoration[len('HEAD -> '):]
+    
+    return {
+        'commit_hash': commit_hash.strip(),
+        'branch': branch,
+        'commit_message': commit_message.strip()
+    }
+
+def _read_git_info(git_dir, common_dir, head):
+    if head.startswith('ref:'):
+        ref = head[len('ref:'):].strip()
+        commit_hash = _resolve_ref(git_dir, common_dir, ref)
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    else:
+        # Detached HEAD holds the sha directly
+        commit_hash = head
+        branch = 'HEAD'
+    
+    if not commit_hash:
+        return None
+    
+    commit_message = _read_commit_message(common_dir, commit_hash)
+    if commit_message is None:
         return None
+    
+    return {
+        'commit_hash': commit_hash,
+        'branch': branch,
+        'commit_message': commit_message
+    }
+
+def get_git_info(repo_path=None):
+    """
+    Read HEAD's commit hash, branch and message for a repository
+    
+    Metadata is read straight from the .git directory (loose and packed
+    refs, loose commit objects), falling back to a single git call when
+    the commit is packed. Results are cached per repository until HEAD,
+    the branch ref or packed-refs change. The process working directory
+    is never changed, so this is safe to call from threads.
+    
+    Returns:
+        Dict with commit_hash, branch and commit_message, or None when the
+        path is not inside a repository with at least one commit
+    """
+    repo_path = os.path.abspath(repo_path or os.getcwd())
+    
+    try:
+        git_dirs = _find_git_dirs(repo_path)
+    except OSError:
+        return None
+    if git_dirs is None:
+        return None
+    git_dir, common_dir = git_dirs
+    
+    head = _read_text(os.path.join(git_dir, 'HEAD'))
+    if not head:
+        return None
+    
+    ref = head[len('ref:'):].strip() if head.startswith('ref:') else None
+    stamp = (
+        head,
+        _mtime(os.path.join(git_dir, 'HEAD')),
+        _mtime(os.path.join(common_dir, ref)) if ref else None,
+        _mtime(os.path.join(common_dir, 'packed-refs'))
+    )
+    
+    cached = _git_info_cache.get(repo_path)
+    hit = cached is not None and cached[0] == stamp
+    record_cache('git_info', hit)
+    if hit:
+        return dict(cached[1]) if cached[1] else None
+    
+    info = _read_git_info(git_dir, common_dir, head)
+    if info is None:
+        try:
+            info = _git_info_from_cli(repo_path)
+        except (OSError, subprocess.SubprocessError, ValueError):
+            info = None
+    
+    _git_info_cache.set(repo_path, (stamp, info))
+    return dict(info) if info else None
 
 def get_code_hash(code):
     return hashlib.sha256(code.encode()).hexdigest()
@@ -56,10 +199,11 @@ def validate_git_repo(repo_path):
         return False, "Path does not exist"
     
     try:
-        result = subprocess.run(['git', '-C', repo_path, 'rev-parse', '--git-dir'],
-                              capture_output=True,
-                              text=True,
-                              timeout=5)
+        with GIT_DURATION.timer(command='rev-parse'):
+            result = subprocess.run(['git', '-C', repo_path, 'rev-parse', '--git-dir'],
+                                  capture_output=True,
+                                  text=True,
+                                  timeout=5)
         if result.returncode == 0:
             return True, "Valid git repository"  # Added missing message
         else:
@@ -67,58 +211,216 @@ def validate_git_repo(repo_path):
     except Exception as e:
         return False, str(e)
     
-def scan_repo_files(repo_path, language='python'):
+# File extensions by language
+LANGUAGE_EXTENSIONS = {
+    'python': ['.py'],
+    'javascript': ['.js', '.jsx'],
+    'java': ['.java'],
+    'cpp': ['.cpp', '.cc', '.cxx', '.h', '.hpp']
+}
+
+# Directories to skip
+SKIP_DIRS = {
+    '.git', '__pycache__', 'node_modules', 'venv', 'env',
+    '.venv', 'build', 'dist', '.pytest_cache', '.mypy_cache',
+    'eggs', '.eggs'
+}
+
+# Bytes inspected when sniffing for binary content
+BINARY_SNIFF_BYTES = 8192
+
+# Skip reason recorded when max_total_size cuts a scan short
+SCAN_LIMIT_REASON = 'scan size limit reached'
+
+# Prefix of skip reasons for files that exist in git but could not be read
+READ_ERROR_PREFIX = 'unreadable: '
+
+def _skip_dir(name):
+    return name in SKIP_DIRS or name.endswith('.egg-info')
+
+def decode_source(raw):
+    """Decode UTF-8 source with universal newlines, as reading the file in text mode does."""
+    return raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def _read_source_file(file_path, rel_path, skipped=None):
+    # Returns decoded text, or None for binary/unreadable files
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        
+        if b'\0' in raw[:BINARY_SNIFF_BYTES]:
+            if skipped is not None:
+                skipped.append((rel_path, 'binary'))
+            return None
+        
+        return decode_source(raw)
+    except OSError as e:
+        logger.warning('Error reading %s: %s', file_path, e)
+        if skipped is not None:
+            skipped.append((rel_path, f'{READ_ERROR_PREFIX}{e}'))
+        return None
+    except Exception as e:
+        logger.warning('Error reading %s: %s', file_path, e)
+        if skipped is not None:
+            skipped.append((rel_path, str(e)))
+        return None
+
+def scan_repo_files(repo_path, language='python', max_file_size=None,
+                    max_total_size=None, skipped=None):
     """
-    Scan a git repository for code files
+    Lazily scan a git repository for code files
+    
+    Files are yielded as they are found, so callers can analyze and store
+    them while the walk continues. Oversized and binary files are skipped
+    from their directory entry or first bytes, before being decoded.
     
     Args:
         repo_path: Path to git repository
         language: Programming language to scan for ('python', 'javascript')
+        max_file_size: Skip files larger than this many bytes
+        max_total_size: Stop once this many bytes have been yielded
+        skipped: Optional list that receives (relative_path, reason) tuples
     
-    Returns:
-        List of tuples: [(relative_path, file_content), ...]
+    Yields:
+        Tuples of (relative_path, file_content)
     """
     if not os.path.exists(repo_path):
-        return []
-    
-    # File extensions by language
-    extensions = {
-        'python': ['.py'],
-        'javascript': ['.js', '.jsx'],
-        'java': ['.java'],
-        'cpp': ['.cpp', '.cc', '.cxx', '.h', '.hpp']
-    }
-    
-    valid_extensions = extensions.get(language, ['.py'])
+        return
     
-    # Directories to skip
-    skip_dirs = {
-        '.git', '__pycache__', 'node_modules', 'venv', 'env',
-        '.venv', 'build', 'dist', '.pytest_cache', '.mypy_cache',
-        'eggs', '.eggs', '*.egg-info'
-    }
-    
-    files_found = []
+    valid_extensions = tuple(LANGUAGE_EXTENSIONS.get(language, ['.py']))
+    total_size = 0
+    pending_dirs = [repo_path]
     
-    for root, dirs, files in os.walk(repo_path):
-        # Skip ignored directories
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
+    while pending_dirs:
+        root = pending_dirs.pop()
+        
+        try:
+            with os.scandir(root) as scanner:
+                entries = sorted(scanner, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning('Error scanning %s: %s', root, e)
+            continue
         
         # Get relative path from repo root
         rel_root = os.path.relpath(root, repo_path)
+        subdirs = []
         
-        for file in files:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not _skip_dir(entry.name):
+                    subdirs.append(entry.path)
+                continue
+            
             # Check if file has valid extension
-            if any(file.endswith(ext) for ext in valid_extensions):
-                file_path = os.path.join(root, file)
-                rel_path = os.path.join(rel_root, file) if rel_root != '.' else file
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        files_found.append((rel_path, content))
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
+            if not entry.name.endswith(valid_extensions) or not entry.is_file():
+                continue
+            
+            rel_path = os.path.join(rel_root, entry.name) if rel_root != '.' else entry.name
+            
+            try:
+                size = entry.stat().st_size
+                if max_file_size is not None and size > max_file_size:
+                    if skipped is not None:
+                        skipped.append((rel_path, 'too large'))
                     continue
+                
+                if max_total_size is not None and total_size + size > max_total_size:
+                    if skipped is not None:
+                        skipped.append((rel_path, SCAN_LIMIT_REASON))
+                    return
+            except OSError as e:
+                logger.warning('Error reading %s: %s', entry.path, e)
+                if skipped is not None:
+                    skipped.append((rel_path, f'{READ_ERROR_PREFIX}{e}'))
+                continue
+            
+            content = _read_source_file(entry.path, rel_path, skipped)
+            if content is None:
+                continue
+            
+            total_size += size
+            yield rel_path, content
+        
+        # Visit subdirectories in name order
+        pending_dirs.extend(reversed(subdirs))
+
+def read_repo_files(repo_path, rel_paths, language='python', max_file_size=None, skipped=None):
+    """
+    Read specific files of a repository, applying the same filters as
+    scan_repo_files
+    
+    Args:
+        repo_path: Path to git repository
+        rel_paths: Paths relative to the repository root
+        language: Programming language to keep
+        max_file_size: Skip files larger than this many bytes
+        skipped: Optional list that receives (relative_path, reason) tuples
+    
+    Yields:
+        Tuples of (relative_path, file_content)
+    """
+    valid_extensions = tuple(LANGUAGE_EXTENSIONS.get(language, ['.py']))
+    
+    for rel_path in rel_paths:
+        parts = rel_path.split('/')
+        if not rel_path.endswith(valid_extensions) or any(_skip_dir(part) for part in parts[:-1]):
+            continue
+        
+        file_path = os.path.join(repo_path, *parts)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError as e:
+            if skipped is not None:
+                skipped.append((rel_path, f'{READ_ERROR_PREFIX}{e}'))
+            continue
+        
+        if max_file_size is not None and size > max_file_size:
+            if skipped is not None:
+                skipped.append((rel_path, 'too large'))
+            continue
+        
+        content = _read_source_file(file_path, rel_path, skipped)
+        if content is not None:
+            yield rel_path, content
+
+def get_changed_files(repo_path, since_commit):
+    """
+    List files changed between a commit and HEAD
+    
+    Paths are relative to repo_path, which may be a subdirectory of the
+    repository; changes outside it are left out. Renames are reported as a
+    deletion of the old path and an addition of the new one.
+    
+    Returns:
+        Dict with 'added', 'modified' and 'deleted' path lists, or None if
+        the diff could not be computed (unknown commit, not a repo, ...)
+    """
+    try:
+        with GIT_DURATION.timer(command='diff'):
+            result = subprocess.run(
+                ['git', '-C', repo_path, 'diff', '--name-status', '--no-renames', '--relative', '-z',
+                 f'{since_commit}..HEAD'],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    
+    if result.returncode != 0:
+        return None
+    
+    changes = {'added': [], 'modified': [], 'deleted': []}
+    
+    # -z output alternates status and path, NUL separated and unquoted
+    fields = result.stdout.split('\0')
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status.startswith('A'):
+            changes['added'].append(path)
+        elif status.startswith('D'):
+            changes['deleted'].append(path)
+        else:
+            # M, T (type change) and anything unusual get re-analyzed
+            changes['modified'].append(path)
     
-    return files_found
\ No newline at end of file
+    return changes
@@ -0,0 +1,139 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select
+from models import db, FileAnalysis
+
+# Numeric columns that can be charted
+CHART_METRICS = (
+    'readability_score', 'cyclomatic_complexity', 'maintainability_index',
+    'lines_of_code', 'comment_density', 'duplication_percentage',
+    'avg_name_length', 'max_nesting_depth', 'avg_nesting_depth',
+    'cognitive_complexity', 'avg_function_length', 'max_function_length'
+)
+DEFAULT_CHART_METRICS = ('readability_score', 'cyclomatic_complexity', 'maintainability_index')
+
+
+class HistoryQueryError(ValueError):
+    """Raised for malformed history parameters (bad cursor, unknown field)."""
+
+
+def encode_cursor(timestamp, analysis_id):
+    raw = f'{timestamp.isoformat()}|{analysis_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, analysis_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(analysis_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HistoryQueryError('Invalid cursor')
+
+def _parse_fields(fields, allowed):
+    if not fields:
+        return list(allowed)
+
+    requested = [field.strip() for field in fields if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HistoryQueryError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def _serialize(row):
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in row._mapping.items()
+    }
+
+def _isoformat(value):
+    # MIN/MAX of a timestamp come back as text on some dialects (SQLite)
+    # and as datetimes on others
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat() if value is not None else None
+
+def history_page(file_id, limit=100, cursor=None, fields=None):
+    """
+    One page of a file's analyses, newest first, by keyset on (timestamp, id)
+
+    Only the requested columns are selected. Pages stay as cheap deep into
+    the history as at the start, unlike OFFSET pagination.
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    selected = _parse_fields(fields, FileAnalysis.SERIALIZED_FIELDS)
+    # The cursor needs both keys even when they were not requested
+    columns = list(dict.fromkeys(['id', 'timestamp'] + selected))
+
+    query = select(*[getattr(FileAnalysis, column) for column in columns]).where(
+        FileAnalysis.file_id == file_id
+    )
+
+    if cursor:
+        timestamp, analysis_id = decode_cursor(cursor)
+        query = query.where(or_(
+            FileAnalysis.timestamp < timestamp,
+            and_(FileAnalysis.timestamp == timestamp, FileAnalysis.id < analysis_id)
+        ))
+
+    # One extra row tells whether another page exists
+    rows = db.session.execute(
+        query.order_by(FileAnalysis.timestamp.desc(), FileAnalysis.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+    page = []
+    for row in rows:
+        item = _serialize(row)
+        page.append({column: item[column] for column in selected})
+    return page, next_cursor
+
+def history_chart(file_id, points=300, metrics=None):
+    """
+    Downsample a file's history to at most `points` buckets in the database
+
+    Rows are split oldest first into equal buckets with NTILE. Each bucket
+    reports its time span, row count and the average, min and max of every
+    metric, so spikes survive downsampling. With fewer rows than points
+    every row is its own bucket.
+    """
+    selected = _parse_fields(metrics, CHART_METRICS) if metrics else list(DEFAULT_CHART_METRICS)
+
+    numbered = select(
+        FileAnalysis.timestamp,
+        *[getattr(FileAnalysis, metric) for metric in selected],
+        func.ntile(points).over(order_by=(FileAnalysis.timestamp, FileAnalysis.id)).label('bucket')
+    ).where(FileAnalysis.file_id == file_id).subquery()
+
+    aggregates = [
+        func.min(numbered.c.timestamp).label('timestamp'),
+        func.max(numbered.c.timestamp).label('end_timestamp'),
+        func.count().label('count')
+    ]
+    for metric in selected:
+        column = numbered.c[metric]
+        aggregates.extend([
+            func.avg(column).label(metric),
+            func.min(column).label(f'{metric}_min'),
+            func.max(column).label(f'{metric}_max')
+        ])
+
+    rows = db.session.execute(
+        select(*aggregates).group_by(numbered.c.bucket).order_by(numbered.c.bucket)
+    ).all()
+
+    chart = []
+    for row in rows:
+        point = _serialize(row)
+        point['timestamp'] = _isoformat(row.timestamp)
+        point['end_timestamp'] = _isoformat(row.end_timestamp)
+        for metric in selected:
+            if point[metric] is not None:
+                point[metric] = round(point[metric], 2)
+        chart.append(point)
+    return chart
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import zlib
+from flask import current_app, request
+from sqlalchemy import case, func, select
+from models import db, Project, ProjectFile, FileAnalysis
+
+# Response types worth compressing
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+
+
+def stamp_etag(*parts):
+    """Weak ETag value for a version stamp of the response and its query string."""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in (*parts, request.query_string):
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def conditional(etag, build):
+    """
+    Answer a GET from its ETag before building the body
+
+    Returns 304 if the client's If-None-Match already has etag, otherwise
+    build()'s response tagged with it. Responses must be revalidated on
+    every use, since the stamp is the only thing that changes.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _file_stamp_columns():
+    return (
+        func.count(ProjectFile.id),
+        func.sum(ProjectFile.total_analyses),
+        func.max(ProjectFile.last_analyzed),
+        func.sum(case((ProjectFile.is_deleted == True, 1), else_=0))
+    )
+
+def projects_stamp(user_id, project_id=None):
+    """
+    Version stamp of a user's projects and their files, in one aggregate query
+
+    Any project edit bumps updated_at, and every file write changes the
+    file count, analysis total, last analysis time or deleted count.
+    """
+    query = select(
+        func.count(func.distinct(Project.id)),
+        func.max(Project.id),
+        func.max(func.coalesce(Project.updated_at, Project.created_at)),
+        *_file_stamp_columns()
+    ).select_from(Project).outerjoin(ProjectFile, ProjectFile.project_id == Project.id)\
+        .where(Project.user_id == user_id)
+
+    if project_id is not None:
+        query = query.where(Project.id == project_id)
+
+    return tuple(db.session.execute(query).one())
+
+def history_stamp(file):
+    """Version stamp of a file's row and its analysis history."""
+    count, last_id = db.session.execute(
+        select(func.count(FileAnalysis.id), func.max(FileAnalysis.id))
+        .where(FileAnalysis.file_id == file.id)
+    ).one()
+    return (file.id, file.last_analyzed, file.total_analyses, file.is_deleted, file.current_score, count, last_id)
+
+
+def _accepted_encoding():
+    accepted = request.accept_encodings
+    for encoding in ('gzip', 'deflate'):
+        if accepted[encoding]:
+            return encoding
+    return None
+
+def compress_response(response):
+    """after_request hook compressing large buffered text responses."""
+    min_size = current_app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    if (
+        min_size is None
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < min_size:
+        return response
+
+    level = current_app.config.get('COMPRESS_LEVEL', 6)
+    if encoding == 'gzip':
+        compressed = gzip.compress(body, compresslevel=level, mtime=0)
+    else:
+        compressed = zlib.compress(body, level)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
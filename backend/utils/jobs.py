@@ -0,0 +1,256 @@
+import json
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from models import db, Project, ScanJob
+from utils.repo_scan import scan_project_repo
+
+# Errors and skipped files kept on a job row; the rest are only counted
+MAX_STORED_ERRORS = 100
+
+# Error recorded on jobs whose worker stopped reporting progress too often
+STALE_JOB_ERROR = 'Scan worker stopped responding'
+
+
+def enqueue_scan(project, user_id, incremental=False):
+    """Queue a repository scan for the background workers."""
+    job = ScanJob(
+        project_id=project.id,
+        user_id=user_id,
+        status=ScanJob.STATUS_QUEUED,
+        incremental=incremental
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def recover_stale_jobs(timeout=None, max_attempts=None):
+    """
+    Release running jobs whose worker crashed or was redeployed
+
+    A running job without a heartbeat for timeout seconds is requeued, or
+    failed once it has been attempted max_attempts times. Jobs that were
+    asked to stop are cancelled instead.
+
+    Returns:
+        Number of jobs released
+    """
+    config = current_app.config
+    timeout = config.get('SCAN_JOB_STALE_AFTER', 600) if timeout is None else timeout
+    max_attempts = config.get('SCAN_JOB_MAX_ATTEMPTS', 3) if max_attempts is None else max_attempts
+    now = datetime.utcnow()
+
+    stale = (
+        ScanJob.status == ScanJob.STATUS_RUNNING,
+        func.coalesce(ScanJob.heartbeat_at, ScanJob.started_at) < now - timedelta(seconds=timeout)
+    )
+    finished = {'finished_at': now, 'heartbeat_at': None}
+
+    released = db.session.execute(
+        update(ScanJob).where(*stale, ScanJob.cancel_requested == True)
+        .values(status=ScanJob.STATUS_CANCELLED, **finished)
+    ).rowcount
+    released += db.session.execute(
+        update(ScanJob).where(*stale, func.coalesce(ScanJob.attempts, 0) >= max_attempts)
+        .values(status=ScanJob.STATUS_FAILED, error_message=STALE_JOB_ERROR, **finished)
+    ).rowcount
+    released += db.session.execute(
+        update(ScanJob).where(*stale)
+        .values(status=ScanJob.STATUS_QUEUED, started_at=None, heartbeat_at=None)
+    ).rowcount
+    db.session.commit()
+    return released
+
+def claim_next_job():
+    """
+    Atomically move the next queued job to running and return it
+
+    Jobs of users with the fewest running scans go first, then oldest
+    first, so one user's backlog cannot starve everyone else. A project
+    never has two scans running at once. Stale running jobs are released
+    first so they cannot block their project forever.
+    """
+    recover_stale_jobs()
+
+    running = db.session.query(
+        ScanJob.user_id,
+        func.count(ScanJob.id).label('running')
+    ).filter(ScanJob.status == ScanJob.STATUS_RUNNING).group_by(ScanJob.user_id).subquery()
+
+    busy_projects = db.session.query(ScanJob.project_id).filter(
+        ScanJob.status == ScanJob.STATUS_RUNNING
+    )
+
+    candidates = db.session.query(ScanJob.id).outerjoin(
+        running, running.c.user_id == ScanJob.user_id
+    ).filter(
+        ScanJob.status == ScanJob.STATUS_QUEUED,
+        ScanJob.project_id.not_in(busy_projects)
+    ).order_by(
+        func.coalesce(running.c.running, 0),
+        ScanJob.created_at,
+        ScanJob.id
+    ).limit(5).all()
+
+    for (job_id,) in candidates:
+        # Another worker may claim the same row; only one UPDATE wins
+        claimed = db.session.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job_id, ScanJob.status == ScanJob.STATUS_QUEUED)
+            .values(
+                status=ScanJob.STATUS_RUNNING,
+                started_at=datetime.utcnow(),
+                heartbeat_at=datetime.utcnow(),
+                attempts=func.coalesce(ScanJob.attempts, 0) + 1
+            )
+        ).rowcount
+        db.session.commit()
+
+        if claimed:
+            return db.session.get(ScanJob, job_id)
+
+    return None
+
+def _record_progress(job, summary):
+    job.heartbeat_at = datetime.utcnow()
+    job.files_seen = summary['files_seen']
+    job.files_analyzed = summary['files_analyzed']
+    job.files_failed = len(summary['errors'])
+    job.errors = json.dumps(summary['errors'][:MAX_STORED_ERRORS]) if summary['errors'] else None
+    job.files_skipped = len(summary['files_skipped'])
+    job.skipped = json.dumps(summary['files_skipped'][:MAX_STORED_ERRORS]) if summary['files_skipped'] else None
+
+def run_job(job):
+    """Run a claimed job to completion, recording progress as it goes."""
+    job_id = job.id
+
+    def should_cancel():
+        return db.session.query(ScanJob.cancel_requested).filter_by(id=job_id).scalar()
+
+    try:
+        project = db.session.get(Project, job.project_id)
+        if not project or not project.git_repo_path:
+            raise ValueError('No git repository linked')
+
+        summary = scan_project_repo(
+            project,
+            on_batch=lambda summary: _record_progress(job, summary),
+            should_cancel=should_cancel,
+            incremental=bool(job.incremental)
+        )
+
+        _record_progress(job, summary)
+        job.status = ScanJob.STATUS_CANCELLED if summary['cancelled'] else ScanJob.STATUS_COMPLETED
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ScanJob, job_id)
+        job.status = ScanJob.STATUS_FAILED
+        job.error_message = str(e)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+def run_next_job():
+    """Claim and run one queued job. Returns False when the queue is empty."""
+    job = claim_next_job()
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+def run_pending_jobs():
+    """Drain the queue in the calling thread."""
+    while run_next_job():
+        pass
+
+def cancel_job(job):
+    """Cancel a queued job outright, or ask a running one to stop."""
+    if job.status == ScanJob.STATUS_QUEUED:
+        cancelled = db.session.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job.id, ScanJob.status == ScanJob.STATUS_QUEUED)
+            .values(status=ScanJob.STATUS_CANCELLED, finished_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        db.session.refresh(job)
+        if cancelled:
+            return job
+
+    if job.status == ScanJob.STATUS_RUNNING:
+        job.cancel_requested = True
+        db.session.commit()
+        # A job whose worker is gone is cancelled right away
+        if recover_stale_jobs():
+            db.session.refresh(job)
+
+    return job
+
+
+class ScanWorkerPool:
+    """
+    Background threads that run queued scan jobs
+
+    The scan_jobs table is the queue, so no broker is needed and several
+    gunicorn workers can poll it safely.
+    """
+
+    def __init__(self, app, workers=2, poll_interval=2.0):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'scan-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            ran = False
+            with self.app.app_context():
+                try:
+                    ran = run_next_job()
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    db.session.remove()
+
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def ensure_workers(app, notify=True):
+    """Start the worker pool on first use; SCAN_WORKERS=0 disables it."""
+    global _pool
+    workers = app.config.get('SCAN_WORKERS', 0)
+    if workers <= 0:
+        return None
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ScanWorkerPool(app, workers, app.config.get('SCAN_POLL_INTERVAL', 2.0))
+                _pool.start()
+    if notify:
+        _pool.notify()
+    return _pool
@@ -0,0 +1,146 @@
+from sqlalchemy import bindparam, func, insert, select, update
+from models import db, ProjectFile, FileAnalysis
+from utils.clone_index import replace_file_blocks
+from utils.rollups import apply_rollups
+from utils.db_utils import upsert
+from utils.units import sync_file_units
+from datetime import datetime
+
+# analyze_code result keys stored as FileAnalysis columns
+ANALYSIS_METRIC_FIELDS = (
+    'readability_score',
+    'cyclomatic_complexity',
+    'maintainability_index',
+    'lines_of_code',
+    'comment_density',
+    'duplication_percentage',
+    'avg_name_length',
+    'max_nesting_depth',
+    'avg_nesting_depth',
+    'cognitive_complexity',
+    'avg_function_length',
+    'max_function_length'
+)
+
+
+class AnalysisWriter:
+    """
+    Buffered, set-based writer for a project's analysis results
+
+    All ProjectFile rows of the project are prefetched once. Each flush
+    creates missing files in one upsert, writes every buffered FileAnalysis
+    in one executemany INSERT and updates file stats in one bulk UPDATE,
+    instead of a lookup and a flush per file. The written files are
+    re-indexed for cross-file clone detection, the function and class
+    units of files whose content changed are synced, and the results are
+    merged into the metric rollups. The session is committed every
+    batch_size results.
+    """
+
+    def __init__(self, project, language, git_info=None, batch_size=500):
+        self.project_id = project.id
+        self.language = language
+        self.git_info = git_info
+        self.batch_size = batch_size
+        self._pending = []
+
+        rows = db.session.execute(
+            select(ProjectFile.id, ProjectFile.filename).where(ProjectFile.project_id == self.project_id)
+        )
+        self.files = {filename: file_id for file_id, filename in rows}
+
+    def add(self, filename, code_hash, results, code=None):
+        # With the code, the file's function and class units are synced too
+        self._pending.append((filename, code_hash, results, code))
+        if len(self._pending) >= self.batch_size:
+            self.commit()
+
+    def _create_missing_files(self, filenames):
+        missing = [name for name in dict.fromkeys(filenames) if name not in self.files]
+        if not missing:
+            return
+
+        # Files created concurrently by another writer are left as they are
+        upsert(ProjectFile, [
+            {
+                'project_id': self.project_id,
+                'filename': filename,
+                'language': self.language,
+                'total_analyses': 0,
+                'is_deleted': False
+            }
+            for filename in missing
+        ], ('project_id', 'filename'))
+
+        created = db.session.execute(
+            select(ProjectFile.id, ProjectFile.filename).where(
+                ProjectFile.project_id == self.project_id,
+                ProjectFile.filename.in_(missing)
+            )
+        )
+        for file_id, filename in created:
+            self.files[filename] = file_id
+
+    def flush(self):
+        """Write buffered results without committing."""
+        if not self._pending:
+            return
+
+        self._create_missing_files([filename for filename, _, _, _ in self._pending])
+
+        git_info = self.git_info or {}
+        now = datetime.utcnow()
+        analyses = []
+        file_updates = {}
+        clone_blocks = {}
+        units = {}
+
+        for filename, code_hash, results, code in self._pending:
+            file_id = self.files[filename]
+
+            analysis = {
+                'file_id': file_id,
+                'timestamp': now,
+                'commit_hash': git_info.get('commit_hash'),
+                'commit_message': git_info.get('commit_message'),
+                'branch': git_info.get('branch'),
+                'code_hash': code_hash
+            }
+            analysis.update({field: results[field] for field in ANALYSIS_METRIC_FIELDS})
+            analyses.append(analysis)
+
+            # Last result wins if a file appears twice in one flush
+            previous = file_updates.get(file_id)
+            file_updates[file_id] = {
+                'file_id': file_id,
+                'score': results['readability_score'],
+                'analyzed': now,
+                'count': previous['count'] + 1 if previous else 1
+            }
+            clone_blocks[file_id] = results.get('clone_blocks') or []
+            if code is not None:
+                units[file_id] = (code_hash, code)
+
+        db.session.execute(insert(FileAnalysis), analyses)
+        # Counted in SQL, so concurrent writers do not overwrite each other's
+        # totals. Core executemany, the ORM bulk UPDATE only sets plain values
+        files = ProjectFile.__table__
+        db.session.connection().execute(
+            update(files)
+            .where(files.c.id == bindparam('file_id'))
+            .values(
+                current_score=bindparam('score'),
+                last_analyzed=bindparam('analyzed'),
+                total_analyses=func.coalesce(files.c.total_analyses, 0) + bindparam('count'),
+                is_deleted=False
+            ),
+            list(file_updates.values())
+        )
+        replace_file_blocks(self.project_id, clone_blocks)
+        sync_file_units(self.project_id, units)
+        apply_rollups(self.project_id, analyses)
+        self._pending = []
+
+    def commit(self):
+        self.flush()
+        db.session.commit()
@@ -0,0 +1,171 @@
+from flask import current_app
+from models import db, ProjectFile, FileAnalysis
+from utils.persistence import AnalysisWriter
+from utils.clone_index import remove_files
+from utils.units import remove_file_units
+from utils.git_utils import (
+    scan_repo_files, read_repo_files, get_git_info, get_changed_files, SCAN_LIMIT_REASON, READ_ERROR_PREFIX
+)
+from utils.analysis_cache import analyze_many_cached
+from infrastructure.budget import BUDGET_EXCEEDED
+from infrastructure.executor import iter_batches
+
+
+def get_last_scanned_commit(project):
+    """
+    Commit the project's files were last analyzed at
+    
+    Falls back to the newest FileAnalysis commit for projects scanned
+    before last_scanned_commit was recorded.
+    """
+    if project.last_scanned_commit:
+        return project.last_scanned_commit
+    
+    latest = db.session.query(FileAnalysis.commit_hash)\
+        .join(ProjectFile, FileAnalysis.file_id == ProjectFile.id)\
+        .filter(ProjectFile.project_id == project.id, FileAnalysis.commit_hash.isnot(None))\
+        .order_by(FileAnalysis.timestamp.desc(), FileAnalysis.id.desc())\
+        .first()
+    
+    return latest[0] if latest else None
+
+def _mark_deleted(project, filenames):
+    if not filenames:
+        return 0
+    
+    deleted = ProjectFile.query.filter(
+        ProjectFile.project_id == project.id,
+        ProjectFile.filename.in_(filenames)
+    )
+    file_ids = [file_id for (file_id,) in deleted.with_entities(ProjectFile.id)]
+    remove_files(file_ids)
+    remove_file_units(file_ids)
+    return deleted.update({'is_deleted': True}, synchronize_session=False)
+
+def scan_project_repo(project, on_batch=None, should_cancel=None, incremental=False):
+    """
+    Analyze the Python files in a project's linked repository
+    
+    Files are streamed from disk, analyzed and committed in batches of
+    SCAN_BATCH_SIZE so memory stays flat for large repositories.
+    
+    In incremental mode only files added or modified since the last
+    scanned commit are analyzed; unchanged files keep their latest results
+    and deleted files are flagged. Without a usable previous commit the
+    scan falls back to a full one.
+    
+    Args:
+        project: Project with a git_repo_path
+        on_batch: Optional callback(summary) run before each batch commit,
+            so progress updates are committed together with the batch
+        should_cancel: Optional callable checked before each batch
+        incremental: Only analyze files changed since the last scan
+    
+    Returns:
+        Summary dict with mode, files_seen, files_analyzed, files_skipped,
+        files_unchanged, files_deleted, errors and cancelled
+    """
+    config = current_app.config
+    skipped = []
+    
+    summary = {
+        'mode': 'full',
+        'files_seen': 0,
+        'files_analyzed': 0,
+        'files_skipped': [],
+        'files_unchanged': None,
+        'files_deleted': 0,
+        'errors': [],
+        'cancelled': False
+    }
+    
+    # Get git info once
+    git_info = get_git_info(project.git_repo_path)
+    
+    changes = None
+    if incremental and git_info:
+        since_commit = get_last_scanned_commit(project)
+        if since_commit == git_info['commit_hash']:
+            changes = {'added': [], 'modified': [], 'deleted': []}
+        elif since_commit:
+            changes = get_changed_files(project.git_repo_path, since_commit)
+    
+    if changes is not None:
+        summary['mode'] = 'incremental'
+        summary['files_deleted'] = _mark_deleted(project, changes['deleted'])
+        
+        files_found = read_repo_files(
+            project.git_repo_path,
+            changes['added'] + changes['modified'],
+            language='python',
+            max_file_size=config.get('SCAN_MAX_FILE_SIZE'),
+            skipped=skipped
+        )
+    else:
+        # Stream Python files from disk instead of loading the whole repo
+        files_found = scan_repo_files(
+            project.git_repo_path,
+            language='python',
+            max_file_size=config.get('SCAN_MAX_FILE_SIZE'),
+            max_total_size=config.get('SCAN_MAX_TOTAL_SIZE'),
+            skipped=skipped
+        )
+    
+    # File rows are prefetched once and results written set-based
+    writer = AnalysisWriter(
+        project,
+        'python',
+        git_info,
+        batch_size=config.get('DB_WRITE_BATCH_SIZE', 500)
+    )
+    
+    for batch in iter_batches(files_found, config.get('SCAN_BATCH_SIZE', 200)):
+        if should_cancel and should_cancel():
+            summary['cancelled'] = True
+            break
+        
+        summary['files_seen'] += len(batch)
+        
+        # Analyze in parallel, unchanged files are served from the cache
+        outcomes = analyze_many_cached([code for _, code in batch], 'python')
+        
+        for (file_path, code), (code_hash, results, error) in zip(batch, outcomes):
+            if error is not None and error.startswith(BUDGET_EXCEEDED):
+                skipped.append((file_path, error))
+                continue
+            if error is not None:
+                summary['errors'].append({'file': file_path, 'error': error})
+                continue
+            
+            writer.add(file_path, code_hash, results, code)
+            summary['files_analyzed'] += 1
+        
+        writer.flush()
+        summary['files_skipped'] = [{'file': path, 'reason': reason} for path, reason in skipped]
+        if on_batch:
+            on_batch(summary)
+        
+        # Commit per batch so the session does not grow with the repo
+        db.session.commit()
+    
+    summary['files_skipped'] = [{'file': path, 'reason': reason} for path, reason in skipped]
+    
+    if summary['mode'] == 'incremental':
+        # Everything still present and not re-analyzed carries its last result forward
+        live_files = ProjectFile.query.filter(
+            ProjectFile.project_id == project.id,
+            ProjectFile.is_deleted.isnot(True)
+        ).count()
+        summary['files_unchanged'] = max(0, live_files - summary['files_analyzed'])
+    
+    # A partial scan must not become the baseline for later incremental ones,
+    # or files it could not read would never be re-analyzed
+    incomplete = any(
+        reason == SCAN_LIMIT_REASON or reason.startswith(READ_ERROR_PREFIX)
+        for _, reason in skipped
+    )
+    if git_info and not summary['cancelled'] and not incomplete:
+        project.last_scanned_commit = git_info['commit_hash']
+    db.session.commit()
+    
+    return summary
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+from models import db, ProjectFile, FileAnalysis, MetricRollup
+from utils.db_utils import upsert, least, greatest
+
+SUM_COLUMNS = ('count', 'readability_sum', 'complexity_sum', 'maintainability_sum', 'loc_sum')
+MIN_COLUMNS = ('readability_min', 'complexity_min')
+MAX_COLUMNS = ('readability_max', 'complexity_max')
+
+
+def _buckets(timestamp, commit_hash):
+    day = datetime(timestamp.year, timestamp.month, timestamp.day)
+    week = day - timedelta(days=day.weekday())
+    yield 'day', day.date().isoformat(), day
+    yield 'week', week.date().isoformat(), week
+    if commit_hash:
+        yield 'commit', commit_hash, timestamp
+
+def rollup_deltas(project_id, analyses):
+    """
+    Fold analyses into rollup rows, one per (scope, period, bucket)
+
+    Args:
+        project_id: Project the analyses belong to
+        analyses: Iterable of dicts with file_id, timestamp, commit_hash,
+            readability_score, cyclomatic_complexity, maintainability_index
+            and lines_of_code
+
+    Each analysis counts towards its file and the whole project.
+    """
+    deltas = {}
+    for analysis in analyses:
+        readability = analysis['readability_score']
+        complexity = analysis['cyclomatic_complexity'] or 0
+        if readability is None:
+            continue
+
+        for file_id in (analysis['file_id'], MetricRollup.PROJECT_SCOPE):
+            for period, bucket, start in _buckets(analysis['timestamp'], analysis.get('commit_hash')):
+                row = deltas.get((file_id, period, bucket))
+                if row is None:
+                    row = deltas[(file_id, period, bucket)] = {
+                        'project_id': project_id,
+                        'file_id': file_id,
+                        'period': period,
+                        'bucket': bucket,
+                        'bucket_start': start,
+                        'count': 0,
+                        'readability_sum': 0.0,
+                        'readability_min': readability,
+                        'readability_max': readability,
+                        'complexity_sum': 0.0,
+                        'complexity_min': complexity,
+                        'complexity_max': complexity,
+                        'maintainability_sum': 0.0,
+                        'loc_sum': 0
+                    }
+
+                row['count'] += 1
+                row['readability_sum'] += readability
+                row['readability_min'] = min(row['readability_min'], readability)
+                row['readability_max'] = max(row['readability_max'], readability)
+                row['complexity_sum'] += complexity
+                row['complexity_min'] = min(row['complexity_min'], complexity)
+                row['complexity_max'] = max(row['complexity_max'], complexity)
+                row['maintainability_sum'] += analysis['maintainability_index'] or 0
+                row['loc_sum'] += analysis['lines_of_code'] or 0
+                row['bucket_start'] = min(row['bucket_start'], start)
+
+    return list(deltas.values())
+
+def apply_rollups(project_id, analyses):
+    """Merge analyses into the rollup tables with one upsert per batch."""
+    rows = rollup_deltas(project_id, analyses)
+    if not rows:
+        return
+
+    def merge(table, excluded):
+        updates = {column: table[column] + excluded[column] for column in SUM_COLUMNS}
+        updates.update({column: least(table[column], excluded[column]) for column in MIN_COLUMNS})
+        updates.update({column: greatest(table[column], excluded[column]) for column in MAX_COLUMNS})
+        updates['bucket_start'] = least(table.bucket_start, excluded.bucket_start)
+        return updates
+
+    upsert(MetricRollup, rows, ('project_id', 'file_id', 'period', 'bucket'), set_=merge)
+
+def get_trend(project_id, period, file_id=MetricRollup.PROJECT_SCOPE, limit=90):
+    """Latest `limit` buckets of a rollup series, oldest first."""
+    rows = MetricRollup.query.filter_by(
+        project_id=project_id,
+        file_id=file_id,
+        period=period
+    ).order_by(MetricRollup.bucket_start.desc(), MetricRollup.id.desc()).limit(limit).all()
+
+    return [row.to_dict() for row in reversed(rows)]
+
+def backfill_rollups(project_id=None, chunk_size=5000):
+    """Rebuild rollups from FileAnalysis rows, for one project or all of them."""
+    delete = MetricRollup.query
+    if project_id is not None:
+        delete = delete.filter_by(project_id=project_id)
+    delete.delete(synchronize_session=False)
+
+    query = select(
+        ProjectFile.project_id,
+        FileAnalysis.file_id,
+        FileAnalysis.timestamp,
+        FileAnalysis.commit_hash,
+        FileAnalysis.readability_score,
+        FileAnalysis.cyclomatic_complexity,
+        FileAnalysis.maintainability_index,
+        FileAnalysis.lines_of_code
+    ).join(ProjectFile, ProjectFile.id == FileAnalysis.file_id).order_by(ProjectFile.project_id)
+    if project_id is not None:
+        query = query.where(ProjectFile.project_id == project_id)
+
+    total = 0
+    pending = {}
+    for row in db.session.execute(query.execution_options(yield_per=chunk_size)):
+        pending.setdefault(row.project_id, []).append(row._asdict())
+        total += 1
+        if total % chunk_size == 0:
+            for pending_project, analyses in pending.items():
+                apply_rollups(pending_project, analyses)
+            pending = {}
+
+    for pending_project, analyses in pending.items():
+        apply_rollups(pending_project, analyses)
+
+    db.session.commit()
+    return total
+
+
+rollups_cli = AppGroup('rollups', help='Maintain metric rollup tables.')
+
+@rollups_cli.command('backfill')
+@click.option('--project-id', type=int, default=None, help='Only rebuild this project.')
+def backfill_command(project_id):
+    """Rebuild rollups from the stored analyses."""
+    total = backfill_rollups(project_id)
+    click.echo(f'Rolled up {total} analyses')
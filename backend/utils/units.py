@@ -0,0 +1,189 @@
+from sqlalchemy import delete, func, insert, or_, select, update
+from models import db, ProjectFile, CodeUnit
+from infrastructure.budget import BUDGET_EXCEEDED
+from infrastructure.code_analyzer import UNIT_METRIC_FIELDS
+from infrastructure.executor import analyze_unit_task
+from infrastructure.metrics.units import extract_units, unit_source
+from utils.analysis_cache import get_executor
+
+# Sort orders for the worst units of a project, worst first
+WORST_UNIT_ORDERS = {
+    'readability_score': CodeUnit.readability_score.asc(),
+    'maintainability_index': CodeUnit.maintainability_index.asc(),
+    'cyclomatic_complexity': CodeUnit.cyclomatic_complexity.desc(),
+    'cognitive_complexity': CodeUnit.cognitive_complexity.desc()
+}
+
+
+def remove_file_units(file_ids):
+    """Drop the stored units of the given files."""
+    file_ids = list(file_ids)
+    if file_ids:
+        db.session.execute(delete(CodeUnit).where(CodeUnit.file_id.in_(file_ids)))
+        db.session.execute(update(ProjectFile).where(ProjectFile.id.in_(file_ids)).values(units_hash=None))
+
+def _metrics_for(project_id, wanted, executor=None):
+    # (hash -> metrics, number computed), copied from stored units where possible.
+    # Units cut short by the budget are left out, so they are retried later
+    metrics = {}
+    if not wanted:
+        return metrics, 0
+
+    columns = [getattr(CodeUnit, field) for field in UNIT_METRIC_FIELDS]
+    stored = db.session.execute(
+        select(CodeUnit.unit_hash, *columns)
+        .where(
+            CodeUnit.project_id == project_id,
+            CodeUnit.unit_hash.in_(list(wanted)),
+            # Rows without any metric are not reused, they are retried
+            or_(*[column.isnot(None) for column in columns])
+        )
+    )
+    for unit_hash, *values in stored:
+        metrics.setdefault(unit_hash, dict(zip(UNIT_METRIC_FIELDS, values)))
+
+    missing = [unit_hash for unit_hash in wanted if unit_hash not in metrics]
+    if missing:
+        computed = (executor or get_executor()).map(analyze_unit_task, [wanted[unit_hash] for unit_hash in missing])
+        for unit_hash, (results, error) in zip(missing, computed):
+            if error is not None and error.startswith(BUDGET_EXCEEDED):
+                continue
+            # Units that do not parse on their own are kept without metrics
+            metrics[unit_hash] = results or dict.fromkeys(UNIT_METRIC_FIELDS)
+
+    return metrics, len(missing)
+
+def sync_file_units(project_id, files, executor=None):
+    """
+    Bring the stored units of re-analyzed files up to date
+
+    Files whose content is unchanged since their units were stored are
+    skipped without parsing. For the others the units are extracted and
+    matched to the stored ones by qualified name. Only units whose
+    normalized hash is new to the project are analyzed; unchanged and
+    moved units keep their stored metrics and just get new line numbers.
+    Units cut short by the analysis budget are not stored, and their file
+    is synced again on its next save. File-level metrics are not derived
+    from units, analyze_code still scores the whole file.
+
+    Args:
+        project_id: Project the files belong to
+        files: Dict of file_id -> (code_hash, code)
+
+    Returns:
+        Number of units whose metrics were computed
+    """
+    if not files:
+        return 0
+
+    current = db.session.execute(
+        select(ProjectFile.id, ProjectFile.units_hash).where(ProjectFile.id.in_(list(files)))
+    )
+    changed = {file_id for file_id, units_hash in current if units_hash != files[file_id][0]}
+    if not changed:
+        return 0
+    hashes = {file_id: files[file_id][0] for file_id in changed}
+    files = {file_id: (code, extract_units(code)) for file_id, (_, code) in files.items() if file_id in changed}
+
+    stored = {}
+    for unit_id, file_id, name, unit_hash, start, end in db.session.execute(
+        select(CodeUnit.id, CodeUnit.file_id, CodeUnit.name, CodeUnit.unit_hash, CodeUnit.start_line, CodeUnit.end_line)
+        .where(CodeUnit.file_id.in_(list(files)))
+    ):
+        stored[(file_id, name)] = (unit_id, unit_hash, start, end)
+
+    # Source of each changed unit, keyed by hash
+    wanted = {}
+    for file_id, (code, units) in files.items():
+        lines = None
+        for unit in units:
+            previous = stored.get((file_id, unit['name']))
+            if previous is not None and previous[1] == unit['hash']:
+                continue
+            if unit['hash'] not in wanted:
+                lines = lines if lines is not None else code.splitlines()
+                wanted[unit['hash']] = unit_source(lines, unit)
+
+    metrics, computed = _metrics_for(project_id, wanted, executor)
+
+    inserts = []
+    updates = []
+    kept = set()
+    for file_id, (code, units) in files.items():
+        for unit in units:
+            key = (file_id, unit['name'])
+            previous = stored.get(key)
+            new_hash = previous is None or previous[1] != unit['hash']
+            if new_hash and unit['hash'] not in metrics:
+                # Over budget: not stored, and the file is synced again next time
+                hashes.pop(file_id, None)
+                continue
+            row = {'start_line': unit['start_line'], 'end_line': unit['end_line']}
+
+            if previous is None:
+                row.update(project_id=project_id, file_id=file_id, name=unit['name'][:500],
+                           kind=unit['kind'], unit_hash=unit['hash'])
+                row.update(metrics[unit['hash']])
+                inserts.append(row)
+                continue
+
+            kept.add(key)
+            unit_id, unit_hash, start, end = previous
+            if unit_hash != unit['hash']:
+                row.update(kind=unit['kind'], unit_hash=unit['hash'])
+                row.update(metrics[unit['hash']])
+            elif (start, end) == (unit['start_line'], unit['end_line']):
+                continue
+            row['id'] = unit_id
+            updates.append(row)
+
+    removed = [previous[0] for key, previous in stored.items() if key not in kept]
+    if removed:
+        db.session.execute(delete(CodeUnit).where(CodeUnit.id.in_(removed)))
+    if inserts:
+        db.session.execute(insert(CodeUnit), inserts)
+    # Bulk UPDATE by primary key needs the same keys in every row
+    for keys in {tuple(sorted(row)) for row in updates}:
+        db.session.execute(update(CodeUnit), [row for row in updates if tuple(sorted(row)) == keys])
+    if hashes:
+        db.session.execute(update(ProjectFile), [
+            {'id': file_id, 'units_hash': units_hash} for file_id, units_hash in hashes.items()
+        ])
+
+    return computed
+
+def file_unit_summary(file_id):
+    """File-level aggregates over a file's stored unit metrics, without re-parsing."""
+    count, avg_complexity, max_complexity, max_cognitive, avg_readability, min_readability = db.session.execute(
+        select(
+            func.count(CodeUnit.id),
+            func.avg(CodeUnit.cyclomatic_complexity),
+            func.max(CodeUnit.cyclomatic_complexity),
+            func.max(CodeUnit.cognitive_complexity),
+            func.avg(CodeUnit.readability_score),
+            func.min(CodeUnit.readability_score)
+        ).where(CodeUnit.file_id == file_id)
+    ).one()
+
+    return {
+        'unit_count': count,
+        'avg_complexity': round(avg_complexity, 2) if avg_complexity is not None else None,
+        'max_complexity': max_complexity,
+        'max_cognitive_complexity': max_cognitive,
+        'avg_readability': round(avg_readability, 2) if avg_readability is not None else None,
+        'min_readability': min_readability
+    }
+
+def worst_units(project_id, metric='readability_score', limit=20, kind=None):
+    """The project's worst units by one metric, read in index order."""
+    column = getattr(CodeUnit, metric)
+    query = select(CodeUnit, ProjectFile.filename).join(ProjectFile, ProjectFile.id == CodeUnit.file_id).where(
+        CodeUnit.project_id == project_id,
+        column.isnot(None),
+        ProjectFile.is_deleted.isnot(True)
+    )
+    if kind is not None:
+        query = query.where(CodeUnit.kind == kind)
+
+    rows = db.session.execute(query.order_by(WORST_UNIT_ORDERS[metric], CodeUnit.id).limit(limit))
+    return [dict(unit.to_dict(), filename=filename) for unit, filename in rows]
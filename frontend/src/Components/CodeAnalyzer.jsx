@@ -392,7 +392,7 @@ function CodeAnalyzer() {
               <div className="metric-card" style={{ gridColumn: 'span 2' }}>
                 <div className="metric-label">Variable Name Lengths</div>
                 <div className="metric-description">Distribution of name lengths</div>
-                {results.sorted_name_lengths && results.sorted_name_lengths.length > 0 ? (
+                {results.name_length_stats && results.name_length_stats.count > 0 ? (
                   <>
                     <div style={{ 
                       display: 'flex', 
@@ -403,18 +403,17 @@ function CodeAnalyzer() {
                       overflow: 'hidden',
                       padding: '0 10px'
                     }}>
-                      {results.sorted_name_lengths.map((length, idx) => (
+                      {results.name_length_stats.histogram.map(bucket => (
                         <div
-                          key={idx}
+                          key={bucket.min}
                           style={{
-                            width: '6px',
-                            height: `${(length / Math.max(...results.sorted_name_lengths)) * 100}%`,
-                            backgroundColor: length === 1 ? '#ff6b6b' : '#4ecdc4',
+                            flex: 1,
+                            height: `${(bucket.count / Math.max(...results.name_length_stats.histogram.map(b => b.count))) * 100}%`,
+                            backgroundColor: bucket.max === 1 ? '#ff6b6b' : '#4ecdc4',
                             minHeight: '4px',
-                            flexShrink: 0,
                             borderRadius: '2px 2px 0 0'
                           }}
-                          title={`Length: ${length}`}
+                          title={`Length ${bucket.max === null ? `${bucket.min}+` : bucket.max === bucket.min ? bucket.min : `${bucket.min}-${bucket.max}`}: ${bucket.count} names`}
                         />
                       ))}
                     </div>
@@ -426,8 +425,10 @@ function CodeAnalyzer() {
                       color: '#666',
                       fontWeight: '500'
                     }}>
-                      <span>Min: {Math.min(...results.sorted_name_lengths)}</span>
-                      <span>Max: {Math.max(...results.sorted_name_lengths)}</span>
+                      <span>Min: {results.name_length_stats.min}</span>
+                      <span>Median: {results.name_length_stats.median}</span>
+                      <span>P90: {results.name_length_stats.p90}</span>
+                      <span>Max: {results.name_length_stats.max}</span>
                     </div>
                   </>
                 ) : (
@@ -4,9 +4,16 @@ import { fetchWithAuth } from '../utils/Auth';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import './FileHistory.css';
 
+const CHART_POINTS = 300;
+const PAGE_SIZE = 100;
+const TABLE_FIELDS = 'id,timestamp,commit_hash,readability_score,cyclomatic_complexity,maintainability_index,lines_of_code';
+
 function FileHistory() {
   const { projectId, fileId } = useParams();
   const [data, setData] = useState(null);
+  const [chart, setChart] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -14,12 +21,21 @@ function FileHistory() {
     loadHistory();
   }, [projectId, fileId]);
 
+  const historyUrl = `/projects/${projectId}/files/${fileId}/history`;
+
   const loadHistory = async () => {
     try {
-      const response = await fetchWithAuth(`/projects/${projectId}/files/${fileId}/history`);
-      if (!response.ok) throw new Error('Failed to load history');
-      const result = await response.json();
+      // Downsampled series for the charts, first page of rows for the table
+      const [chartResponse, pageResponse] = await Promise.all([
+        fetchWithAuth(`${historyUrl}?mode=chart&points=${CHART_POINTS}`),
+        fetchWithAuth(`${historyUrl}?limit=${PAGE_SIZE}&fields=${TABLE_FIELDS}`)
+      ]);
+      if (!chartResponse.ok || !pageResponse.ok) throw new Error('Failed to load history');
+      const chartResult = await chartResponse.json();
+      const result = await pageResponse.json();
+      setChart(chartResult.chart);
       setData(result);
+      setNextCursor(result.next_cursor);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -27,16 +43,33 @@ function FileHistory() {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetchWithAuth(
+        `${historyUrl}?limit=${PAGE_SIZE}&fields=${TABLE_FIELDS}&cursor=${nextCursor}`
+      );
+      if (!response.ok) throw new Error('Failed to load history');
+      const result = await response.json();
+      setData(prev => ({ ...prev, history: [...prev.history, ...result.history] }));
+      setNextCursor(result.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) return <div className="loading">Loading history...</div>;
   if (error) return <div className="error-message">{error}</div>;
   if (!data) return <div className="error-message">No data found</div>;
 
-  // Prepare chart data (reverse to show oldest first)
-  const chartData = [...data.history].reverse().map(a => ({
-    date: new Date(a.timestamp).toLocaleDateString(),
-    score: a.readability_score,
-    complexity: a.cyclomatic_complexity,
-    maintainability: a.maintainability_index
+  // Chart points arrive oldest first, one per bucket of analyses
+  const chartData = chart.map(point => ({
+    date: new Date(point.timestamp).toLocaleDateString(),
+    score: point.readability_score,
+    complexity: point.cyclomatic_complexity,
+    maintainability: point.maintainability_index
   }));
 
   return (
@@ -136,6 +169,11 @@ function FileHistory() {
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <button className="load-more-button" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
           </section>
         </>
       )}
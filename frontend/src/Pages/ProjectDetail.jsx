@@ -5,6 +5,8 @@ import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsi
 import './ProjectDetail.css';
 import { useNavigate } from 'react-router-dom';
 
+const SCAN_POLL_MS = 2000;
+
 function ProjectDetail() {
   const { projectId } = useParams();
   const [project, setProject] = useState(null);
@@ -21,6 +23,7 @@ function ProjectDetail() {
   // Scan state
   const [scanning, setScanning] = useState(false);
   const [scanResult, setScanResult] = useState(null);
+  const [scanProgress, setScanProgress] = useState(0);
 
   useEffect(() => {
     loadProject();
@@ -73,20 +76,42 @@ function ProjectDetail() {
     
     setScanning(true);
     setScanResult(null);
+    setScanProgress(0);
     
     try {
-      const response = await fetchWithAuth(`/projects/${projectId}/scan-repo`, {
-        method: 'POST'
+      // Scans run as background jobs; poll until the job finishes
+      // Incremental scans only re-analyze files changed since the last scan
+      const response = await fetchWithAuth(`/projects/${projectId}/scan-jobs`, {
+        method: 'POST',
+        body: JSON.stringify({ incremental: true })
       });
       
-      if (response.ok) {
-        const data = await response.json();
-        setScanResult(data);
-        loadProject(); // Refresh project data
-      } else {
+      if (!response.ok) {
         const data = await response.json();
         alert(`Scan failed: ${data.error}`);
+        return;
+      }
+      
+      let job = await response.json();
+      while (!['completed', 'failed', 'cancelled'].includes(job.status)) {
+        await new Promise(resolve => setTimeout(resolve, SCAN_POLL_MS));
+        const pollResponse = await fetchWithAuth(`/projects/${projectId}/scan-jobs/${job.id}`);
+        if (!pollResponse.ok) throw new Error('Failed to load scan status');
+        job = await pollResponse.json();
+        setScanProgress(job.files_seen || 0);
+      }
+      
+      if (job.status === 'failed') {
+        alert(`Scan failed: ${job.error_message}`);
+      } else {
+        setScanResult({
+          message: job.status === 'cancelled'
+            ? `Scan cancelled after ${job.files_analyzed} files`
+            : `Successfully analyzed ${job.files_analyzed} files`,
+          errors: job.errors
+        });
       }
+      loadProject(); // Refresh project data
     } catch (err) {
       alert('Failed to scan repository: ' + err.message);
     } finally {
@@ -140,7 +165,7 @@ function ProjectDetail() {
               disabled={scanning}
               className="scan-button"
             >
-              {scanning ? 'Scanning...' : 'Scan Repository'}
+              {scanning ? `Scanning... (${scanProgress} files)` : 'Scan Repository'}
             </button>
           )}
         </div>